@@ -47,6 +47,8 @@ from blockfrost import BlockFrostApi, ApiError, ApiUrls
 from dotenv import load_dotenv
 from pycardano import *
 import time
+# Engine gộp UTxO: lấy mọi trang UTxO, chia nhiều giao dịch, submit song song
+from consolidation import fetch_all_utxos, plan_consolidation, submit_plan
 
 # === Bước 1: Cấu hình môi trường ===
 # Tải biến môi trường
@@ -90,26 +92,36 @@ print(f"Main Address: {main_address}")
 api= BlockFrostApi(project_id=blockfrost_api_key, base_url=api_url)
 
 # Lấy tất cả UTxO của địa chỉ main_address
+# Blockfrost chỉ trả tối đa 100 UTxO mỗi trang, nên fetch_all_utxos
+# đọc lần lượt mọi trang cho tới trang cuối.
+# UTxO có datum hoặc reference script được giữ nguyên (không gộp).
+
+# Để tạo ra đối tượng UTxO làm đầu vào cho hàm add_input(utxo)
+# chúng ta cần tạo ra một đối tượng utxo có 2 thành phần chính đó là
+# TransactionInput và TransactionOutput
+# Trong TransactionInput sẽ bao gồm tx_hash và tx_index của UTxO
+# Trong TransactionOutput sẽ bao gồm address và value của UTxO
+# (value = số lovelace + multi_asset {policy_id: {asset_name: quantity}})
+# fetch_all_utxos làm việc này cho từng UTxO Blockfrost trả về
+# (xem utxos_from_blockfrost trong consolidation.py).
 try: 
-    utxos= api.address_utxos(main_address)
-except Exception as e:
-    if e.status_code == 404:
-        print("Địa chỉ chưa có UTxO nào.")
-        if network == "testnet":
-            print("Vui lòng sử dụng faucet testnet để gửi một ít ADA vào địa chỉ này.")
-        sys.exit(1)
-    else:
-        print(f"Lỗi khi lấy UTxO: {e}")
-        sys.exit(1)
+    utxos= fetch_all_utxos(api, main_address)
+except ApiError as e:
+    print(f"Lỗi khi lấy UTxO: {e}")
+    sys.exit(1)
 
-# === Bước 4: Xây dựng giao dịch ===
+if not utxos:
+    print("Địa chỉ chưa có UTxO nào.")
+    if network == Network.TESTNET:
+        print("Vui lòng sử dụng faucet testnet để gửi một ít ADA vào địa chỉ này.")
+    sys.exit(1)
 
-# Tạo context giao dịch để xây dựng giao dịch
-context= BlockFrostChainContext(project_id=blockfrost_api_key, base_url=api_url)
+print(f"Danh sách UTxO sẽ được gộp: {len(utxos)} UTxOs")
 
+# === Bước 4: Lập kế hoạch gộp ===
 
-# Tạo đối tượng TransactionBuilder
-builder= TransactionBuilder(context)
+# Tạo context giao dịch để xây dựng giao dịch
+context= BlockFrostChainContext(project_id=blockfrost_api_key, base_url=api_url)
 
 # Thêm tất cả UTxO vào làm đầu vào (inputs) của giao dịch
 # Trên thư viện pycardano, để add input vào giao dịch chúng ta có thể
@@ -123,83 +135,47 @@ builder= TransactionBuilder(context)
 # ===> cách này sẽ giúp chúng ta kiểm soát được việc chọn UTxO nào
 # để add vào giao dịch
 
-# Để tạo ra đối tượng UTxO làm đầu vào cho hàm add_input(utxo)
-# chúng ta cần tạo ra một đối tượng utxo có 2 thành phần chính đó là
-# TransactionInput và TransactionOutput
-# Trong TransactionInput sẽ bao gồm tx_hash và tx_index của UTxO
-# Trong TransactionOutput sẽ bao gồm address và value của UTxO
-
-# Duyệt qua tất cả UTxO và thêm vào giao dịch
-print(f"Danh sách UTxO sẽ được gộp: {len(utxos)} UTxOs")
-
-for i, utxo in enumerate(utxos):
-    # in thông tin chi tiết của từng UTxO
-    print(f"\n[{i+1}]/{len(utxos)} UTxO Details: {utxo.tx_hash}# Index{utxo.tx_index}")
-    # Tạo TransactionInput từ tx_hash và tx_index
-    tx_input= TransactionInput.from_primitive([utxo.tx_hash, utxo.tx_index])
-
-    # Xử lý value của UTxO và in chi tiết thông tin tài sản:
-    lovelace_amount= 0
-    multi_asset={}
-    for asset in utxo.amount:
-        if asset.unit == "lovelace":
-            lovelace_amount= int(asset.quantity)
-            print(f" - ADA: {lovelace_amount / 1_000_000} ADA")
-        else:
-            policy_id= asset.unit[:56]
-            asset_name= asset.unit[56:]
-            quantity= int(asset.quantity)
-            
-            # In thông tin tài sản đa dạng (multi-asset)
-            try:
-                asset_name_str= bytes.fromhex(asset_name).decode("utf-8") # Convert hex to string
-            except:
-                asset_name_str= asset_name  # Nếu không thể decode, giữ nguyên dạng hex
-            print(f" - Asset: {policy_id}.{asset_name_str} - Quantity: {quantity}")
-            # Xây dựng multi_asset dictionary để xử lý value
-            if policy_id not in multi_asset:
-                multi_asset[policy_id]= {}
-            multi_asset[policy_id][asset_name]= quantity
-    # Tạo TransactionOutput từ address và value
-    # Xây dựng value
-    if multi_asset:
-        value = Value.from_primitive([lovelace_amount, multi_asset])
-    else:
-        value = Value.from_primitive([lovelace_amount])
-    # Tạo TransactionOutput
-    tx_output= TransactionOutput(address=main_address, amount=value)
-    # Tạo UTxO từ TransactionInput và TransactionOutput
-    utxo_to_add= UTxO(tx_input, tx_output)
-    # Thêm UTxO vào giao dịch
-    builder.add_input(utxo_to_add)
-
-# === Bước 5: Thực hiện ký giao dịch và  gửi giao dịch ===
-
-signed_tx= builder.build_and_sign([payment_skey], 
-                                  change_address=main_address)
-# Hiển thị thông tin giao dịch đã ký
+# Một giao dịch có giới hạn kích thước (max_tx_size ~ 16KB),
+# nên ví có hàng trăm UTxO hoặc nhiều native asset không thể gộp trong
+# một giao dịch duy nhất.
+# plan_consolidation:
+# - Sắp xếp UTxO theo bộ asset (policy ID) để UTxO giống nhau nằm cùng giao dịch
+# - Chia thành các giao dịch vừa giới hạn kích thước; mỗi giao dịch thêm
+#   từng UTxO bằng builder.add_input(utxo) để kiểm soát UTxO nào được gộp
+# - Output của các giao dịch vòng 1 lại được gộp tiếp ở vòng 2, ...
+#   cho tới khi không gộp thêm được nữa
+plan= plan_consolidation(context, utxos, main_address, [payment_skey])
+
+if not plan.steps:
+    print("Không có UTxO nào cần gộp.")
+    sys.exit(0)
 
 # số dư:
-balance= sum(
-    int(a.quantity) for utxo in utxos for a in utxo.amount if a.unit == "lovelace"
-)
+balance= sum(utxo.output.amount.coin for utxo in utxos)
 
 print(f"\nTổng số ADA trong tất cả UTxO: {balance / 1_000_000} ADA")
-print(f"Số lượng UTxO trước khi gộp: {len(signed_tx.transaction_body.inputs)} UTxOs")
-print(f"Số lượng UTxO sau khi gộp: {len(signed_tx.transaction_body.outputs)} UTxOs")
-print(f"Phí giao dịch: {signed_tx.transaction_body.fee / 1_000_000} ADA")
-
-# Gửi giao dịch đã ký lên mạng lưới
-try:
-    tx_id= context.submit_tx(signed_tx.to_cbor())
-    print(f"Giao dịch đã được gửi thành công! Tx ID: {tx_id}")
-except Exception as e:
-    if "BadInputsUTxO" in str(e):
+print(plan.summary())
+print(f"Số lượng UTxO trước khi gộp: {len(utxos)} UTxOs")
+print(f"Số lượng UTxO sau khi gộp: {len(plan.result)} UTxOs")
+
+# === Bước 5: Gửi các giao dịch đã ký ===
+# Các giao dịch trong cùng một vòng độc lập nên được gửi song song.
+# Vòng sau tiêu output của vòng trước ngay khi node đã nhận (còn trong mempool),
+# không cần chờ block.
+
+def report(step):
+    if step.error is None:
+        print(f"Giao dịch vòng {step.round} đã được gửi thành công! Tx ID: {step.tx_hash}")
+    elif "BadInputsUTxO" in step.error:
         print("Lỗi: Một hoặc nhiều UTxO đã được sử dụng trong một giao dịch khác.")
-    elif "ValueNotConservedUTxO" in str(e):
+    elif "ValueNotConservedUTxO" in step.error:
         print("Lỗi: Giá trị không được bảo toàn. Vui lòng kiểm tra lại số lượng đầu vào và đầu ra.")
     else:
-        print(f"Lỗi khi gửi giao dịch: {e}")
+        print(f"Lỗi khi gửi giao dịch: {step.error}")
+
+if not submit_plan(context, plan, on_submitted=report):
+    print("Dừng gửi các vòng tiếp theo do có giao dịch lỗi.")
+    sys.exit(1)
 
 # thực  hiện chờ và kiểm tra UTXO trong ví sau khi giao dịch hoàn tất
 
@@ -215,7 +191,8 @@ def wait_for_tx(tx_hash):
             print("Đang chờ giao dịch được xác nhận vui lòng chờ thêm 10s...")
             time.sleep(10)
     return False
-if wait_for_tx(tx_id):
+# Chờ lần lượt từng giao dịch của kế hoạch
+if all(wait_for_tx(step.tx_hash) for step in plan.steps):
     # chờ thêm một chút để đồng bộ hóa blockfrost
     print("Đang đồng bộ hóa dữ liệu từ Blockfrost...")
     time.sleep(20)
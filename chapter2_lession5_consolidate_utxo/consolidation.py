@@ -0,0 +1,390 @@
+"""
+Consolidation engine — gộp UTxO của ví lớn bằng nhiều giao dịch
+
+Một giao dịch duy nhất chứa mọi UTxO (cách làm trong consolidate.py ban đầu)
+sẽ lỗi khi ví có hàng trăm UTxO hoặc nhiều native asset: giao dịch vượt
+`max_tx_size`. Module này:
+
+1. fetch_all_utxos: lấy UTxO qua mọi trang của Blockfrost (mỗi trang 100),
+   bỏ qua UTxO có datum hoặc reference script (không phải tiền lẻ).
+2. plan_consolidation: sắp UTxO theo bộ asset (các policy ID) để UTxO giống
+   nhau nằm cùng giao dịch, chia thành các nhóm vừa `max_tx_size` (và
+   `max_fee` nếu có). Nhóm nào build lỗi / quá phí thì tự chia đôi.
+   Output của vòng trước là input của vòng sau (cây giao dịch) cho tới khi
+   không gộp thêm được, hoặc hết `max_rounds` vòng.
+3. submit_plan: các giao dịch trong cùng vòng độc lập với nhau nên được submit
+   song song; vòng sau tiêu output còn trong mempool của vòng trước (chained),
+   không phải chờ block.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from blockfrost import ApiError
+from pycardano import *
+from pycardano.exception import PyCardanoException
+
+# Số UTxO mỗi trang của Blockfrost (tối đa 100)
+BLOCKFROST_PAGE_SIZE = 100
+# Chỉ lấp đầy tới tỉ lệ này của max_tx_size khi ước lượng (phần còn lại dự phòng)
+TX_FILL_RATIO = 0.9
+# Số input tối đa mỗi giao dịch (0 = chỉ giới hạn theo kích thước)
+CONSOLIDATE_MAX_INPUTS = int(os.getenv("CONSOLIDATE_MAX_INPUTS", "0"))
+# Số vòng gộp tối đa (độ sâu của cây giao dịch)
+CONSOLIDATE_MAX_ROUNDS = int(os.getenv("CONSOLIDATE_MAX_ROUNDS", "4"))
+# Số giao dịch submit song song trong một vòng
+CONSOLIDATE_SUBMIT_WORKERS = int(os.getenv("CONSOLIDATE_SUBMIT_WORKERS", "4"))
+
+# Ước lượng kích thước (byte) dùng để chia nhóm trước khi build thật
+_TX_OVERHEAD_BYTES = 300    # body, phí, một vkey witness, địa chỉ output
+_INPUT_BYTES = 40           # tx hash + index
+_POLICY_BYTES = 31          # policy ID trong value của output
+_ASSET_BYTES = 12           # header asset name + số lượng (chưa tính độ dài tên)
+
+
+@dataclass
+class ConsolidationStep:
+    """Một giao dịch gộp trong kế hoạch"""
+    round: int
+    inputs: List[UTxO]
+    transaction: Transaction
+    tx_hash: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def fee(self) -> int:
+        return self.transaction.transaction_body.fee
+
+    @property
+    def size(self) -> int:
+        return len(self.transaction.to_cbor())
+
+    def outputs(self) -> List[UTxO]:
+        """UTxO mà giao dịch tạo ra (dùng làm input cho vòng sau)"""
+        tx_id = self.transaction.id
+        return [
+            UTxO(TransactionInput(tx_id, index), output)
+            for index, output in enumerate(self.transaction.transaction_body.outputs)
+        ]
+
+
+@dataclass
+class ConsolidationPlan:
+    """Các vòng giao dịch gộp; giao dịch trong một vòng độc lập với nhau"""
+    rounds: List[List[ConsolidationStep]] = field(default_factory=list)
+    # UTxO của ví sau khi chạy hết kế hoạch
+    result: List[UTxO] = field(default_factory=list)
+
+    @property
+    def steps(self) -> List[ConsolidationStep]:
+        return [step for steps in self.rounds for step in steps]
+
+    @property
+    def total_fee(self) -> int:
+        return sum(step.fee for step in self.steps)
+
+    def summary(self) -> str:
+        lines = []
+        for round_no, steps in enumerate(self.rounds, 1):
+            inputs = sum(len(step.inputs) for step in steps)
+            fee = sum(step.fee for step in steps)
+            lines.append(
+                f"Vòng {round_no}: {len(steps)} giao dịch, {inputs} inputs, phí {fee / 1_000_000} ADA"
+            )
+        lines.append(
+            f"Tổng: {len(self.steps)} giao dịch, phí {self.total_fee / 1_000_000} ADA, "
+            f"còn {len(self.result)} UTxO sau khi gộp"
+        )
+        return "\n".join(lines)
+
+
+# ── Lấy UTxO ──
+def utxos_from_blockfrost(
+    rows,
+    address: Address,
+    policy_ids: Optional[Dict[str, ScriptHash]] = None,
+    asset_names: Optional[Dict[str, AssetName]] = None,
+) -> List[UTxO]:
+    """
+    Chuyển một trang UTxO JSON của Blockfrost `address_utxos` thành UTxO của
+    PyCardano trong một lượt, không in log.
+
+    Mỗi policy ID, asset name và tx hash chỉ được decode một lần (intern);
+    multi-asset được dựng từ dict thường rồi bọc một lần, thay vì
+    `TransactionInput.from_primitive` và gán từng asset vào MultiAsset
+    (đều đi qua kiểm tra kiểu của PyCardano).
+
+    Args:
+        rows: Một trang kết quả `address_utxos`
+        address: Địa chỉ ví (address của mọi output)
+        policy_ids: Policy ID đã gặp (hex -> ScriptHash), truyền cùng dict cho
+            mọi trang của một lần lấy để dùng chung; None = dict mới
+        asset_names: Asset name đã gặp (hex -> AssetName), như `policy_ids`
+    """
+    policy_ids = {} if policy_ids is None else policy_ids
+    asset_names = {} if asset_names is None else asset_names
+    tx_ids: Dict[str, TransactionId] = {}
+    utxos: List[UTxO] = []
+    for row in rows:
+        lovelace = 0
+        # policy hex -> {AssetName: số lượng}; ScriptHash chỉ dựng khi bọc MultiAsset
+        assets: Dict[str, Dict[AssetName, int]] = {}
+        for item in row.amount:
+            unit = item.unit
+            if unit == "lovelace":
+                lovelace = int(item.quantity)
+                continue
+            name_hex = unit[56:]
+            name = asset_names.get(name_hex)
+            if name is None:
+                name = asset_names[name_hex] = AssetName(bytes.fromhex(name_hex))
+            assets.setdefault(unit[:56], {})[name] = int(item.quantity)
+
+        tx_id = tx_ids.get(row.tx_hash)
+        if tx_id is None:
+            tx_id = tx_ids[row.tx_hash] = TransactionId(bytes.fromhex(row.tx_hash))
+        bundle = {}
+        for policy_hex, names in assets.items():
+            policy_id = policy_ids.get(policy_hex)
+            if policy_id is None:
+                policy_id = policy_ids[policy_hex] = ScriptHash(bytes.fromhex(policy_hex))
+            bundle[policy_id] = Asset(names)
+        utxos.append(UTxO(
+            TransactionInput(tx_id, row.output_index),
+            TransactionOutput(address, Value(lovelace, MultiAsset(bundle))),
+        ))
+    return utxos
+
+
+def _is_plain(row) -> bool:
+    """UTxO không có datum / reference script (có thể gộp an toàn)"""
+    return not (
+        getattr(row, "data_hash", None)
+        or getattr(row, "inline_datum", None)
+        or getattr(row, "reference_script_hash", None)
+    )
+
+
+def fetch_all_utxos(api, address: Address, page_size: int = BLOCKFROST_PAGE_SIZE) -> List[UTxO]:
+    """
+    Lấy toàn bộ UTxO có thể gộp của địa chỉ, qua mọi trang của Blockfrost.
+
+    Args:
+        api: BlockFrostApi
+        address: Địa chỉ ví
+        page_size: Số UTxO mỗi trang
+    """
+    utxos: List[UTxO] = []
+    # Policy ID / asset name đã gặp, dùng chung giữa các trang của lần lấy này
+    policy_ids: Dict[str, ScriptHash] = {}
+    asset_names: Dict[str, AssetName] = {}
+    page = 1
+    while True:
+        try:
+            rows = api.address_utxos(str(address), count=page_size, page=page)
+        except ApiError as e:
+            if e.status_code == 404:  # địa chỉ chưa có UTxO
+                break
+            raise
+        plain = [row for row in rows if _is_plain(row)]
+        utxos.extend(utxos_from_blockfrost(plain, address, policy_ids, asset_names))
+        if len(rows) < page_size:
+            break
+        page += 1
+    return utxos
+
+
+# ── Lập kế hoạch ──
+def bundle_key(utxo: UTxO) -> Tuple[bytes, ...]:
+    """Bộ asset của UTxO: các policy ID đã sắp xếp (rỗng = chỉ có ADA)"""
+    return tuple(sorted(policy.payload for policy in utxo.output.amount.multi_asset))
+
+
+def group_by_bundle(utxos: List[UTxO]) -> Dict[Tuple[bytes, ...], List[UTxO]]:
+    """Nhóm UTxO theo bộ asset"""
+    groups: Dict[Tuple[bytes, ...], List[UTxO]] = {}
+    for utxo in utxos:
+        groups.setdefault(bundle_key(utxo), []).append(utxo)
+    return groups
+
+
+def _chunks(utxos: List[UTxO], capacity: int, max_inputs: int) -> List[List[UTxO]]:
+    """
+    Chia UTxO (đã sắp theo bộ asset) thành các nhóm có kích thước ước lượng
+    không vượt `capacity` byte. Asset trùng trong một nhóm chỉ tính một lần
+    vì được gộp vào cùng output.
+    """
+    def extra_bytes(utxo: UTxO) -> int:
+        extra = _INPUT_BYTES
+        for policy, asset in utxo.output.amount.multi_asset.items():
+            if policy not in policies:
+                extra += _POLICY_BYTES
+            for name in asset:
+                if (policy, name) not in assets:
+                    extra += _ASSET_BYTES + len(name.payload)
+        return extra
+
+    chunks: List[List[UTxO]] = []
+    chunk: List[UTxO] = []
+    size = _TX_OVERHEAD_BYTES
+    policies: set = set()
+    assets: set = set()
+    for utxo in utxos:
+        extra = extra_bytes(utxo)
+        if chunk and (size + extra > capacity or (max_inputs and len(chunk) >= max_inputs)):
+            chunks.append(chunk)
+            chunk, size = [], _TX_OVERHEAD_BYTES
+            policies.clear()
+            assets.clear()
+            extra = extra_bytes(utxo)
+        chunk.append(utxo)
+        size += extra
+        for policy, asset in utxo.output.amount.multi_asset.items():
+            policies.add(policy)
+            assets.update((policy, name) for name in asset)
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def _asset_outputs(context: ChainContext, chunk: List[UTxO], address: Address) -> List[TransactionOutput]:
+    """
+    Gom native asset của `chunk` vào các output, mỗi output không vượt
+    `max_val_size` (kèm min ADA). Output thối lại khi đó chỉ còn ADA, builder
+    không phải tự tách một change output chứa hàng trăm asset.
+    """
+    merged = MultiAsset()
+    for utxo in chunk:
+        merged += utxo.output.amount.multi_asset
+    limit = int(context.protocol_param.max_val_size * TX_FILL_RATIO)
+    outputs: List[TransactionOutput] = []
+    current, size = MultiAsset(), 0
+    for policy in sorted(merged, key=lambda p: p.payload):
+        for name, quantity in merged[policy].items():
+            extra = _ASSET_BYTES + len(name.payload) + (0 if policy in current else _POLICY_BYTES)
+            if current and size + extra > limit:
+                outputs.append(TransactionOutput(address, Value(0, current)))
+                current, size = MultiAsset(), 0
+                extra = _ASSET_BYTES + len(name.payload) + _POLICY_BYTES
+            current.setdefault(policy, Asset())[name] = quantity
+            size += extra
+    if current:
+        outputs.append(TransactionOutput(address, Value(0, current)))
+    for output in outputs:
+        output.amount.coin = min_lovelace_post_alonzo(output, context)
+    return outputs
+
+
+def _build_chunk(
+    context: ChainContext,
+    chunk: List[UTxO],
+    address: Address,
+    signing_keys: List[SigningKey],
+    max_fee: Optional[int],
+    round_no: int,
+) -> Tuple[List[ConsolidationStep], List[UTxO]]:
+    """
+    Build một giao dịch gộp `chunk`; quá kích thước / quá phí / lỗi build thì
+    chia đôi và thử lại. Giao dịch không làm giảm số UTxO (ví dụ 2 input chứa
+    nhiều asset lại tách thành 2 output) bị bỏ.
+
+    Returns:
+        (các giao dịch build được, các UTxO không gộp được)
+    """
+    if len(chunk) < 2:
+        return [], list(chunk)
+    try:
+        builder = TransactionBuilder(context)
+        for utxo in chunk:
+            builder.add_input(utxo)
+        for output in _asset_outputs(context, chunk, address):
+            builder.add_output(output)
+        tx = builder.build_and_sign(signing_keys, change_address=address)
+        if len(tx.transaction_body.outputs) >= len(chunk):
+            return [], list(chunk)
+        if max_fee is None or tx.transaction_body.fee <= max_fee:
+            return [ConsolidationStep(round_no, chunk, tx)], []
+    except PyCardanoException:
+        pass
+    half = len(chunk) // 2
+    steps, left = _build_chunk(context, chunk[:half], address, signing_keys, max_fee, round_no)
+    more_steps, more_left = _build_chunk(context, chunk[half:], address, signing_keys, max_fee, round_no)
+    return steps + more_steps, left + more_left
+
+
+def plan_consolidation(
+    context: ChainContext,
+    utxos: List[UTxO],
+    address: Address,
+    signing_keys: List[SigningKey],
+    max_inputs: int = CONSOLIDATE_MAX_INPUTS,
+    max_fee: Optional[int] = None,
+    max_rounds: int = CONSOLIDATE_MAX_ROUNDS,
+) -> ConsolidationPlan:
+    """
+    Lập kế hoạch gộp UTxO thành ít giao dịch nhất vừa giới hạn kích thước / phí.
+
+    Args:
+        context: Chain context (lấy protocol params khi build)
+        utxos: UTxO cần gộp (ví dụ từ fetch_all_utxos)
+        address: Địa chỉ nhận output gộp (thường là chính ví)
+        signing_keys: Khóa ký các input
+        max_inputs: Số input tối đa mỗi giao dịch (0 = không giới hạn)
+        max_fee: Phí tối đa mỗi giao dịch (lovelace), None = không giới hạn
+        max_rounds: Số vòng gộp tối đa
+
+    Returns:
+        ConsolidationPlan gồm các giao dịch đã ký, theo từng vòng
+    """
+    capacity = int(context.protocol_param.max_tx_size * TX_FILL_RATIO)
+    plan = ConsolidationPlan()
+    pending = list(utxos)
+    for round_no in range(1, max_rounds + 1):
+        # UTxO cùng bộ asset đứng cạnh nhau → output gộp ít asset khác nhau nhất
+        ordered = [utxo for _, group in sorted(group_by_bundle(pending).items()) for utxo in group]
+        steps: List[ConsolidationStep] = []
+        remaining: List[UTxO] = []
+        for chunk in _chunks(ordered, capacity, max_inputs):
+            built, left = _build_chunk(context, chunk, address, signing_keys, max_fee, round_no)
+            steps.extend(built)
+            remaining.extend(left)
+        if not steps:
+            break
+        plan.rounds.append(steps)
+        pending = remaining + [utxo for step in steps for utxo in step.outputs()]
+    plan.result = pending
+    return plan
+
+
+# ── Submit ──
+def submit_plan(
+    context: ChainContext,
+    plan: ConsolidationPlan,
+    workers: int = CONSOLIDATE_SUBMIT_WORKERS,
+    on_submitted: Optional[Callable[[ConsolidationStep], None]] = None,
+) -> bool:
+    """
+    Submit kế hoạch theo từng vòng: song song trong một vòng, vòng sau được
+    gửi ngay khi node nhận hết vòng trước (chained qua mempool).
+
+    Returns:
+        True nếu mọi giao dịch được node nhận; nếu một giao dịch lỗi thì các
+        vòng sau không được gửi (chúng có thể tiêu output của giao dịch đó)
+    """
+    def submit(step: ConsolidationStep) -> ConsolidationStep:
+        try:
+            step.tx_hash = str(context.submit_tx(step.transaction))
+        except Exception as e:
+            step.error = str(e)
+        if on_submitted is not None:
+            on_submitted(step)
+        return step
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for steps in plan.rounds:
+            results = list(pool.map(submit, steps))
+            if any(step.error for step in results):
+                return False
+    return True
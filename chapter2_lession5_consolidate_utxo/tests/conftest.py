@@ -0,0 +1,98 @@
+"""
+Fixture cho test của consolidation.py.
+
+Chạy từ thư mục chapter2_lession5_consolidate_utxo:
+    python -m pytest tests
+"""
+import os
+import sys
+import threading
+from fractions import Fraction
+from typing import List, Optional
+
+import pytest
+from pycardano import *
+from pycardano.backend.base import GenesisParameters, ProtocolParameters
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROTOCOL_PARAMS = ProtocolParameters(
+    min_fee_constant=155381, min_fee_coefficient=44, max_block_size=90112, max_tx_size=16384,
+    max_block_header_size=1100, key_deposit=2000000, pool_deposit=500000000,
+    pool_influence=Fraction(3, 10), monetary_expansion=Fraction(3, 1000),
+    treasury_expansion=Fraction(1, 5), decentralization_param=Fraction(0), extra_entropy="",
+    protocol_major_version=9, protocol_minor_version=0, min_utxo=1000000, min_pool_cost=170000000,
+    price_mem=Fraction(577, 10000), price_step=Fraction(721, 10000000),
+    max_tx_ex_mem=14000000, max_tx_ex_steps=10000000000,
+    max_block_ex_mem=62000000, max_block_ex_steps=20000000000,
+    max_val_size=5000, collateral_percent=150, max_collateral_inputs=3,
+    coins_per_utxo_word=4310, coins_per_utxo_byte=4310, cost_models={},
+)
+
+
+class FakeChainContext(ChainContext):
+    """
+    ChainContext trong bộ nhớ: protocol params để build, ghi lại giao dịch được submit.
+
+    Args:
+        reject: Lỗi node trả về cho mọi lần submit (None = nhận hết)
+    """
+
+    def __init__(self, reject: Optional[str] = None):
+        self.reject = reject
+        self.submitted: List[Transaction] = []
+        # submit_plan gửi song song trong một vòng
+        self._lock = threading.Lock()
+
+    @property
+    def protocol_param(self):
+        return PROTOCOL_PARAMS
+
+    @property
+    def genesis_param(self):
+        return GenesisParameters(
+            active_slots_coefficient=0.05, update_quorum=5, max_lovelace_supply=45000000000000000,
+            network_magic=1, epoch_length=432000, system_start=1666656000, slots_per_kes_period=129600,
+            slot_length=1, max_kes_evolutions=62, security_param=2160,
+        )
+
+    @property
+    def network(self):
+        return Network.TESTNET
+
+    @property
+    def epoch(self):
+        return 300
+
+    @property
+    def last_block_slot(self):
+        return 50_000_000
+
+    def _utxos(self, address):
+        return []
+
+    def submit_tx_cbor(self, cbor):
+        if isinstance(cbor, str):
+            cbor = bytes.fromhex(cbor)
+        tx = Transaction.from_cbor(cbor)
+        with self._lock:
+            self.submitted.append(tx)
+        if self.reject is not None:
+            raise TransactionFailedException(self.reject)
+        # Như node: tx id là hash của transaction body
+        return str(tx.id)
+
+
+@pytest.fixture(scope="module")
+def context():
+    return FakeChainContext()
+
+
+@pytest.fixture(scope="module")
+def signing_key():
+    return PaymentSigningKey.generate()
+
+
+@pytest.fixture(scope="module")
+def address(signing_key):
+    return Address(signing_key.to_verification_key().hash(), network=Network.TESTNET)
@@ -0,0 +1,84 @@
+"""utxos_from_blockfrost / fetch_all_utxos: kết quả giống khi dựng UTxO bằng PyCardano, phân trang Blockfrost."""
+import hashlib
+from types import SimpleNamespace
+
+from blockfrost import ApiError
+from pycardano import *
+
+from consolidation import fetch_all_utxos, utxos_from_blockfrost
+
+POLICIES = [ScriptHash(hashlib.blake2b(f"policy-{i}".encode(), digest_size=28).digest()) for i in range(2)]
+
+
+def tx_hash(seed) -> str:
+    return hashlib.sha256(str(seed).encode()).hexdigest()
+
+
+def bf_row(index, amount, **extra):
+    return SimpleNamespace(
+        tx_hash=tx_hash(index),
+        output_index=index % 2,
+        amount=[SimpleNamespace(unit=unit, quantity=str(quantity)) for unit, quantity in amount],
+        **extra,
+    )
+
+
+def test_utxos_from_blockfrost_matches_pycardano_types(address):
+    unit = POLICIES[0].payload.hex() + b"token".hex()
+    rows = [
+        bf_row(0, [("lovelace", 2_000_000)]),
+        bf_row(1, [("lovelace", 3_000_000), (unit, 5), (POLICIES[1].payload.hex(), 1)]),
+    ]
+    expected_second = Value(3_000_000, MultiAsset({
+        POLICIES[0]: Asset({AssetName(b"token"): 5}),
+        POLICIES[1]: Asset({AssetName(b""): 1}),
+    }))
+    first, second = utxos_from_blockfrost(rows, address)
+    assert first.input == TransactionInput.from_primitive([tx_hash(0), 0])
+    assert first.output == TransactionOutput(address, Value(2_000_000))
+    assert second.input == TransactionInput.from_primitive([tx_hash(1), 1])
+    assert second.output.amount == expected_second
+    assert second.to_cbor() == UTxO(second.input, TransactionOutput(address, expected_second)).to_cbor()
+
+
+class PagedApi:
+    def __init__(self, rows):
+        self.rows = rows
+        self.pages = []
+
+    def address_utxos(self, address, count, page):
+        self.pages.append(page)
+        return self.rows[(page - 1) * count: page * count]
+
+
+def test_fetch_all_utxos_pages_and_skips_script_outputs(address):
+    rows = [bf_row(i, [("lovelace", 1_000_000)]) for i in range(25)]
+    rows[3].inline_datum = "d87980"
+    rows[7].reference_script_hash = POLICIES[0].payload.hex()
+    api = PagedApi(rows)
+    utxos = fetch_all_utxos(api, address, page_size=10)
+    assert api.pages == [1, 2, 3]
+    assert len(utxos) == 23
+
+
+def test_fetch_all_utxos_empty_address(address):
+    class EmptyApi:
+        def address_utxos(self, address, count, page):
+            raise ApiError(SimpleNamespace(status_code=404, text="", json=lambda: {}))
+
+    assert fetch_all_utxos(EmptyApi(), address) == []
+
+
+def test_fetch_all_utxos_interns_names_per_call(address):
+    unit = POLICIES[0].payload.hex() + b"token".hex()
+    rows = [bf_row(i, [("lovelace", 2_000_000), (unit, i + 1)]) for i in range(4)]
+    first = fetch_all_utxos(PagedApi(rows), address, page_size=2)
+    # Cùng một object ScriptHash / AssetName giữa các trang của một lần lấy
+    policies = {id(policy) for utxo in first for policy in utxo.output.amount.multi_asset}
+    names = {id(name) for utxo in first for asset in utxo.output.amount.multi_asset.values() for name in asset}
+    assert len(policies) == 1 and len(names) == 1
+
+    # Lần lấy sau không dùng lại (và không giữ) object của lần trước
+    second = fetch_all_utxos(PagedApi(rows), address, page_size=2)
+    assert second == first
+    assert next(iter(second[0].output.amount.multi_asset)) is not next(iter(first[0].output.amount.multi_asset))
@@ -0,0 +1,119 @@
+"""plan_consolidation: bảo toàn giá trị, mọi giao dịch vừa max_tx_size, cây giao dịch hợp lệ."""
+import hashlib
+
+import pytest
+from pycardano import *
+
+from conftest import FakeChainContext
+from consolidation import plan_consolidation, submit_plan
+
+POLICIES = [ScriptHash(hashlib.blake2b(f"policy-{i}".encode(), digest_size=28).digest()) for i in range(3)]
+
+
+def tx_hash(seed) -> str:
+    return hashlib.sha256(str(seed).encode()).hexdigest()
+
+
+def wallet_utxos(address, count):
+    """UTxO lẻ: phần lớn chỉ có ADA, một phần giữ native asset của 3 policy."""
+    utxos = []
+    for i in range(count):
+        value = Value(1_500_000 + i * 10_000)
+        if i % 4 == 0:
+            policy = POLICIES[i % len(POLICIES)]
+            value.multi_asset = MultiAsset({policy: Asset({AssetName(f"asset{i}".encode()): i + 1})})
+        utxos.append(UTxO(TransactionInput(TransactionId(bytes.fromhex(tx_hash(i))), i % 3), TransactionOutput(address, value)))
+    return utxos
+
+
+def total(values) -> Value:
+    result = Value(0)
+    for value in values:
+        result += value
+    return result
+
+
+@pytest.fixture(scope="module")
+def utxos(address):
+    return wallet_utxos(address, 40)
+
+
+@pytest.fixture(scope="module")
+def plan(context, utxos, address, signing_key):
+    # 10 input mỗi giao dịch → 4 giao dịch ở vòng 1, gộp tiếp ở vòng 2
+    return plan_consolidation(context, utxos, address, [signing_key], max_inputs=10)
+
+
+@pytest.fixture
+def fresh_plan(context, utxos, address, signing_key):
+    """Plan riêng cho test submit (submit ghi tx_hash / error vào từng step)."""
+    return plan_consolidation(context, utxos[:20], address, [signing_key], max_inputs=10)
+
+
+def test_value_is_conserved(plan, utxos):
+    before = total(utxo.output.amount for utxo in utxos)
+    after = total(utxo.output.amount for utxo in plan.result)
+    assert after.multi_asset == before.multi_asset
+    assert after.coin + plan.total_fee == before.coin
+
+
+def test_each_transaction_balances_and_fits(plan, context):
+    for step in plan.steps:
+        body = step.transaction.transaction_body
+        spent = total(utxo.output.amount for utxo in step.inputs)
+        created = total(output.amount for output in body.outputs)
+        assert spent.coin == created.coin + body.fee
+        assert spent.multi_asset == created.multi_asset
+        assert step.size <= context.protocol_param.max_tx_size
+        assert len(step.inputs) <= 10
+        assert len(body.outputs) < len(step.inputs)
+
+
+def test_plan_is_a_valid_transaction_tree(plan, utxos):
+    available = {utxo.input for utxo in utxos}
+    for steps in plan.rounds:
+        created = set()
+        for step in steps:
+            inputs = set(step.transaction.transaction_body.inputs)
+            assert inputs == {utxo.input for utxo in step.inputs}
+            # Chỉ tiêu UTxO ban đầu hoặc output của vòng trước, mỗi UTxO một lần
+            assert inputs <= available
+            available -= inputs
+            created.update(utxo.input for utxo in step.outputs())
+        available |= created
+    assert available == {utxo.input for utxo in plan.result}
+    assert len(plan.rounds) >= 2
+    assert len(plan.result) < 10
+
+
+def test_max_fee_splits_transactions(context, utxos, address, signing_key):
+    unlimited = plan_consolidation(context, utxos, address, [signing_key])
+    assert len(unlimited.rounds[0]) == 1
+    max_fee = 220_000
+    assert unlimited.steps[0].fee > max_fee
+
+    limited = plan_consolidation(context, utxos, address, [signing_key], max_fee=max_fee)
+    assert len(limited.rounds[0]) > 1
+    assert all(step.fee <= max_fee for step in limited.steps)
+
+
+def test_submit_plan_stops_after_failed_round(fresh_plan):
+    node = FakeChainContext(reject="BadInputsUTxO")
+
+    assert len(fresh_plan.rounds) == 2
+    assert not submit_plan(node, fresh_plan)
+    # Vòng 2 tiêu output của vòng 1 nên không được gửi
+    assert {tx.id for tx in node.submitted} == {step.transaction.id for step in fresh_plan.rounds[0]}
+    assert all(step.error == "BadInputsUTxO" for step in fresh_plan.rounds[0])
+    assert all(step.tx_hash is None for step in fresh_plan.steps)
+
+
+def test_submit_plan_submits_every_round(fresh_plan):
+    node = FakeChainContext()
+
+    assert submit_plan(node, fresh_plan)
+    assert {tx.id for tx in node.submitted} == {step.transaction.id for step in fresh_plan.steps}
+    # Vòng 2 chỉ được gửi sau khi node nhận hết vòng 1
+    first_round = {step.transaction.id for step in fresh_plan.rounds[0]}
+    assert {tx.id for tx in node.submitted[:len(first_round)]} == first_round
+    assert all(step.tx_hash == str(step.transaction.id) for step in fresh_plan.steps)
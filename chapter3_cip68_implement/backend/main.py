@@ -27,6 +27,7 @@ Tạo unsigned transactions để frontend ký bằng browser wallet.
 import os
 import sys
 import json
+import asyncio
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 
@@ -34,10 +35,12 @@ from contextlib import asynccontextmanager
 
 # FastAPI và các mô hình dữ liệu
 # dùng để xây dựng API và xử lý các yêu cầu HTTP
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, Header, HTTPException, Query
 
 # Cors middleware để cho phép truy cập từ frontend
 from fastapi.middleware.cors import CORSMiddleware
+# StreamingResponse cho các endpoint trả dữ liệu dạng stream (NDJSON)
+from fastapi.responses import StreamingResponse
 
 # Pydantic để định nghĩa các mô hình dữ liệu
 from pydantic import BaseModel, Field
@@ -66,13 +69,35 @@ from offchain.cip68_utils import (
     load_store_script,
     extract_owner_from_datum,
 )
+# Index reference tokens tại store address
+from offchain.datum_cache import datum_cache
+from offchain.store_index import IndexedToken, StoreIndex
+# Follow block mới, chỉ áp dụng delta của store address
+from offchain.chain_follower import CHAIN_FOLLOWER_POLL_SECONDS, ChainFollower, JSONCheckpoint
+# Truy cập chain không chặn event loop
+from offchain.async_chain import AsyncChainContext
+# Cache UTxO / protocol params / epoch trước Blockfrost
+from offchain.chain_cache import CachedChainContext
+from offchain.ex_units import ExUnitsCache
+# Giữ chỗ input giữa các build đồng thời từ cùng một ví
+from offchain.utxo_leases import UTxOLeaseManager
+# Reference scripts: tham chiếu script đã deploy thay vì đính kèm bytes
+from offchain.reference_scripts import REFERENCE_SCRIPT_ADDRESS, find_reference_scripts, script_source
+# Đóng gói nhiều thao tác CIP-68 vào ít giao dịch
+from offchain.cip68_batch import build_batch_mint_transactions, build_batch_update_transactions
+# Sự kiện minted / updated / burned cho /api/events
+from offchain.token_events import TokenEventFeed
+# Hàng đợi submit + theo dõi xác nhận giao dịch
+from offchain.tx_tracker import FINAL_STATUSES, TX_POLL_SECONDS, TxTracker
 
 # Load environment variables
 load_dotenv()
 
 # Khai báo biến toàn cục
 
-chain_context: Optional [BlockFrostChainContext] = None
+chain_context: Optional [CachedChainContext] = None
+# Mọi lời gọi chain (utxos, build, submit) từ endpoint đi qua async_chain
+async_chain: Optional[AsyncChainContext] = None
 
 blueprint_path: Optional[str] = None
 network: Network = Network.TESTNET
@@ -80,6 +105,20 @@ mint_script: Optional[PlutusV3Script] = None
 store_script: Optional[PlutusV3Script] = None
 policy_id: Optional[ScriptHash] = None
 store_address: Optional[Address] = None
+# Script hash -> UTxO chứa reference script (rỗng = đính kèm script)
+reference_scripts: Dict[ScriptHash, UTxO] = {}
+# Index base token name -> (UTxO, CIP68Datum), nạp trong lifespan
+store_index: Optional[StoreIndex] = None
+# Follower cập nhật store index theo block mới (checkpoint lưu ra file)
+chain_follower: Optional[ChainFollower] = None
+# Feed sự kiện token (handler của chain follower), dùng chung cho mọi client SSE
+token_events: Optional[TokenEventFeed] = None
+# Hàng đợi submit và poller xác nhận dùng chung cho các giao dịch đã submit
+tx_tracker: Optional[TxTracker] = None
+# Chu kỳ (giây) gửi keep-alive trên các endpoint SSE khi chưa có thay đổi
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+# File checkpoint của follower (mặc định cạnh plutus.json)
+CHAIN_CHECKPOINT_PATH = os.getenv("CHAIN_CHECKPOINT_PATH")
 
 # PYDANTIC MODELS
 # Pydantic models dùng để xác định cấu trúc dữ liệu cho các yêu cầu và phản hồi API
@@ -92,6 +131,20 @@ class MintRequest(BaseModel):
     token_name: str = Field(..., min_length=1, max_length=32, description="Tên token")
     description: str = Field(..., min_length=1, max_length=256, description="Mô tả của NFT")
 
+# Model của một item trong yêu cầu batch mint
+# Dùng cho endpoint /api/mint/batch
+class BatchMintItem(BaseModel):
+    """One token in a batch mint request."""
+    token_name: str = Field(..., min_length=1, max_length=32, description="Tên token")
+    description: str = Field(..., min_length=1, max_length=256, description="Mô tả của NFT")
+
+# Model của yêu cầu batch mint
+# Mint nhiều cặp CIP-68 cho cùng một ví, đóng gói vào ít giao dịch nhất có thể
+class BatchMintRequest(BaseModel):
+    """Request model for minting many CIP-68 tokens."""
+    wallet_address: str = Field(..., description="Địa chỉ ví của người dùng")
+    items: List[BatchMintItem] = Field(..., min_length=1, max_length=500, description="Danh sách token cần mint")
+
 # Model của yêu cầu cập nhật metadata
 # Dùng cho endpoint /api/update
 # Mô hình này xác định các trường cần thiết để cập nhật metadata của một CIP-68 token.
@@ -102,6 +155,19 @@ class UpdateRequest(BaseModel):
     token_name: str = Field(..., description="Tên token")
     new_description: str = Field(..., min_length=1, max_length=256, description="Mô tả mới")
 
+# Model một token trong yêu cầu batch update
+class BatchUpdateItem(BaseModel):
+    """One token in a batch update request."""
+    token_name: str = Field(..., min_length=1, max_length=32, description="Tên token")
+    new_description: str = Field(..., min_length=1, max_length=256, description="Mô tả mới")
+
+# Model của yêu cầu batch update
+# Update metadata của nhiều token cùng owner, đóng gói vào ít giao dịch nhất có thể
+class BatchUpdateRequest(BaseModel):
+    """Request model for updating metadata of many CIP-68 tokens."""
+    wallet_address: str = Field(..., description="Địa chỉ ví của owner")
+    items: List[BatchUpdateItem] = Field(..., min_length=1, max_length=5000, description="Danh sách token cần update")
+
 # Model của yêu cầu burn asset
 # Dùng cho endpoint /api/burn
 # Mô hình này xác định các trường cần thiết để đốt một CIP-68 token.
@@ -134,6 +200,23 @@ class TransactionResponse(BaseModel):
 # Frontend sẽ gửi lại witness set chứa chữ ký ví (vkey_witnesses)
 # Backend sẽ hợp nhất witness set này vào transaction gốc và submit lên blockchain
 
+# Model một giao dịch trong phản hồi batch
+# token_names: các token được xử lý trong giao dịch này
+class BatchTransactionItem(BaseModel):
+    """One unsigned transaction of a batch."""
+    tx_cbor: str
+    token_names: List[str]
+
+# Model phản hồi batch
+# Các giao dịch được nối chuỗi (giao dịch sau spend change của giao dịch trước)
+# nên frontend ký tất cả rồi submit lần lượt theo đúng thứ tự
+class BatchTransactionResponse(BaseModel):
+    """Response model containing a chain of unsigned transactions."""
+    success: bool
+    message: str
+    transactions: List[BatchTransactionItem] = []
+    policy_id: Optional[str] = None
+
 class SubmitRequest(BaseModel):
     """Request model for submitting signed transaction."""
     tx_cbor: str = Field(..., description="CBOR hex của unsigned transaction")
@@ -148,6 +231,23 @@ class SubmitResponse(BaseModel):
     success: bool
     message: str
     tx_hash: Optional[str] = None
+    status: Optional[str] = None
+
+# Model trạng thái giao dịch
+# Dùng cho endpoint /api/tx/{tx_hash}
+# queued → submitted → in_block → confirmed, hoặc failed / rolled_back
+class TxStatusResponse(BaseModel):
+    """Response model for transaction status."""
+    tx_hash: str
+    status: str
+    confirmations: int = 0
+    block_height: Optional[int] = None
+    block_hash: Optional[str] = None
+    invalid_hereafter: Optional[int] = None
+    error: Optional[str] = None
+    created_at: float
+    submitted_at: Optional[float] = None
+    updated_at: float
 # Model phản hồi truy vấn metadata
 # Dùng cho endpoint /api/metadata/{token_name}
 # Mô hình này định nghĩa cấu trúc phản hồi khi truy vấn metadata của một CIP
@@ -176,12 +276,34 @@ class WalletInfoResponse(BaseModel):
 # Quản lý vòng đời ứng dụng FastAPI
 # Sử dụng asynccontextmanager để thiết lập và 
 # dọn dẹp tài nguyên khi ứng dụng khởi động và tắt.
+# Vòng lặp nền follow block mới, áp dụng delta vào store index
+async def follow_chain_loop():
+    """Background task: chain follower cho store address."""
+    while True:
+        await asyncio.sleep(CHAIN_FOLLOWER_POLL_SECONDS)
+        try:
+            applied = await async_chain.run(chain_follower.poll)
+            if applied:
+                print(f"Chain follower: applied {applied} tx(s), {len(store_index)} tokens")
+        except Exception as e:
+            print(f"Chain follower poll failed: {e}")
+
+# Vòng lặp nền: một poller xác nhận cho mọi giao dịch đang chờ
+async def track_transactions_loop():
+    """Background task: confirmation poller của tx tracker."""
+    while True:
+        await asyncio.sleep(TX_POLL_SECONDS)
+        try:
+            await tx_tracker.poll_async(async_chain)
+        except Exception as e:
+            print(f"Transaction tracker poll failed: {e}")
+
 @asynccontextmanager
 # Xử lý vòng đời ứng dụng FastAPI
 async def lifespan(app: FastAPI):
     """Application lifespan handler."""
     # Khai báo biến toàn cục
-    global chain_context, mint_script, store_script, network, policy_id, store_address
+    global chain_context, async_chain, mint_script, store_script, network, policy_id, store_address, store_index, reference_scripts, chain_follower, tx_tracker, token_events
     # Startup
     print("Starting CIP-68 Backend API (Simplified)...")
     # Khởi tạo Chain Context
@@ -193,10 +315,17 @@ async def lifespan(app: FastAPI):
     else:
         blockfrost_url = ApiUrls.mainnet.value
 
-    chain_context = BlockFrostChainContext(
-        project_id=blockfrost_key,
-        base_url=blockfrost_url
+    # Bọc Blockfrost bằng cache (UTxO TTL ngắn, protocol params theo epoch)
+    chain_context = CachedChainContext(
+        BlockFrostChainContext(
+            project_id=blockfrost_key,
+            base_url=blockfrost_url
+        )
     )
+    async_chain = AsyncChainContext(chain_context, leases=UTxOLeaseManager())
+    tx_tracker = TxTracker(chain_context)
+    tx_tracker.start(async_chain)
+    tracker_task = asyncio.create_task(track_transactions_loop())
 
     # thiêt lập đường dẫn đến blueprint
     global blueprint_path
@@ -214,6 +343,8 @@ async def lifespan(app: FastAPI):
         store_script = load_store_script(blueprint_path)
         policy_id =get_policy_id(mint_script)
         store_address = get_script_address(store_script,network)
+        # Cache ex-units của redeemer: build lặp lại không phải evaluate script
+        async_chain.ex_units = ExUnitsCache.from_blueprint(blueprint_path)
         print(f"Policy ID: {policy_id}")
         print(f"Store Address: {store_address}")
     else:
@@ -221,10 +352,43 @@ async def lifespan(app: FastAPI):
         blueprint_path = None
     print(f"Connected to {network_str} network")
 
+    # Tìm reference scripts đã deploy (một lần khi khởi động)
+    if mint_script and REFERENCE_SCRIPT_ADDRESS:
+        reference_scripts = await async_chain.run(
+            find_reference_scripts, chain_context, REFERENCE_SCRIPT_ADDRESS, [mint_script, store_script]
+        )
+        print(f"Reference scripts: {len(reference_scripts)} found at {REFERENCE_SCRIPT_ADDRESS}")
+
+    # Nạp store index (từ checkpoint nếu có), sau đó chỉ áp dụng delta ở background
+    refresh_task = None
+    if store_address:
+        store_index = StoreIndex(chain_context, store_address, policy_id)
+        checkpoint_path = CHAIN_CHECKPOINT_PATH or os.path.join(
+            os.path.dirname(blueprint_path), 'chain_checkpoint.json'
+        )
+        token_events = TokenEventFeed(store_address, policy_id)
+        token_events.bind()
+        chain_follower = ChainFollower(
+            chain_context,
+            [store_address],
+            {"store_index": store_index, "token_events": token_events},
+            checkpoint=JSONCheckpoint(checkpoint_path),
+        )
+        restored = await async_chain.run(chain_follower.start)
+        source = "checkpoint" if restored else "store address"
+        print(f"Store index loaded from {source}: {len(store_index)} reference tokens "
+              f"(block {chain_follower.cursor[0]})")
+        refresh_task = asyncio.create_task(follow_chain_loop())
+
     yield
     
     # Shutdown
     print("Shutting down CIP-68 Backend API...")
+    if refresh_task:
+        refresh_task.cancel()
+    tracker_task.cancel()
+    await tx_tracker.stop()
+    async_chain.shutdown()
 
 
 # ============================================================================
@@ -319,16 +483,37 @@ async def get_script_info():
         "policy_id": str(policy_id) if policy_id else None,
         "store_hash": str(store_script),
         "store_address": str(store_address) if store_address else None,
+        "reference_scripts": {
+            str(hash_): f"{utxo.input.transaction_id}#{utxo.input.index}"
+            for hash_, utxo in reference_scripts.items()
+        },
         "network": os.getenv("NETWORK", "Preprod"),
         "message": "Using non-parameterized contracts (fixed policy ID)"
     }
+# Endpoint xem hit/miss của chain cache
+@app.get("/api/cache-stats")
+async def get_cache_stats():
+    """Thống kê hit/miss của CachedChainContext, ExUnitsCache và datum cache."""
+    if not chain_context:
+        raise HTTPException(status_code=500, detail="Chain context not initialized")
+    stats = chain_context.stats()
+    if async_chain.ex_units is not None:
+        stats["ex_units"] = async_chain.ex_units.stats()
+    stats["utxo_leases"] = async_chain.leases.stats()
+    if chain_follower is not None:
+        stats["chain_follower"] = chain_follower.stats()
+    stats["datum_cache"] = datum_cache.stats()
+    stats["tx_tracker"] = tx_tracker.stats()
+    if token_events is not None:
+        stats["token_events"] = token_events.stats()
+    return stats
 # Endpoint lấy thông tin ví
 @app.get("/api/wallet/{address}", response_model=WalletInfoResponse)
 async def get_wallet_info(address: str):
     """Lấy thông tin ví."""
     try:
         addr = Address.from_primitive(address)
-        utxos = chain_context.utxos(addr)
+        utxos = await async_chain.utxos(addr)
         total_lovelace = sum(utxo.output.amount.coin for utxo in utxos)
         # Collect assets
         assets = []
@@ -369,7 +554,7 @@ async def create_mint_transaction(request: MintRequest):
         owner_address = Address.from_primitive(request.wallet_address)
         owner_pkh = owner_address.payment_part.to_primitive()
         # Get UTxOs
-        utxos = chain_context.utxos(owner_address)
+        utxos = await async_chain.utxos(owner_address)
         if not utxos:
             raise HTTPException(status_code=400, detail="Ví không có UTxO nào!")
 
@@ -419,7 +604,7 @@ async def create_mint_transaction(request: MintRequest):
         # Mint tokens
         builder.mint = mint_assets
 
-        builder.add_minting_script(mint_script, redeemer=redeemer)
+        builder.add_minting_script(script_source(mint_script, reference_scripts), redeemer=redeemer)
 
         # Output: Reference token to store script
         builder.add_output(
@@ -437,11 +622,8 @@ async def create_mint_transaction(request: MintRequest):
         # Transaction object bao gồm body và witness set
         # tx_body: TransactionBody chứa các inputs, outputs, mint, fee, ttl, ...
         # witness_set: TransactionWitnessSet chứa scripts, redeemers, datums (chưa có vkey)
-        # Build transaction body
-        tx_body = builder.build(change_address=owner_address)
-        witness_set = builder.build_witness_set()
-
-        tx = Transaction(tx_body, witness_set)
+        # Build transaction (chạy trong chain I/O thread pool)
+        tx = await async_chain.build_transaction(builder, owner_address)
         tx_cbor = tx.to_cbor().hex()
 
         return TransactionResponse(
@@ -460,6 +642,61 @@ async def create_mint_transaction(request: MintRequest):
             success=False,
             message=f"Error creating transaction: {str(e)}"
         )
+# Endpoint tạo các giao dịch batch mint
+# Đóng gói nhiều cặp (100)/(222) vào mỗi giao dịch theo giới hạn tx size / ex-units
+@app.post("/api/mint/batch", response_model=BatchTransactionResponse)
+async def create_batch_mint_transactions(request: BatchMintRequest):
+    """
+    Tạo chuỗi unsigned transactions để mint nhiều CIP-68 NFT.
+    
+    Mỗi giao dịch mint nhiều cặp token với một MintToken redeemer.
+    """
+    try:
+        if not mint_script or not store_script:
+            raise HTTPException(status_code=500, detail="Scripts not loaded")
+        # Kiểm tra tên token trùng lặp hoặc đã tồn tại
+        names = [item.token_name for item in request.items]
+        if len(set(names)) != len(names):
+            raise HTTPException(status_code=400, detail="Duplicate token names in batch")
+        existing = [name for name in names if store_index.get(name)]
+        if existing:
+            raise HTTPException(status_code=400, detail=f"Tokens already minted: {', '.join(existing)}")
+        # Parse wallet address
+        owner_address = Address.from_primitive(request.wallet_address)
+
+        batch = await async_chain.run(
+            build_batch_mint_transactions,
+            chain_context,
+            owner_address,
+            [(item.token_name, item.description) for item in request.items],
+            script_source(mint_script, reference_scripts),
+            policy_id,
+            store_address,
+            # Qua cache ex-units và lease input như /api/mint
+            build=async_chain.build_transaction_sync,
+            discard=async_chain.discard_transaction,
+        )
+        return BatchTransactionResponse(
+            success=True,
+            message=f"{len(batch)} unsigned transaction(s) created, sign all and submit in order",
+            transactions=[
+                BatchTransactionItem(
+                    tx_cbor=item.transaction.to_cbor().hex(),
+                    token_names=item.token_names,
+                )
+                for item in batch
+            ],
+            policy_id=str(policy_id),
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return BatchTransactionResponse(
+            success=False,
+            message=f"Error creating batch mint transactions: {str(e)}"
+        )
 # Endpoint tạo giao dịch update metadata
 @app.post("/api/update", response_model=TransactionResponse)
 async def create_update_transaction (request: UpdateRequest):
@@ -484,21 +721,14 @@ async def create_update_transaction (request: UpdateRequest):
         token_name_bytes = request.token_name.encode('utf-8')
 
         ref_asset_name = AssetName(CIP68_REFERENCE_PREFIX + token_name_bytes)
-        # Find reference token UTxO
-        utxos = chain_context.utxos(store_address)
-        ref_utxo = None
-        for utxo in utxos:
-            if utxo.output.amount.multi_asset:
-                for pid, assets in utxo.output.amount.multi_asset.items():
-                    if pid == policy_id and ref_asset_name in assets:
-                        ref_utxo = utxo
-                        break
-        
-        if not ref_utxo:
+        # Find reference token UTxO (O(1) qua store index)
+        entry = store_index.get(token_name_bytes)
+        if not entry:
             raise HTTPException(status_code=404, detail="Reference token not found")
+        ref_utxo = entry.utxo
     
         # Get current datum and verify owner
-        current_datum = ref_utxo.output.datum
+        current_datum = entry.datum
         new_version = 2
         if isinstance(current_datum, CIP68Datum):
             current_owner = extract_owner_from_datum(current_datum)
@@ -522,7 +752,7 @@ async def create_update_transaction (request: UpdateRequest):
         # Spend reference token UTxO
         builder.add_script_input(
             ref_utxo,
-            store_script,
+            script_source(store_script, reference_scripts),
             redeemer=redeemer
         )
         # Output: Reference token back to store script
@@ -538,11 +768,8 @@ async def create_update_transaction (request: UpdateRequest):
          # Required signers
         builder.required_signers = [owner_address.payment_part]
 
-        # Build transaction body
-        tx_body = builder.build(change_address=owner_address)
-        # Build witness set (without vkey - wallet provides signature)
-        witness_set = builder.build_witness_set()
-        tx = Transaction(tx_body, witness_set)
+        # Build transaction body + witness set (without vkey - wallet provides signature)
+        tx = await async_chain.build_transaction(builder, owner_address)
         tx_cbor = tx.to_cbor().hex()
         return TransactionResponse(
             success=True,
@@ -559,6 +786,65 @@ async def create_update_transaction (request: UpdateRequest):
             success=False,
             message=f"Error creating update transaction: {str(e)}"
         )
+# Endpoint tạo các giao dịch batch update metadata
+# Spend nhiều reference UTxO cùng owner trong mỗi giao dịch theo giới hạn tx size / ex-units
+@app.post("/api/update/batch", response_model=BatchTransactionResponse)
+async def create_batch_update_transactions(request: BatchUpdateRequest):
+    """
+    Tạo chuỗi unsigned transactions để update metadata của nhiều CIP-68 NFT.
+    
+    Mỗi reference token được trả lại store script với datum mới và version + 1.
+    """
+    try:
+        if not store_script:
+            raise HTTPException(status_code=500, detail="Store script not loaded")
+        names = [item.token_name for item in request.items]
+        if len(set(names)) != len(names):
+            raise HTTPException(status_code=400, detail="Duplicate token names in batch")
+        # Parse wallet address
+        owner_address = Address.from_primitive(request.wallet_address)
+        owner_pkh = owner_address.payment_part.to_primitive()
+
+        # Tìm reference UTxO và kiểm tra owner (O(1) mỗi token qua store index)
+        update_items = []
+        for item in request.items:
+            entry = store_index.get(item.token_name)
+            if not entry:
+                raise HTTPException(status_code=404, detail=f"Reference token not found: {item.token_name}")
+            if entry.datum is None or extract_owner_from_datum(entry.datum) != owner_pkh:
+                raise HTTPException(status_code=403, detail=f"You are not the owner of this NFT: {item.token_name}")
+            update_items.append((item.token_name, entry.utxo, entry.datum.version, item.new_description))
+
+        batch = await async_chain.run(
+            build_batch_update_transactions,
+            chain_context,
+            owner_address,
+            update_items,
+            script_source(store_script, reference_scripts),
+            policy_id,
+            store_address,
+            build=async_chain.build_transaction_sync,
+            discard=async_chain.discard_transaction,
+        )
+        return BatchTransactionResponse(
+            success=True,
+            message=f"{len(batch)} unsigned transaction(s) created, sign all and submit in order",
+            transactions=[
+                BatchTransactionItem(
+                    tx_cbor=item.transaction.to_cbor().hex(),
+                    token_names=item.token_names,
+                )
+                for item in batch
+            ],
+            policy_id=str(policy_id),
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        return BatchTransactionResponse(
+            success=False,
+            message=f"Error creating batch update transactions: {str(e)}"
+        )
 @app.post("/api/burn", response_model=TransactionResponse)
 async def create_burn_transaction(request: BurnRequest):
     """
@@ -576,27 +862,20 @@ async def create_burn_transaction(request: BurnRequest):
         token_name_bytes = request.token_name.encode('utf-8')
         ref_asset_name, user_asset_name = create_cip68_asset_names(token_name_bytes)
 
-         # Find reference token UTxO
-        store_utxos = chain_context.utxos(store_address)
-        ref_utxo = None
-        for utxo in store_utxos:
-            if utxo.output.amount.multi_asset:
-                for pid, assets in utxo.output.amount.multi_asset.items():
-                    if pid == policy_id and ref_asset_name in assets:
-                        ref_utxo = utxo
-                        break
-        
-        if not ref_utxo:
+         # Find reference token UTxO (O(1) qua store index)
+        entry = store_index.get(token_name_bytes)
+        if not entry:
             raise HTTPException(status_code=404, detail="Reference token not found")
+        ref_utxo = entry.utxo
         # Verify owner from datum
-        current_datum = ref_utxo.output.datum
+        current_datum = entry.datum
 
         if isinstance(current_datum, CIP68Datum):
             current_owner = extract_owner_from_datum(current_datum)
             if current_owner != owner_pkh:
                 raise HTTPException(status_code=403, detail="You are not the owner of this NFT")
         # Find user token UTxO
-        owner_utxos = chain_context.utxos(owner_address)
+        owner_utxos = await async_chain.utxos(owner_address)
         user_utxo = None
         for utxo in owner_utxos:
             if utxo.output.amount.multi_asset:
@@ -626,7 +905,7 @@ async def create_burn_transaction(request: BurnRequest):
           # Spend reference token
         builder.add_script_input(
             ref_utxo,
-            store_script,
+            script_source(store_script, reference_scripts),
             redeemer=spend_redeemer
         )
         # Add user token input
@@ -634,16 +913,13 @@ async def create_burn_transaction(request: BurnRequest):
          # Burn tokens
         builder.mint = burn_assets
 
-        builder.add_minting_script(mint_script, redeemer=mint_redeemer)
+        builder.add_minting_script(script_source(mint_script, reference_scripts), redeemer=mint_redeemer)
 
         # Required signers
         builder.required_signers = [owner_address.payment_part]
 
-        # Build transaction body
-        tx_body = builder.build(change_address=owner_address)
-         # Build witness set (without vkey - wallet provides signature)
-        witness_set = builder.build_witness_set()
-        tx = Transaction(tx_body, witness_set)
+        # Build transaction body + witness set (without vkey - wallet provides signature)
+        tx = await async_chain.build_transaction(builder, owner_address)
         tx_cbor = tx.to_cbor().hex()
         return TransactionResponse(
             success=True,
@@ -672,6 +948,7 @@ async def submit_transaction(request: SubmitRequest):
     Submit signed transaction to blockchain.
     Merge witnesses using proper PyCardano types with NonEmptyOrderedSet.
     """
+    backend_tx = None
     try:
         # 1. Load lại Transaction gốc từ CBOR (chứa Body + Scripts/Redeemers do Backend tạo)
         # Lưu ý: backend_tx này chưa có chữ ký ví (vkey_witnesses)
@@ -695,22 +972,112 @@ async def submit_transaction(request: SubmitRequest):
                 final_witness_set.vkey_witnesses = wallet_witness.vkey_witnesses
         # 4. Gán ngược lại vào Transaction
         backend_tx.transaction_witness_set = final_witness_set
-        # 5. Submit
-        # Quan trọng: Dùng backend_tx.to_cbor() để đảm bảo cấu trúc Body giữ nguyên
-        tx_hash = chain_context.submit_tx_cbor(backend_tx.to_cbor())
+        # 5. Submit qua hàng đợi, sau đó poller theo dõi xác nhận
+        # Quan trọng: tx_tracker submit backend_tx.to_cbor() để đảm bảo cấu trúc Body giữ nguyên
+        tracked = await tx_tracker.submit(backend_tx)
+        # Input đã tiêu: tiếp tục loại trừ cho tới khi UTxO set cập nhật
+        async_chain.leases.release(backend_tx.id, spent=True)
         
         return SubmitResponse(
                     success=True,
                     message="Transaction submitted successfully",
-                    tx_hash=str(tx_hash)
+                    tx_hash=tracked.tx_hash,
+                    status=tracked.status
                 )
     except Exception as e:
         import traceback
         traceback.print_exc()
+        # Ex-units lấy từ cache có thể đã lỗi thời → đo lại ở lần build sau
+        if backend_tx is not None and async_chain.ex_units is not None:
+            async_chain.ex_units.forget(backend_tx.transaction_body.id)
+        # Giải phóng input để build khác có thể dùng
+        if backend_tx is not None:
+            async_chain.leases.release(backend_tx.id)
         return SubmitResponse(
             success=False,
             message=f"Error submitting transaction: {str(e)}"
         )
+# Endpoint trạng thái giao dịch đã submit qua /api/submit
+@app.get("/api/tx/{tx_hash}", response_model=TxStatusResponse)
+async def get_transaction_status(tx_hash: str):
+    """Trạng thái hiện tại của giao dịch (queued / submitted / in_block / confirmed / failed / rolled_back)."""
+    tracked = tx_tracker.get(tx_hash) if tx_tracker else None
+    if tracked is None:
+        raise HTTPException(status_code=404, detail=f"Transaction {tx_hash} is not tracked")
+    return TxStatusResponse(**tracked.to_dict())
+
+# Endpoint đẩy trạng thái giao dịch dạng Server-Sent Events
+@app.get("/api/tx/{tx_hash}/events")
+async def stream_transaction_status(tx_hash: str):
+    """
+    Stream trạng thái giao dịch (SSE): gửi trạng thái hiện tại, sau đó mỗi lần
+    trạng thái hoặc số confirmations thay đổi, kết thúc khi confirmed / failed.
+    """
+    if not tx_tracker or tx_tracker.get(tx_hash) is None:
+        raise HTTPException(status_code=404, detail=f"Transaction {tx_hash} is not tracked")
+    # Đăng ký trước khi đọc trạng thái để không lỡ thay đổi ở giữa
+    queue = tx_tracker.subscribe(tx_hash)
+
+    async def generate():
+        try:
+            state = tx_tracker.get(tx_hash).to_dict()
+            yield f"event: status\ndata: {json.dumps(state)}\n\n"
+            while state["status"] not in FINAL_STATUSES:
+                try:
+                    state = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Giữ kết nối qua proxy khi chưa có thay đổi
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: status\ndata: {json.dumps(state)}\n\n"
+        finally:
+            tx_tracker.unsubscribe(tx_hash, queue)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Endpoint đẩy sự kiện minted / updated / burned dạng Server-Sent Events
+@app.get("/api/events")
+async def stream_token_events(
+    last_event_id: Optional[str] = Header(None, description="Id sự kiện cuối đã nhận (EventSource tự gửi khi kết nối lại)"),
+):
+    """
+    Stream sự kiện thay đổi CIP-68 token (SSE).
+    Mọi client đọc chung một feed do chain follower cập nhật, không poll Blockfrost riêng.
+    Sự kiện `reset` báo client đã lỡ sự kiện và nên tải lại /api/tokens.
+    """
+    if not token_events:
+        raise HTTPException(status_code=500, detail="Store address not initialized")
+    try:
+        last_id = int(last_event_id) if last_event_id else token_events.last_id
+    except ValueError:
+        last_id = token_events.last_id
+
+    async def generate():
+        nonlocal last_id
+        _, missed = token_events.since(last_id)
+        if missed or last_id > token_events.last_id:
+            last_id = token_events.last_id
+            yield f"id: {last_id}\nevent: reset\ndata: {{}}\n\n"
+        while True:
+            events = await token_events.wait(last_id, timeout=SSE_KEEPALIVE_SECONDS)
+            if not events:
+                # Giữ kết nối qua proxy khi chưa có sự kiện
+                yield ": keep-alive\n\n"
+                continue
+            for event_id, event in events:
+                yield f"id: {event_id}\nevent: {event['event']}\ndata: {json.dumps(event)}\n\n"
+            last_id = events[-1][0]
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # Endpoint lấy metadata hiện tại của token
 @app.get("/api/metadata/{token_name}", response_model=MetadataResponse)
 async def get_metadata(token_name: str):
@@ -721,76 +1088,23 @@ async def get_metadata(token_name: str):
     """
     try:
         
-        if not store_address:
+        if store_index is None:
             raise HTTPException(status_code=500, detail="Store address not initialized")
         
-        # Create asset name
-        token_name_bytes = token_name.encode('utf-8')
-        ref_asset_name = AssetName(CIP68_REFERENCE_PREFIX + token_name_bytes)
-        
-        print(f"\n=== METADATA FETCH DEBUG ===")
-        print(f"Token name: {token_name}")
-        print(f"Looking for ref asset: {ref_asset_name.payload.hex()}")
-        
-        # Find reference token UTxO
-        utxos = chain_context.utxos(store_address)
-        print(f"Found {len(utxos)} UTxOs at store address")
-        
-        for utxo in utxos:
-            if utxo.output.amount.multi_asset:
-                for p, assets in utxo.output.amount.multi_asset.items():
-                    print(f"Policy: {p.payload.hex()}")
-                    for asset_name, qty in assets.items():
-                        print(f"  Asset: {asset_name.payload.hex()} = {qty}")
-                    
-                    if p == policy_id and ref_asset_name in assets:
-                        print(f"✅ Found matching NFT!")
-                        datum = utxo.output.datum
-                        print(f"Datum type: {type(datum)}")
-                        
-                        # If datum is RawCBOR, deserialize it
-                        if isinstance(datum, RawCBOR):
-                            try:
-                                datum = CIP68Datum.from_cbor(datum.cbor)
-                                print(f"Deserialized to CIP68Datum")
-                            except Exception as e:
-                                print(f"Failed to deserialize datum: {e}")
-                                continue
-                        
-                        if isinstance(datum, CIP68Datum):
-                            # Convert bytes keys and values to strings
-                            metadata = {}
-                            for k, v in datum.metadata.items():
-                                # Decode key
-                                key = k.decode('utf-8') if isinstance(k, bytes) else str(k)
-                                
-                                # Decode value - handle various types
-                                if isinstance(v, bytes):
-                                    value = v.decode('utf-8')
-                                elif hasattr(v, 'to_primitive'):
-                                    # PlutusData object
-                                    prim = v.to_primitive()
-                                    if isinstance(prim, bytes):
-                                        value = prim.decode('utf-8')
-                                    else:
-                                        value = str(prim)
-                                else:
-                                    value = str(v)
-                                    
-                                metadata[key] = value
-                            
-                            print(f"Metadata extracted: {metadata}")
-                            return MetadataResponse(
-                                success=True,
-                                message="Metadata found",
-                                metadata=metadata,
-                                version=datum.version
-                            )
-        
-        print(f"❌ NFT not found")
+        # Find reference token (O(1) qua store index)
+        entry = store_index.get(token_name)
+        if not entry or entry.decoded is None:
+            return MetadataResponse(
+                success=False,
+                message="NFT not found"
+            )
+
+        # Metadata view của datum cache: các field đã decode được dùng lại giữa các request
         return MetadataResponse(
-            success=False,
-            message="NFT not found"
+            success=True,
+            message="Metadata found",
+            metadata=entry.decoded.metadata.to_dict(),
+            version=entry.decoded.version
         )
         
     except Exception as e:
@@ -799,43 +1113,94 @@ async def get_metadata(token_name: str):
             message=f"Error fetching metadata: {str(e)}"
         )
 
-# Endpoint liệt kê tất cả CIP-68 tokens
+# Số token tối đa mỗi trang của /api/tokens
+TOKENS_PAGE_MAX = 1000
+# Số token đọc từ index mỗi lần trong /api/tokens/stream
+TOKENS_STREAM_CHUNK = 500
+
+# Chuyển một entry của store index thành dict trả về cho frontend
+def token_to_dict(base_name: bytes, entry: IndexedToken) -> Dict[str, Any]:
+    """Thông tin tóm tắt của một CIP-68 token."""
+    token_info = {
+        'token_name': base_name.decode('utf-8', errors='replace'),
+        'policy_id': str(policy_id),
+    }
+    if entry.decoded is not None:
+        token_info['owner'] = entry.decoded.owner_hex
+        token_info['version'] = entry.decoded.version
+    return token_info
+
+# Tạo bộ lọc owner / version cho store index scan
+def build_token_filter(
+    owner: Optional[str],
+    min_version: Optional[int],
+    max_version: Optional[int],
+):
+    """
+    Tạo predicate lọc token theo owner và khoảng version.
+    owner có thể là PKH hex hoặc địa chỉ bech32.
+    """
+    owner_pkh = None
+    if owner:
+        try:
+            if owner.startswith("addr"):
+                owner_pkh = Address.from_primitive(owner).payment_part.payload
+            else:
+                owner_pkh = bytes.fromhex(owner)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid owner")
+    if owner_pkh is None and min_version is None and max_version is None:
+        return None
+
+    def predicate(entry: IndexedToken) -> bool:
+        datum = entry.decoded
+        if datum is None:
+            return False
+        if owner_pkh is not None and datum.owner != owner_pkh:
+            return False
+        if min_version is not None and datum.version < min_version:
+            return False
+        if max_version is not None and datum.version > max_version:
+            return False
+        return True
+
+    return predicate
+
+# Endpoint liệt kê CIP-68 tokens (phân trang bằng cursor)
 @app.get("/api/tokens")
-async def list_all_tokens():
+async def list_all_tokens(
+    cursor: Optional[str] = Query(None, description="Cursor trả về từ trang trước (next_cursor)"),
+    limit: int = Query(100, ge=1, le=TOKENS_PAGE_MAX, description="Số token mỗi trang"),
+    owner: Optional[str] = Query(None, description="Owner PKH hex hoặc địa chỉ bech32"),
+    min_version: Optional[int] = Query(None, ge=0, description="Version nhỏ nhất"),
+    max_version: Optional[int] = Query(None, ge=0, description="Version lớn nhất"),
+    prefix: Optional[str] = Query(None, description="Lọc theo tiền tố tên token"),
+):
     """
-    List all CIP-68 tokens.
+    List CIP-68 tokens, phân trang theo cursor.
+    Dùng next_cursor của trang trước làm cursor để lấy trang tiếp theo.
     """
     try:
-        if not store_address:
+        after = bytes.fromhex(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    predicate = build_token_filter(owner, min_version, max_version)
+    try:
+        if store_index is None:
             raise HTTPException(status_code=500, detail="Store address not initialized")
-        tokens = []
-        utxos = chain_context.utxos(store_address)
-        # Scan UTxOs for CIP-68 reference tokens
-        for utxo in utxos:
-            if utxo.output.amount.multi_asset:
-                for pid, assets in utxo.output.amount.multi_asset.items():
-                    if pid == policy_id:
-                        for asset_name in assets.keys():
-                            # Check if it's a reference token
-                            if asset_name.payload.startswith(CIP68_REFERENCE_PREFIX):
-                                token_name = asset_name.payload[4:].decode('utf-8')
-                                datum = utxo.output.datum
-                                
-                                token_info = {
-                                    'token_name': token_name,
-                                    'policy_id': policy_id,
-                                }
-                                
-                                if isinstance(datum, CIP68Datum):
-                                    token_info['owner'] = datum.owner.hex()
-                                    token_info['version'] = datum.version
-                                
-                                tokens.append(token_info)
+        page, next_cursor = store_index.scan(
+            after=after,
+            prefix=prefix.encode('utf-8') if prefix else b"",
+            predicate=predicate,
+            limit=limit,
+        )
+        tokens = [token_to_dict(base_name, entry) for base_name, entry in page]
         
         return {
             "success": True,
             "tokens": tokens,
-            "count": len(tokens)
+            "count": len(tokens),
+            "next_cursor": next_cursor.hex() if next_cursor else None
         }
 
     except Exception as e:
@@ -844,6 +1209,41 @@ async def list_all_tokens():
             "message": f"Error listing tokens: {str(e)}",
             "tokens": []
         }
+
+# Endpoint stream toàn bộ CIP-68 tokens dạng NDJSON (mỗi dòng một token)
+@app.get("/api/tokens/stream")
+async def stream_all_tokens(
+    owner: Optional[str] = Query(None, description="Owner PKH hex hoặc địa chỉ bech32"),
+    min_version: Optional[int] = Query(None, ge=0, description="Version nhỏ nhất"),
+    max_version: Optional[int] = Query(None, ge=0, description="Version lớn nhất"),
+    prefix: Optional[str] = Query(None, description="Lọc theo tiền tố tên token"),
+):
+    """
+    Stream CIP-68 tokens dạng NDJSON.
+    Đọc store index theo từng chunk nên bộ nhớ không phụ thuộc số token.
+    """
+    if store_index is None:
+        raise HTTPException(status_code=500, detail="Store address not initialized")
+    predicate = build_token_filter(owner, min_version, max_version)
+    prefix_bytes = prefix.encode('utf-8') if prefix else b""
+
+    async def generate():
+        after = None
+        while True:
+            page, after = store_index.scan(
+                after=after,
+                prefix=prefix_bytes,
+                predicate=predicate,
+                limit=TOKENS_STREAM_CHUNK,
+            )
+            for base_name, entry in page:
+                yield json.dumps(token_to_dict(base_name, entry)) + "\n"
+            if after is None:
+                break
+            # Nhường event loop giữa các chunk
+            await asyncio.sleep(0)
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
 # RUN SERVER
 # ============================================================================
 
@@ -0,0 +1,81 @@
+"""
+Demo Deploy CIP-68 Reference Scripts
+====================================
+Script để deploy mint/store script một lần lên chain (reference scripts).
+
+Sau khi deploy, đặt REFERENCE_SCRIPT_ADDRESS trong .env để các giao dịch
+mint/update/burn dùng reference inputs thay vì đính kèm script.
+"""
+import os
+import sys
+
+from dotenv import load_dotenv
+from pycardano import Address
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from offchain.cip68_operations import (
+    get_chain_context,
+    get_scripts,
+    get_wallet_from_seed,
+)
+from offchain.reference_scripts import (
+    REFERENCE_SCRIPT_ADDRESS,
+    deploy_reference_scripts,
+    find_reference_scripts,
+)
+
+load_dotenv()
+
+def main():
+    print("=" * 60)
+    print("DEMO: Deploy CIP-68 Reference Scripts")
+    print("=" * 60)
+    # Load wallet
+    seed_phrase = os.getenv("SEED_PHRASE")
+    if not seed_phrase:
+        print("ERROR: SEED_PHRASE không tìm thấy trong .env")
+        return
+    payment_skey, payment_vkey, stake_skey, stake_vkey, address = get_wallet_from_seed(seed_phrase)
+    mint_script, store_script, policy_id, store_address = get_scripts()
+    print(f"\nWallet address: {address}")
+
+    # Get chain context
+    context = get_chain_context()
+
+    # Bỏ qua nếu script đã được deploy
+    target_address = REFERENCE_SCRIPT_ADDRESS or str(address)
+    deployed = find_reference_scripts(context, target_address, [mint_script, store_script])
+    if len(deployed) == 2:
+        print(f"\nReference scripts đã được deploy tại {target_address}:")
+        for hash_, utxo in deployed.items():
+            print(f"  {hash_}: {utxo.input.transaction_id}#{utxo.input.index}")
+        return
+
+    print("-" * 60)
+    try:
+        result = deploy_reference_scripts(
+            context=context,
+            payment_skey=payment_skey,
+            wallet_address=address,
+            scripts=[mint_script, store_script],
+            # Deploy đúng địa chỉ vừa kiểm tra ở trên
+            target_address=Address.from_primitive(target_address),
+        )
+        print("\n" + "=" * 60)
+        print("DEPLOY THÀNH CÔNG!")
+        print(f"Transaction Hash: {result['tx_hash']}")
+        for hash_, ref in result['refs'].items():
+            print(f"  {hash_}: {ref}")
+        print("=" * 60)
+
+        print(f"\nThêm dòng sau vào .env:")
+        print(f"REFERENCE_SCRIPT_ADDRESS={result['target_address']}")
+    except Exception as e:
+        print(f"\nLỗi: {e}")
+        import traceback
+        traceback.print_exc()
+
+if __name__ == "__main__":
+    main()
@@ -32,6 +32,29 @@ from .cip68_operations import (
     burn_cip68_token,
     list_all_tokens,
 )
+from .store_index import (
+    IndexedToken,
+    StoreIndex,
+    decode_cip68_datum,
+)
+from .datum_cache import DatumCache, DecodedDatum, MetadataView, decode_datum
+from .chain_follower import ChainFollower, JSONCheckpoint
+from .token_events import TokenEventFeed
+from .async_chain import AsyncChainContext
+from .chain_cache import CachedChainContext
+from .ex_units import ExUnitsCache
+from .utxo_leases import UTxOLeaseManager
+from .tx_tracker import TrackedTx, TxTracker
+from .reference_scripts import (
+    deploy_reference_scripts,
+    find_reference_scripts,
+    script_source,
+)
+from .cip68_batch import (
+    BatchTransaction,
+    build_batch_mint_transactions,
+    build_batch_update_transactions,
+)
 
 __all__ = [
     # Utils
@@ -61,4 +84,33 @@ __all__ = [
     'update_metadata',
     'burn_cip68_token',
     'list_all_tokens',
+    # Store index
+    'IndexedToken',
+    'StoreIndex',
+    'decode_cip68_datum',
+    # Datum cache
+    'DatumCache',
+    'DecodedDatum',
+    'MetadataView',
+    'decode_datum',
+    # Chain follower
+    'ChainFollower',
+    'JSONCheckpoint',
+    'TokenEventFeed',
+    # Async chain access
+    'AsyncChainContext',
+    'CachedChainContext',
+    'ExUnitsCache',
+    'UTxOLeaseManager',
+    # Submission queue + confirmation tracking
+    'TrackedTx',
+    'TxTracker',
+    # Reference scripts
+    'deploy_reference_scripts',
+    'find_reference_scripts',
+    'script_source',
+    # Batch transactions
+    'BatchTransaction',
+    'build_batch_mint_transactions',
+    'build_batch_update_transactions',
 ]
@@ -0,0 +1,120 @@
+"""
+CIP-68 Dynamic Asset - Async Chain Access
+=========================================
+Lớp truy cập chain không chặn event loop cho FastAPI backend.
+
+BlockFrostChainContext và TransactionBuilder là code đồng bộ (requests).
+Gọi trực tiếp trong `async def` handler sẽ chặn toàn bộ event loop trong
+lúc chờ Blockfrost. AsyncChainContext chuyển các lời gọi này sang một
+thread pool có giới hạn, nên một worker uvicorn có thể xử lý nhiều
+build/submit song song.
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Union
+
+from pycardano import *
+
+from .ex_units import ExUnitsCache
+from .utxo_leases import UTxOLeaseManager
+
+# Số thread tối đa cho chain I/O (mặc định 64)
+DEFAULT_CHAIN_IO_WORKERS = int(os.getenv("CHAIN_IO_WORKERS", "64"))
+
+
+class AsyncChainContext:
+    """
+    Async facade cho một ChainContext đồng bộ.
+
+    Args:
+        context: ChainContext đồng bộ (ví dụ BlockFrostChainContext)
+        max_workers: Số thread tối đa cho chain I/O
+        ex_units: Cache ex-units của redeemer (None = luôn evaluate)
+        leases: Lease manager cho UTxO input (None = không giữ chỗ input)
+    """
+
+    def __init__(
+        self,
+        context: ChainContext,
+        max_workers: Optional[int] = None,
+        ex_units: Optional[ExUnitsCache] = None,
+        leases: Optional[UTxOLeaseManager] = None,
+    ):
+        self.context = context
+        self.ex_units = ex_units
+        self.leases = leases
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or DEFAULT_CHAIN_IO_WORKERS,
+            thread_name_prefix="chain-io",
+        )
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Chạy một hàm đồng bộ (blocking) trong thread pool chain I/O."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(fn, *args, **kwargs)
+        )
+
+    async def utxos(self, address: Union[str, Address]) -> List[UTxO]:
+        """Lấy UTxO của một địa chỉ."""
+        return await self.run(self.context.utxos, address)
+
+    async def submit_tx_cbor(self, cbor: Union[bytes, str]) -> str:
+        """Submit transaction đã ký (CBOR)."""
+        return await self.run(self.context.submit_tx_cbor, cbor)
+
+    async def build_transaction(
+        self,
+        builder: TransactionBuilder,
+        change_address: Address,
+    ) -> Transaction:
+        """
+        Build unsigned transaction (body + witness set chưa có vkey).
+
+        `builder.build` có thể gọi utxos, protocol params, tip và evaluate
+        script nên toàn bộ được chạy trong thread pool. Nếu có ExUnitsCache,
+        bước evaluate được bỏ qua khi ex-units của mọi redeemer đã có trong cache.
+        Nếu có UTxOLeaseManager, input của giao dịch được lease để các build
+        đồng thời từ cùng ví không chọn trùng.
+        """
+        return await self.run(self.build_transaction_sync, builder, change_address)
+
+    def build_transaction_sync(
+        self,
+        builder: TransactionBuilder,
+        change_address: Address,
+        validate: Optional[Callable[[Transaction], None]] = None,
+    ) -> Transaction:
+        """
+        Bản đồng bộ của `build_transaction`, dùng trong code đã chạy trên
+        thread pool (ví dụ batch builder build nhiều giao dịch liên tiếp).
+
+        Args:
+            builder: TransactionBuilder đã thêm inputs/outputs/scripts
+            change_address: Địa chỉ nhận change
+            validate: Kiểm tra giao dịch trước khi lease input (raise nếu không hợp lệ)
+        """
+        def _build_once(builder: TransactionBuilder) -> Transaction:
+            if self.ex_units is not None:
+                tx = self.ex_units.build(builder, change_address)
+            else:
+                tx_body = builder.build(change_address=change_address)
+                tx = Transaction(tx_body, builder.build_witness_set())
+            if validate is not None:
+                validate(tx)
+            return tx
+
+        if self.leases is not None:
+            return self.leases.build(builder, _build_once)
+        return _build_once(builder)
+
+    def discard_transaction(self, tx: Transaction) -> None:
+        """Giải phóng input của giao dịch đã build nhưng sẽ không được submit."""
+        if self.leases is not None:
+            self.leases.release(tx.id)
+
+    def shutdown(self) -> None:
+        """Dừng thread pool (gọi khi tắt ứng dụng)."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,192 @@
+"""
+CIP-68 Dynamic Asset - Caching Chain Context
+============================================
+ChainContext bọc BlockFrostChainContext và cache các truy vấn lặp lại.
+
+- UTxO theo địa chỉ: cache với TTL ngắn, bị xóa khi submit giao dịch
+  có input/output chạm tới địa chỉ đó
+- Epoch: cache với TTL
+- Protocol params / genesis params: cache theo epoch
+- Slot hiện tại: ước lượng từ lần đọc gần nhất (1 slot = 1 giây)
+
+Dùng thay thế trực tiếp (drop-in) cho BlockFrostChainContext.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from pycardano import *
+
+# TTL mặc định (giây), có thể chỉnh qua biến môi trường
+UTXO_CACHE_TTL = float(os.getenv("UTXO_CACHE_TTL", "5"))
+EPOCH_CACHE_TTL = float(os.getenv("EPOCH_CACHE_TTL", "60"))
+SLOT_CACHE_TTL = float(os.getenv("SLOT_CACHE_TTL", "20"))
+
+
+class CachedChainContext(ChainContext):
+    """
+    Caching wrapper cho một ChainContext.
+
+    Args:
+        context: ChainContext gốc (ví dụ BlockFrostChainContext)
+        utxo_ttl: TTL (giây) của cache UTxO theo địa chỉ
+        epoch_ttl: TTL (giây) của cache epoch
+        slot_ttl: Thời gian (giây) ước lượng slot trước khi hỏi lại tip
+    """
+
+    def __init__(
+        self,
+        context: ChainContext,
+        utxo_ttl: float = UTXO_CACHE_TTL,
+        epoch_ttl: float = EPOCH_CACHE_TTL,
+        slot_ttl: float = SLOT_CACHE_TTL,
+    ):
+        self.context = context
+        self.utxo_ttl = utxo_ttl
+        self.epoch_ttl = epoch_ttl
+        self.slot_ttl = slot_ttl
+
+        # address -> (thời điểm fetch, danh sách UTxO)
+        self._utxo_cache: Dict[str, Tuple[float, List[UTxO]]] = {}
+        # TransactionInput -> address, để biết địa chỉ nào bị chạm khi submit
+        self._address_by_input: Dict[TransactionInput, str] = {}
+        self._epoch: Optional[Tuple[float, int]] = None
+        self._slot: Optional[Tuple[float, int]] = None
+        self._protocol_param: Optional[Tuple[int, ProtocolParameters]] = None
+        self._genesis_param: Optional[Tuple[int, GenesisParameters]] = None
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            "utxo_hits": 0,
+            "utxo_misses": 0,
+            "utxo_evictions": 0,
+            "epoch_hits": 0,
+            "epoch_misses": 0,
+            "protocol_param_hits": 0,
+            "protocol_param_misses": 0,
+            "slot_hits": 0,
+            "slot_misses": 0,
+        }
+
+    def __getattr__(self, name: str) -> Any:
+        # Các thuộc tính riêng của context gốc (ví dụ `.api` của Blockfrost)
+        if name == "context":
+            raise AttributeError(name)
+        return getattr(self.context, name)
+
+    def _count(self, key: str) -> None:
+        self._stats[key] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Bộ đếm hit/miss của cache."""
+        with self._lock:
+            return dict(self._stats, utxo_cached_addresses=len(self._utxo_cache))
+
+    # ------------------------------------------------------------------
+    # Chain info
+    # ------------------------------------------------------------------
+    @property
+    def network(self) -> Network:
+        return self.context.network
+
+    @property
+    def epoch(self) -> int:
+        now = time.monotonic()
+        cached = self._epoch
+        if cached and now - cached[0] < self.epoch_ttl:
+            self._count("epoch_hits")
+            return cached[1]
+        self._count("epoch_misses")
+        epoch = self.context.epoch
+        self._epoch = (now, epoch)
+        return epoch
+
+    @property
+    def last_block_slot(self) -> int:
+        now = time.monotonic()
+        cached = self._slot
+        if cached and now - cached[0] < self.slot_ttl:
+            self._count("slot_hits")
+            # Shelley trở đi: mỗi slot = 1 giây
+            return cached[1] + int(now - cached[0])
+        self._count("slot_misses")
+        slot = self.context.last_block_slot
+        self._slot = (now, slot)
+        return slot
+
+    @property
+    def protocol_param(self) -> ProtocolParameters:
+        epoch = self.epoch
+        cached = self._protocol_param
+        if cached and cached[0] == epoch:
+            self._count("protocol_param_hits")
+            return cached[1]
+        self._count("protocol_param_misses")
+        params = self.context.protocol_param
+        self._protocol_param = (epoch, params)
+        return params
+
+    @property
+    def genesis_param(self) -> GenesisParameters:
+        epoch = self.epoch
+        cached = self._genesis_param
+        if cached and cached[0] == epoch:
+            return cached[1]
+        params = self.context.genesis_param
+        self._genesis_param = (epoch, params)
+        return params
+
+    # ------------------------------------------------------------------
+    # UTxO
+    # ------------------------------------------------------------------
+    def _utxos(self, address: str) -> List[UTxO]:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._utxo_cache.get(address)
+            if cached and now - cached[0] < self.utxo_ttl:
+                self._count("utxo_hits")
+                return list(cached[1])
+            self._count("utxo_misses")
+
+        utxos = self.context.utxos(address)
+        with self._lock:
+            self._utxo_cache[address] = (now, utxos)
+            for utxo in utxos:
+                self._address_by_input[utxo.input] = address
+        return list(utxos)
+
+    def invalidate(self, addresses: Set[str]) -> None:
+        """Xóa cache UTxO của các địa chỉ."""
+        with self._lock:
+            for address in addresses:
+                cached = self._utxo_cache.pop(address, None)
+                if cached is None:
+                    continue
+                self._count("utxo_evictions")
+                for utxo in cached[1]:
+                    self._address_by_input.pop(utxo.input, None)
+
+    def invalidate_transaction(self, tx: Transaction) -> None:
+        """Xóa cache các địa chỉ bị chạm bởi input/output của giao dịch."""
+        touched = {str(output.address) for output in tx.transaction_body.outputs}
+        with self._lock:
+            for tx_in in tx.transaction_body.inputs:
+                address = self._address_by_input.get(tx_in)
+                if address:
+                    touched.add(address)
+        self.invalidate(touched)
+
+    # ------------------------------------------------------------------
+    # Submit / evaluate
+    # ------------------------------------------------------------------
+    def submit_tx_cbor(self, cbor: Union[bytes, str]) -> str:
+        if isinstance(cbor, str):
+            cbor = bytes.fromhex(cbor)
+        try:
+            return self.context.submit_tx_cbor(cbor)
+        finally:
+            # Dù thành công hay thất bại, snapshot UTxO cũ không còn đáng tin
+            self.invalidate_transaction(Transaction.from_cbor(cbor))
+
+    def evaluate_tx_cbor(self, cbor: Union[bytes, str]) -> Dict[str, ExecutionUnits]:
+        return self.context.evaluate_tx_cbor(cbor)
@@ -0,0 +1,277 @@
+"""
+CIP-68 Dynamic Asset - Chain Follower
+=====================================
+Theo dõi block mới từ một cursor (block height + hash) và chỉ áp dụng
+delta (input bị spend, output mới) của các giao dịch chạm tới địa chỉ
+được theo dõi, thay vì quét lại toàn bộ UTxO của địa chỉ.
+
+Mỗi lần poll:
+1. Lấy tip. Nếu block tại cursor không còn trên chain (rollback), lùi về
+   block gần nhất còn trên chain trong `recent` và gọi `rollback(height)`
+   của các handler (handler không rollback được thì `resync()`).
+2. Lấy giao dịch của các địa chỉ trong khoảng (cursor, tip] và chuyển
+   `/txs/{hash}/utxos` của từng giao dịch cho handler theo thứ tự block.
+3. Lưu checkpoint: cursor + snapshot của handler. Poll không áp dụng giao
+   dịch nào chỉ ghi cursor (file nhỏ riêng) mà không snapshot lại handler,
+   nên khi chain không có hoạt động chi phí không tăng theo số token. Khi
+   khởi động lại, follower khôi phục từ checkpoint và chỉ bắt kịp các block
+   còn thiếu.
+
+Handler (duck typing) cài đặt:
+    apply_transaction(tx_hash, block_height, tx_utxos) -> None
+    rollback(height) -> bool        # False = không rollback được
+    resync() -> None                # nạp lại toàn bộ từ UTxO hiện tại
+    snapshot() -> Any               # JSON-serializable, lưu cùng checkpoint
+    restore(state) -> bool          # False = snapshot không dùng được
+"""
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from blockfrost import ApiError
+from pycardano import *
+
+# Chu kỳ (giây) poll block mới
+CHAIN_FOLLOWER_POLL_SECONDS = float(os.getenv("CHAIN_FOLLOWER_POLL_SECONDS", "20"))
+# Số block gần nhất giữ lại để tìm điểm rẽ nhánh khi rollback
+CHAIN_FOLLOWER_ROLLBACK_DEPTH = int(os.getenv("CHAIN_FOLLOWER_ROLLBACK_DEPTH", "100"))
+
+Cursor = Tuple[int, str]
+
+
+class JSONCheckpoint:
+    """
+    Lưu checkpoint của follower vào file JSON (ghi atomically).
+
+    Checkpoint đầy đủ (kèm snapshot handler) nằm ở `path`. Cursor của các lần
+    poll không có giao dịch nằm ở `path.cursor` và chỉ được dùng khi nó nối
+    tiếp đúng lần ghi checkpoint đầy đủ hiện tại (cùng `id`).
+
+    Args:
+        path: Đường dẫn file checkpoint
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.cursor_path = f"{path}.cursor"
+        # id của checkpoint đầy đủ gần nhất (None = chưa có)
+        self._id: Optional[int] = None
+
+    @staticmethod
+    def _read(path: str) -> Optional[dict]:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write(path: str, data: dict) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def load(self) -> Optional[dict]:
+        checkpoint = self._read(self.path)
+        if checkpoint is None:
+            return None
+        self._id = checkpoint.get("id")
+        cursor = self._read(self.cursor_path)
+        if self._id is not None and cursor and cursor.get("id") == self._id:
+            checkpoint["cursor"] = cursor["cursor"]
+            checkpoint["recent"] = cursor["recent"]
+        return checkpoint
+
+    def save(self, checkpoint: dict) -> None:
+        self._id = time.time_ns()
+        self._write(self.path, dict(checkpoint, id=self._id))
+
+    def save_cursor(self, cursor: list, recent: list) -> bool:
+        """
+        Chỉ lưu cursor; snapshot handler của checkpoint đầy đủ vẫn đúng.
+
+        Returns:
+            False nếu chưa có checkpoint đầy đủ (cần gọi `save`)
+        """
+        if self._id is None:
+            return False
+        self._write(self.cursor_path, {"id": self._id, "cursor": cursor, "recent": recent})
+        return True
+
+
+class ChainFollower:
+    """
+    Follow block mới cho một tập địa chỉ và phát delta tới các handler.
+
+    Args:
+        context: BlockFrost chain context (cần `.api`)
+        addresses: Các địa chỉ được theo dõi
+        handlers: Tên -> handler (tên dùng làm khóa snapshot trong checkpoint)
+        checkpoint: Nơi lưu checkpoint (có `load()` / `save(dict)`), None = không lưu
+        depth: Số block gần nhất giữ lại để xử lý rollback
+    """
+
+    def __init__(
+        self,
+        context: BlockFrostChainContext,
+        addresses: List[Address],
+        handlers: Dict[str, Any],
+        checkpoint: Optional[JSONCheckpoint] = None,
+        depth: int = CHAIN_FOLLOWER_ROLLBACK_DEPTH,
+    ):
+        self.context = context
+        self.addresses = [str(address) for address in addresses]
+        self.handlers = handlers
+        self.checkpoint = checkpoint
+        self.depth = depth
+        # (height, hash) của block đã xử lý tới (inclusive)
+        self.cursor: Optional[Cursor] = None
+        # Các cursor gần nhất (tăng dần theo height), dùng tìm điểm rẽ nhánh
+        self._recent: List[Cursor] = []
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {"polls": 0, "transactions": 0, "rollbacks": 0, "resyncs": 0}
+
+    # ------------------------------------------------------------------
+    # Startup
+    # ------------------------------------------------------------------
+    def start(self) -> bool:
+        """
+        Khôi phục từ checkpoint, hoặc resync toàn bộ nếu không có.
+
+        Returns:
+            True nếu khôi phục được từ checkpoint
+        """
+        with self._lock:
+            saved = self.checkpoint.load() if self.checkpoint else None
+            if saved and saved.get("addresses") == self.addresses and saved.get("cursor"):
+                states = saved.get("handlers", {})
+                if all(handler.restore(states.get(name)) for name, handler in self.handlers.items()):
+                    self.cursor = tuple(saved["cursor"])
+                    self._recent = [tuple(c) for c in saved.get("recent", [])] or [self.cursor]
+                    return True
+            self._resync()
+            return False
+
+    def _resync(self) -> None:
+        # Lấy tip trước khi nạp UTxO để không bỏ sót giao dịch ở giữa;
+        # áp dụng lại giao dịch từ block này là idempotent.
+        tip = self.context.api.block_latest()
+        for handler in self.handlers.values():
+            handler.resync()
+        self.cursor = (tip.height, tip.hash)
+        self._recent = [self.cursor]
+        self._stats["resyncs"] += 1
+        self._save()
+
+    # ------------------------------------------------------------------
+    # Follow
+    # ------------------------------------------------------------------
+    def poll(self) -> int:
+        """
+        Xử lý các block mới kể từ cursor.
+
+        Returns:
+            Số giao dịch đã áp dụng
+        """
+        with self._lock:
+            if self.cursor is None:
+                self._resync()
+                return 0
+            self._stats["polls"] += 1
+            tip = self.context.api.block_latest()
+            if tip.hash == self.cursor[1]:
+                return 0
+            if not self._on_chain(self.cursor):
+                if not self._rollback():
+                    return 0
+            if tip.height <= self.cursor[0]:
+                return 0
+
+            applied = 0
+            for tx in self._transactions(self.cursor[0] + 1, tip.height):
+                tx_utxos = self.context.api.transaction_utxos(tx.tx_hash)
+                for handler in self.handlers.values():
+                    handler.apply_transaction(tx.tx_hash, tx.block_height, tx_utxos)
+                applied += 1
+
+            self.cursor = (tip.height, tip.hash)
+            self._recent.append(self.cursor)
+            self._recent = [c for c in self._recent if c[0] > tip.height - self.depth]
+            self._stats["transactions"] += applied
+            # Không có giao dịch nào thì state của handler không đổi: chỉ lưu cursor
+            self._save(full=applied > 0)
+            return applied
+
+    def _transactions(self, from_height: int, to_height: int) -> list:
+        """Giao dịch của các địa chỉ trong [from_height, to_height], theo thứ tự block."""
+        by_hash = {}
+        for address in self.addresses:
+            try:
+                txs = self.context.api.address_transactions(
+                    address,
+                    from_block=str(from_height),
+                    to_block=str(to_height),
+                    gather_pages=True,
+                )
+            except ApiError as e:
+                if e.status_code == 404:
+                    continue
+                raise
+            for tx in txs:
+                by_hash[tx.tx_hash] = tx
+        return sorted(by_hash.values(), key=lambda tx: (tx.block_height, tx.tx_index))
+
+    def _on_chain(self, cursor: Cursor) -> bool:
+        """Block (height, hash) có còn nằm trên chain hiện tại không."""
+        try:
+            return self.context.api.block(str(cursor[0])).hash == cursor[1]
+        except ApiError as e:
+            if e.status_code == 404:
+                return False
+            raise
+
+    def _rollback(self) -> bool:
+        """
+        Lùi cursor về block gần nhất còn trên chain.
+
+        Returns:
+            False nếu không tìm được điểm rẽ nhánh (đã resync toàn bộ)
+        """
+        self._stats["rollbacks"] += 1
+        for cursor in reversed(self._recent[:-1]):
+            if not self._on_chain(cursor):
+                continue
+            for handler in self.handlers.values():
+                if not handler.rollback(cursor[0]):
+                    handler.resync()
+            self.cursor = cursor
+            self._recent = [c for c in self._recent if c[0] <= cursor[0]]
+            self._save()
+            return True
+        # Rollback sâu hơn `depth` block → nạp lại toàn bộ
+        self._resync()
+        return False
+
+    def _save(self, full: bool = True) -> None:
+        if self.checkpoint is None:
+            return
+        recent = [list(c) for c in self._recent]
+        if not full and self.checkpoint.save_cursor(list(self.cursor), recent):
+            return
+        self.checkpoint.save({
+            "addresses": self.addresses,
+            "cursor": list(self.cursor),
+            "recent": recent,
+            "handlers": {name: handler.snapshot() for name, handler in self.handlers.items()},
+        })
+
+    def stats(self) -> Dict[str, Any]:
+        """Cursor hiện tại và bộ đếm poll / giao dịch / rollback."""
+        return dict(
+            self._stats,
+            cursor_height=self.cursor[0] if self.cursor else None,
+            cursor_hash=self.cursor[1] if self.cursor else None,
+        )
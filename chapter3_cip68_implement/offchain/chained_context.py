@@ -0,0 +1,116 @@
+"""
+CIP-68 Dynamic Asset - Chained Evaluation Context
+=================================================
+ChainContext cho giao dịch spend output của giao dịch chưa được submit.
+
+Trong một batch (`cip68_batch.py`), giao dịch thứ hai trở đi spend change
+output của giao dịch trước, lúc build giao dịch đó còn chưa lên chain.
+`BlockFrostChainContext.evaluate_tx_cbor` chỉ gửi CBOR nên node không
+resolve được các input này và evaluate thất bại (TransactionFailedException)
+mỗi khi ex-units cache miss.
+
+ChainedContext gửi kèm các output chưa submit làm additional UTxO set
+(`/utils/txs/evaluate/utxos`, định dạng Ogmios) khi giao dịch dùng tới
+chúng; mọi truy vấn khác chuyển thẳng cho context gốc.
+"""
+from typing import Any, Dict, List, Union
+
+from pycardano import *
+
+
+class ChainedContext(ChainContext):
+    """
+    ChainContext biết các output chưa submit mà giao dịch đang build spend.
+
+    Args:
+        context: ChainContext gốc (ví dụ CachedChainContext bọc Blockfrost)
+        pending: Các UTxO chưa submit (change output của giao dịch trước)
+    """
+
+    def __init__(self, context: ChainContext, pending: List[UTxO]):
+        self.context = context
+        self.pending: Dict[TransactionInput, UTxO] = {utxo.input: utxo for utxo in pending}
+
+    def __getattr__(self, name: str) -> Any:
+        # Các thuộc tính riêng của context gốc (`.api`, `stats()`, ...)
+        if name == "context":
+            raise AttributeError(name)
+        return getattr(self.context, name)
+
+    # ------------------------------------------------------------------
+    # Chain info: chuyển thẳng cho context gốc
+    # ------------------------------------------------------------------
+    @property
+    def network(self) -> Network:
+        return self.context.network
+
+    @property
+    def epoch(self) -> int:
+        return self.context.epoch
+
+    @property
+    def last_block_slot(self) -> int:
+        return self.context.last_block_slot
+
+    @property
+    def protocol_param(self) -> ProtocolParameters:
+        return self.context.protocol_param
+
+    @property
+    def genesis_param(self) -> GenesisParameters:
+        return self.context.genesis_param
+
+    def _utxos(self, address: str) -> List[UTxO]:
+        return self.context.utxos(address)
+
+    # ------------------------------------------------------------------
+    # Submit / evaluate
+    # ------------------------------------------------------------------
+    def submit_tx_cbor(self, cbor: Union[bytes, str]) -> str:
+        return self.context.submit_tx_cbor(cbor)
+
+    def evaluate_tx_cbor(self, cbor: Union[bytes, str]) -> Dict[str, ExecutionUnits]:
+        if isinstance(cbor, str):
+            cbor = bytes.fromhex(cbor)
+        body = Transaction.from_cbor(cbor).transaction_body
+        wanted = set(body.inputs) | set(body.reference_inputs or [])
+        pending = [utxo for tx_in, utxo in self.pending.items() if tx_in in wanted]
+        api = getattr(self.context, "api", None)
+        if not pending or api is None:
+            return self.context.evaluate_tx_cbor(cbor)
+
+        result = api.transaction_evaluate_utxos(cbor.hex(), [ogmios_utxo(utxo) for utxo in pending])
+        evaluation = getattr(getattr(result, "result", None), "EvaluationResult", None)
+        if evaluation is None:
+            raise TransactionFailedException(result)
+        return {
+            k: ExecutionUnits(getattr(evaluation, k).memory, getattr(evaluation, k).steps)
+            for k in vars(evaluation)
+        }
+
+
+def chained_context(context: ChainContext, pending: List[UTxO]) -> ChainContext:
+    """Bọc `context` khi giao dịch spend output chưa submit, ngược lại trả nguyên context."""
+    return ChainedContext(context, pending) if pending else context
+
+
+def ogmios_utxo(utxo: UTxO) -> list:
+    """UTxO → [TxIn, TxOut] theo định dạng additional UTxO set của Ogmios."""
+    output = utxo.output
+    assets = {
+        f"{policy_id.payload.hex()}.{name.payload.hex()}": quantity
+        for policy_id, asset in (output.amount.multi_asset or {}).items()
+        for name, quantity in asset.items()
+    }
+    tx_out: Dict[str, Any] = {
+        "address": str(output.address),
+        "value": {"coins": output.amount.coin, "assets": assets},
+    }
+    if output.datum is not None:
+        tx_out["datum"] = output.datum.cbor.hex() if isinstance(output.datum, RawCBOR) else output.datum.to_cbor_hex()
+    elif output.datum_hash is not None:
+        tx_out["datumHash"] = output.datum_hash.payload.hex()
+    return [
+        {"txId": str(utxo.input.transaction_id), "index": utxo.input.index},
+        tx_out,
+    ]
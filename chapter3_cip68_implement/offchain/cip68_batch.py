@@ -0,0 +1,403 @@
+"""
+CIP-68 Dynamic Asset - Batch Transactions
+=========================================
+Gom nhiều thao tác CIP-68 vào ít giao dịch nhất có thể.
+
+- Batch mint: nhiều cặp reference (100) / user (222) token trong một
+  giao dịch, dùng chung một MintToken redeemer cho minting policy.
+- Batch update: spend nhiều reference UTxO của cùng một owner trong một
+  giao dịch (mỗi input một UpdateMetadata redeemer), trả lại store script
+  với datum mới và version + 1.
+
+Mỗi giao dịch được đóng gói tham lam (greedy) theo giới hạn max tx size
+và max ex-units của protocol params. Các giao dịch trong một batch được
+nối chuỗi: giao dịch sau spend change output của giao dịch trước, nên ví
+có thể ký tất cả rồi submit lần lượt mà không bị trùng input. Change output
+đó chưa có trên chain khi build, nên giao dịch nối chuỗi được build trên
+ChainedContext (`chained_context.py`) để evaluate script resolve được nó.
+
+Backend truyền `build` / `discard` của AsyncChainContext để mỗi giao dịch
+đi qua ExUnitsCache và UTxOLeaseManager như giao dịch đơn lẻ.
+"""
+import os
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Sequence, Tuple, TypeVar
+
+from pycardano import *
+
+from .chained_context import chained_context
+from .cip68_utils import (
+    CIP68_REFERENCE_PREFIX,
+    MintToken,
+    UpdateMetadata,
+    create_cip68_asset_names,
+    create_cip68_datum,
+)
+from .reference_scripts import ScriptSource
+
+# Số cặp token tối đa thử đóng gói trong một giao dịch
+BATCH_MINT_MAX_PAIRS = int(os.getenv("BATCH_MINT_MAX_PAIRS", "40"))
+# Số reference UTxO tối đa thử spend trong một giao dịch update
+# (mỗi input chạy store validator một lần nên bị giới hạn bởi ex-units)
+BATCH_UPDATE_MAX_INPUTS = int(os.getenv("BATCH_UPDATE_MAX_INPUTS", "25"))
+# Lượng ADA đi kèm mỗi output token
+TOKEN_OUTPUT_LOVELACE = 2_000_000
+
+# Lỗi cho thấy giao dịch quá lớn / quá tốn ex-units / không đủ ADA
+# → thử lại với ít item hơn
+_SHRINKABLE_ERRORS = (
+    InvalidTransactionException,
+    TransactionBuilderException,
+    TransactionFailedException,
+    UTxOSelectionException,
+)
+
+T = TypeVar("T")
+
+# (builder, change address, validate) -> Transaction
+BuildFn = Callable[[TransactionBuilder, Address, Callable[[Transaction], None]], Transaction]
+
+
+@dataclass
+class BatchTransaction:
+    """
+    Một giao dịch trong batch.
+
+    Fields:
+        transaction: Unsigned transaction (body + witness set chưa có vkey)
+        token_names: Các token được xử lý trong giao dịch này
+    """
+    transaction: Transaction
+    token_names: List[str] = field(default_factory=list)
+
+
+def _check_limits(context: ChainContext, tx: Transaction) -> None:
+    """Raise InvalidTransactionException nếu tx vượt max size hoặc max ex-units."""
+    params = context.protocol_param
+    size = len(tx.to_cbor())
+    if size > params.max_tx_size:
+        raise InvalidTransactionException(
+            f"Transaction size {size} exceeds max_tx_size {params.max_tx_size}"
+        )
+    mem = steps = 0
+    redeemers = tx.transaction_witness_set.redeemer or []
+    # Conway: redeemers có thể là RedeemerMap (key -> RedeemerValue)
+    if isinstance(redeemers, RedeemerMap):
+        redeemers = redeemers.values()
+    for redeemer in redeemers:
+        if redeemer.ex_units:
+            mem += redeemer.ex_units.mem
+            steps += redeemer.ex_units.steps
+    if mem > params.max_tx_ex_mem or steps > params.max_tx_ex_steps:
+        raise InvalidTransactionException(
+            f"Execution units ({mem} mem, {steps} steps) exceed tx limits "
+            f"({params.max_tx_ex_mem} mem, {params.max_tx_ex_steps} steps)"
+        )
+
+
+def _change_utxos(tx: Transaction, owner_address: Address, first_change_index: int) -> List[UTxO]:
+    """Change outputs (về owner) của tx, dùng làm input cho giao dịch kế tiếp."""
+    tx_id = tx.transaction_body.id
+    return [
+        UTxO(TransactionInput(tx_id, index), output)
+        for index, output in enumerate(tx.transaction_body.outputs)
+        if index >= first_change_index and output.address == owner_address
+    ]
+
+
+def _build_direct(
+    builder: TransactionBuilder,
+    change_address: Address,
+    validate: Callable[[Transaction], None],
+) -> Transaction:
+    """Build không qua cache ex-units / lease (dùng khi chạy ngoài backend)."""
+    tx_body = builder.build(change_address=change_address)
+    tx = Transaction(tx_body, builder.build_witness_set())
+    validate(tx)
+    return tx
+
+
+def _build_chained(
+    builder: TransactionBuilder,
+    owner_address: Address,
+    chained_inputs: List[UTxO],
+    excluded_inputs: List[UTxO],
+    build: Optional[BuildFn] = None,
+) -> Transaction:
+    """Thêm input nối chuỗi, build và kiểm tra giới hạn."""
+    for utxo in chained_inputs:
+        builder.add_input(utxo)
+    builder.add_input_address(owner_address)
+    builder.excluded_inputs = list(excluded_inputs)
+    builder.required_signers = [owner_address.payment_part]
+    context = builder.context
+    # Kiểm tra giới hạn trước khi lease input: giao dịch quá lớn không giữ input nào
+    return (build or _build_direct)(builder, owner_address, lambda tx: _check_limits(context, tx))
+
+
+def _build_mint_tx(
+    context: ChainContext,
+    owner_address: Address,
+    items: List[Tuple[str, str]],
+    mint_script: ScriptSource,
+    policy_id: ScriptHash,
+    store_address: Address,
+    chained_inputs: List[UTxO],
+    excluded_inputs: List[UTxO],
+    build: Optional[BuildFn] = None,
+) -> Tuple[Transaction, int]:
+    """
+    Build một giao dịch mint nhiều cặp CIP-68.
+
+    Returns:
+        Tuple (transaction, index của change output đầu tiên)
+    """
+    owner_pkh = owner_address.payment_part.to_primitive()
+    policy_id_bytes = bytes(policy_id)
+
+    builder = TransactionBuilder(chained_context(context, chained_inputs))
+    mint_asset = Asset()
+    for token_name, description in items:
+        token_name_bytes = token_name.encode('utf-8')
+        ref_asset_name, user_asset_name = create_cip68_asset_names(token_name_bytes)
+        mint_asset[ref_asset_name] = 1
+        mint_asset[user_asset_name] = 1
+
+        datum = create_cip68_datum(
+            policy_id=policy_id_bytes,
+            asset_name=token_name_bytes,
+            owner_pkh=owner_pkh,
+            metadata=description,
+            version=1
+        )
+        # Output: Reference token đến store script với datum
+        builder.add_output(
+            TransactionOutput(
+                store_address,
+                Value(TOKEN_OUTPUT_LOVELACE, MultiAsset({policy_id: Asset({ref_asset_name: 1})})),
+                datum=datum,
+            )
+        )
+        # Output: User token đến owner
+        builder.add_output(
+            TransactionOutput(
+                owner_address,
+                Value(TOKEN_OUTPUT_LOVELACE, MultiAsset({policy_id: Asset({user_asset_name: 1})})),
+            )
+        )
+    first_change_index = len(builder.outputs)
+
+    mint_assets = MultiAsset()
+    mint_assets[policy_id] = mint_asset
+    builder.mint = mint_assets
+    # Minting policy chỉ chạy một lần cho mỗi policy → một MintToken redeemer
+    first_name = items[0][0].encode('utf-8')
+    builder.add_minting_script(mint_script, redeemer=Redeemer(MintToken(token_name=first_name)))
+
+    tx = _build_chained(builder, owner_address, chained_inputs, excluded_inputs, build)
+    return tx, first_change_index
+
+
+def _pack_chained(
+    context: ChainContext,
+    owner_address: Address,
+    items: Sequence[T],
+    max_per_tx: int,
+    build_tx: Callable[[List[T], List[UTxO], List[UTxO]], Tuple[Transaction, int]],
+    item_name: Callable[[T], str],
+    discard: Optional[Callable[[Transaction], None]] = None,
+) -> List[BatchTransaction]:
+    """
+    Đóng gói tham lam các item vào chuỗi giao dịch.
+
+    Args:
+        context: Chain context
+        owner_address: Địa chỉ ví owner (trả phí, nhận change)
+        items: Các item cần xử lý
+        max_per_tx: Số item tối đa thử đóng gói vào một giao dịch
+        build_tx: Hàm (items, chained_inputs, excluded_inputs) -> (tx, first_change_index)
+        item_name: Hàm lấy token name của một item
+        discard: Gọi cho các giao dịch đã build khi batch thất bại giữa chừng
+            (giải phóng input đã lease)
+
+    Returns:
+        Danh sách BatchTransaction theo thứ tự submit
+    """
+    remaining = list(items)
+    chunk = min(max_per_tx, len(remaining))
+    chained_inputs: List[UTxO] = []
+    excluded_inputs: List[UTxO] = []
+    batch: List[BatchTransaction] = []
+
+    while remaining:
+        chunk = min(chunk, len(remaining))
+        try:
+            tx, first_change_index = build_tx(remaining[:chunk], chained_inputs, excluded_inputs)
+        except _SHRINKABLE_ERRORS:
+            if chunk > 1:
+                # Giảm số item rồi thử lại
+                chunk = max(1, chunk * 3 // 4)
+                continue
+            _discard_all(batch, discard)
+            raise
+        except Exception:
+            _discard_all(batch, discard)
+            raise
+
+        batch.append(BatchTransaction(
+            transaction=tx,
+            token_names=[item_name(item) for item in remaining[:chunk]],
+        ))
+        remaining = remaining[chunk:]
+        # Giao dịch sau spend change của giao dịch này, không dùng lại input cũ
+        spent = set(tx.transaction_body.inputs)
+        excluded_inputs.extend(
+            utxo for utxo in context.utxos(owner_address) if utxo.input in spent
+        )
+        chained_inputs = _change_utxos(tx, owner_address, first_change_index)
+
+    return batch
+
+
+def _discard_all(batch: List[BatchTransaction], discard: Optional[Callable[[Transaction], None]]) -> None:
+    if discard is not None:
+        for item in batch:
+            discard(item.transaction)
+
+
+def build_batch_mint_transactions(
+    context: ChainContext,
+    owner_address: Address,
+    items: List[Tuple[str, str]],
+    mint_script: ScriptSource,
+    policy_id: ScriptHash,
+    store_address: Address,
+    max_pairs: Optional[int] = None,
+    build: Optional[BuildFn] = None,
+    discard: Optional[Callable[[Transaction], None]] = None,
+) -> List[BatchTransaction]:
+    """
+    Mint nhiều CIP-68 token, đóng gói vào ít giao dịch nhất có thể.
+
+    Args:
+        context: Chain context
+        owner_address: Địa chỉ ví owner (trả phí, nhận user tokens)
+        items: Danh sách (token_name, description)
+        mint_script: Minting policy script (hoặc UTxO reference script)
+        policy_id: Policy ID
+        store_address: Địa chỉ store script
+        max_pairs: Số cặp tối đa mỗi giao dịch (mặc định BATCH_MINT_MAX_PAIRS)
+        build: Hàm build giao dịch (mặc định build trực tiếp bằng builder)
+        discard: Hàm giải phóng giao dịch đã build khi batch thất bại
+
+    Returns:
+        Danh sách BatchTransaction theo thứ tự submit
+    """
+    def build_tx(chunk, chained_inputs, excluded_inputs):
+        return _build_mint_tx(
+            context, owner_address, chunk,
+            mint_script, policy_id, store_address,
+            chained_inputs, excluded_inputs, build,
+        )
+
+    return _pack_chained(
+        context, owner_address, items,
+        max_pairs or BATCH_MINT_MAX_PAIRS,
+        build_tx,
+        lambda item: item[0],
+        discard,
+    )
+
+
+def _build_update_tx(
+    context: ChainContext,
+    owner_address: Address,
+    items: List[Tuple[str, UTxO, int, str]],
+    store_script: ScriptSource,
+    policy_id: ScriptHash,
+    store_address: Address,
+    chained_inputs: List[UTxO],
+    excluded_inputs: List[UTxO],
+    build: Optional[BuildFn] = None,
+) -> Tuple[Transaction, int]:
+    """
+    Build một giao dịch update metadata cho nhiều reference token.
+
+    Returns:
+        Tuple (transaction, index của change output đầu tiên)
+    """
+    owner_pkh = owner_address.payment_part.to_primitive()
+    policy_id_bytes = bytes(policy_id)
+
+    builder = TransactionBuilder(chained_context(context, chained_inputs))
+    for token_name, ref_utxo, current_version, new_description in items:
+        token_name_bytes = token_name.encode('utf-8')
+        ref_asset_name = AssetName(CIP68_REFERENCE_PREFIX + token_name_bytes)
+        # Spend reference token UTxO (mỗi input một redeemer)
+        builder.add_script_input(ref_utxo, store_script, redeemer=Redeemer(UpdateMetadata()))
+
+        # Datum mới - giữ nguyên policy_id, asset_name, owner
+        new_datum = create_cip68_datum(
+            policy_id=policy_id_bytes,
+            asset_name=token_name_bytes,
+            owner_pkh=owner_pkh,
+            metadata=new_description,
+            version=current_version + 1
+        )
+        # Output: Reference token trở lại store script
+        builder.add_output(
+            TransactionOutput(
+                store_address,
+                Value(ref_utxo.output.amount.coin, MultiAsset({policy_id: Asset({ref_asset_name: 1})})),
+                datum=new_datum,
+            )
+        )
+    first_change_index = len(builder.outputs)
+
+    tx = _build_chained(builder, owner_address, chained_inputs, excluded_inputs, build)
+    return tx, first_change_index
+
+
+def build_batch_update_transactions(
+    context: ChainContext,
+    owner_address: Address,
+    items: List[Tuple[str, UTxO, int, str]],
+    store_script: ScriptSource,
+    policy_id: ScriptHash,
+    store_address: Address,
+    max_inputs: Optional[int] = None,
+    build: Optional[BuildFn] = None,
+    discard: Optional[Callable[[Transaction], None]] = None,
+) -> List[BatchTransaction]:
+    """
+    Update metadata của nhiều CIP-68 token cùng owner, đóng gói vào ít
+    giao dịch nhất có thể.
+
+    Args:
+        context: Chain context
+        owner_address: Địa chỉ ví owner (ký và trả phí)
+        items: Danh sách (token_name, reference UTxO, version hiện tại, description mới)
+        store_script: Store validator script (hoặc UTxO reference script)
+        policy_id: Policy ID
+        store_address: Địa chỉ store script
+        max_inputs: Số reference UTxO tối đa mỗi giao dịch (mặc định BATCH_UPDATE_MAX_INPUTS)
+        build: Hàm build giao dịch (mặc định build trực tiếp bằng builder)
+        discard: Hàm giải phóng giao dịch đã build khi batch thất bại
+
+    Returns:
+        Danh sách BatchTransaction theo thứ tự submit
+    """
+    def build_tx(chunk, chained_inputs, excluded_inputs):
+        return _build_update_tx(
+            context, owner_address, chunk,
+            store_script, policy_id, store_address,
+            chained_inputs, excluded_inputs, build,
+        )
+
+    return _pack_chained(
+        context, owner_address, items,
+        max_inputs or BATCH_UPDATE_MAX_INPUTS,
+        build_tx,
+        lambda item: item[0],
+        discard,
+    )
@@ -31,6 +31,12 @@ from .cip68_utils import (
     load_store_script,
     extract_owner_from_datum,
 )
+from .datum_cache import decode_datum
+from .reference_scripts import (
+    REFERENCE_SCRIPT_ADDRESS,
+    find_reference_scripts,
+    script_source,
+)
 # Load environment variables
 load_dotenv()
 
@@ -145,6 +151,8 @@ def mint_cip68_token(
     network = get_network()
     # Load scripts
     mint_script, store_script, policy_id, store_address = get_scripts(blueprint_path)
+    # Dùng reference scripts nếu đã deploy (REFERENCE_SCRIPT_ADDRESS)
+    reference_scripts = find_reference_scripts(context, REFERENCE_SCRIPT_ADDRESS, [mint_script, store_script])
     # Get owner's public key hash
     owner_pkh = bytes(payment_vkey.hash())
 
@@ -185,7 +193,7 @@ def mint_cip68_token(
     builder.add_input_address(owner_address)
      # Mint tokens
     builder.mint = mint_assets
-    builder.add_minting_script(mint_script, redeemer=redeemer)
+    builder.add_minting_script(script_source(mint_script, reference_scripts), redeemer=redeemer)
      # Output: Reference token đến store script với datum
     builder.add_output(
         TransactionOutput(
@@ -255,6 +263,8 @@ def update_metadata(
 
     # Load scripts
     mint_script, store_script, policy_id, store_address = get_scripts(blueprint_path)
+    # Dùng reference scripts nếu đã deploy (REFERENCE_SCRIPT_ADDRESS)
+    reference_scripts = find_reference_scripts(context, REFERENCE_SCRIPT_ADDRESS, [mint_script, store_script])
      # Get owner's public key hash for verification
     owner_pkh = bytes(payment_vkey.hash())
     # Policy ID as bytes
@@ -302,7 +312,7 @@ def update_metadata(
     # Spend reference token UTxO
     builder.add_script_input(
         ref_utxo,
-        store_script,
+        script_source(store_script, reference_scripts),
         redeemer=redeemer
     )
     # Output: Reference token trở lại store script với datum mới
@@ -369,6 +379,8 @@ def burn_cip68_token(
     network = get_network()
      # Load scripts
     mint_script, store_script, policy_id, store_address = get_scripts(blueprint_path)
+    # Dùng reference scripts nếu đã deploy (REFERENCE_SCRIPT_ADDRESS)
+    reference_scripts = find_reference_scripts(context, REFERENCE_SCRIPT_ADDRESS, [mint_script, store_script])
      # Get owner's public key hash
     owner_pkh = bytes(payment_vkey.hash())
      # Tạo asset names
@@ -423,7 +435,7 @@ def burn_cip68_token(
     # Spend reference token UTxO
     builder.add_script_input(
         ref_utxo,
-        store_script,
+        script_source(store_script, reference_scripts),
         redeemer=spend_redeemer
     )
      # Add user token input
@@ -431,7 +443,7 @@ def burn_cip68_token(
 
     # Burn tokens
     builder.mint = burn_assets
-    builder.add_minting_script(mint_script, redeemer=mint_redeemer)
+    builder.add_minting_script(script_source(mint_script, reference_scripts), redeemer=mint_redeemer)
     # Required signers
     builder.required_signers = [payment_vkey.hash()]
 
@@ -479,29 +491,16 @@ def list_all_tokens (context, user_address_str, store_address):
                      # Lấy phần tên sau prefix (100)
                     base_name = asset_name.payload[len(REF_PREFIX):]
                     if base_name in holding_token_names:
-                        # Giải mã Datum
-                        try:
-                            # Sử dụng PlutusData.from_cbor trực tiếp từ RawCBOR
-                            raw_datum = utxo.output.datum
-                            if hasattr(raw_datum, 'cbor'):
-                                datum = CIP68Datum.from_cbor(raw_datum.cbor)
-
-                            else:
-                                datum = CIP68Datum.from_cbor(raw_datum)
-
-                            # Build thông tin trả về
-                            meta_dict = {}
-                            for k, v in datum.metadata.items():
-                                key = k.decode() if isinstance(k, bytes) else str(k)
-                                val = v.decode() if isinstance(v, bytes) else str(v)
-                                meta_dict[key] = val
-                            user_tokens_list.append({
-                                "token_name": base_name.decode(),
-                                "policy_id": pid.payload.hex(),
-                                "metadata": meta_dict,
-                                "version": datum.version})
-                        except Exception as e:
-                            print(f"Lỗi parse datum cho {base_name}: {e}")
+                        # Giải mã Datum qua datum cache (mỗi datum hash chỉ parse một lần)
+                        decoded = decode_datum(utxo.output.datum)
+                        if decoded is None:
+                            print(f"Lỗi parse datum cho {base_name}")
+                            continue
+                        user_tokens_list.append({
+                            "token_name": base_name.decode(),
+                            "policy_id": pid.payload.hex(),
+                            "metadata": decoded.metadata.to_dict(),
+                            "version": decoded.version})
 
 
     return user_tokens_list
@@ -0,0 +1,190 @@
+"""
+CIP-68 Dynamic Asset - Datum Cache
+==================================
+Cache các CIP68Datum đã decode theo datum hash.
+
+Datum không đổi với một hash cố định, nên mỗi CBOR chỉ cần parse một lần:
+resync / restore store index, list token của ví hay query metadata đều dùng
+lại cùng một DecodedDatum. Metadata được bọc trong MetadataView chỉ đọc,
+decode từng field (bytes -> str) ở lần truy cập đầu tiên rồi giữ lại.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+from pycardano import *
+
+from .cip68_utils import CIP68Datum
+
+# Số datum tối đa giữ trong cache (LRU)
+DATUM_CACHE_SIZE = int(os.getenv("DATUM_CACHE_SIZE", "100000"))
+
+
+def _decode_value(value: Any) -> Any:
+    """Giá trị metadata (bytes / PlutusData / int) -> giá trị JSON."""
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    if hasattr(value, 'to_primitive'):
+        # PlutusData object
+        prim = value.to_primitive()
+        if isinstance(prim, bytes):
+            return prim.decode('utf-8', errors='replace')
+        return str(prim)
+    return str(value)
+
+
+class MetadataView(Mapping):
+    """
+    View chỉ đọc trên `CIP68Datum.metadata`: key là str, value decode lazily.
+
+    Args:
+        raw: Metadata gốc của datum (bytes key -> bytes/PlutusData value)
+    """
+    __slots__ = ("_raw", "_keys", "_values")
+
+    def __init__(self, raw: Dict[Any, Any]):
+        self._raw = raw
+        self._keys: Optional[Dict[str, Any]] = None
+        self._values: Dict[str, Any] = {}
+
+    def _key_map(self) -> Dict[str, Any]:
+        if self._keys is None:
+            self._keys = {
+                (k.decode('utf-8', errors='replace') if isinstance(k, bytes) else str(k)): k
+                for k in self._raw
+            }
+        return self._keys
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        value = _decode_value(self._raw[self._key_map()[key]])
+        self._values[key] = value
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._key_map())
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Bản sao dict str -> str (các field đã decode được dùng lại)."""
+        return {key: self[key] for key in self._key_map()}
+
+
+class DecodedDatum:
+    """
+    CIP68Datum đã decode, chỉ đọc, dùng chung giữa các UTxO cùng datum hash.
+
+    Fields:
+        datum: CIP68Datum gốc (dùng để build giao dịch update/burn)
+        datum_hash: blake2b-256 của CBOR datum
+    """
+    __slots__ = ("datum", "datum_hash", "_owner_hex", "_metadata")
+
+    def __init__(self, datum: CIP68Datum, datum_hash: bytes):
+        object.__setattr__(self, "datum", datum)
+        object.__setattr__(self, "datum_hash", datum_hash)
+        object.__setattr__(self, "_owner_hex", None)
+        object.__setattr__(self, "_metadata", None)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("DecodedDatum is read-only")
+
+    @property
+    def owner(self) -> bytes:
+        return self.datum.owner
+
+    @property
+    def owner_hex(self) -> str:
+        if self._owner_hex is None:
+            object.__setattr__(self, "_owner_hex", self.datum.owner.hex())
+        return self._owner_hex
+
+    @property
+    def version(self) -> int:
+        return self.datum.version
+
+    @property
+    def metadata(self) -> MetadataView:
+        if self._metadata is None:
+            object.__setattr__(self, "_metadata", MetadataView(self.datum.metadata))
+        return self._metadata
+
+
+def _datum_cbor(datum: Any) -> Optional[bytes]:
+    """CBOR của datum từ TransactionOutput (RawCBOR, RawPlutusData, CIP68Datum, bytes)."""
+    if isinstance(datum, RawCBOR):
+        return datum.cbor
+    if isinstance(datum, (bytes, bytearray)):
+        return bytes(datum)
+    if isinstance(datum, (PlutusData, RawPlutusData)):
+        return datum.to_cbor()
+    return None
+
+
+class DatumCache:
+    """
+    LRU datum hash -> DecodedDatum.
+
+    Args:
+        max_items: Số datum tối đa giữ trong cache
+    """
+
+    def __init__(self, max_items: int = DATUM_CACHE_SIZE):
+        self.max_items = max_items
+        self._entries: "OrderedDict[bytes, Optional[DecodedDatum]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def decode(self, datum: Any) -> Optional[DecodedDatum]:
+        """
+        Decode datum thành DecodedDatum (dùng lại kết quả nếu đã gặp hash này).
+
+        Returns:
+            DecodedDatum hoặc None nếu datum không phải CIP68Datum hợp lệ
+        """
+        cbor = _datum_cbor(datum)
+        if cbor is None:
+            return None
+        key = hashlib.blake2b(cbor, digest_size=32).digest()
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return self._entries[key]
+
+        decoded = None
+        try:
+            parsed = datum if isinstance(datum, CIP68Datum) else CIP68Datum.from_cbor(cbor)
+            decoded = DecodedDatum(parsed, key)
+        except Exception:
+            pass
+
+        with self._lock:
+            self._stats["misses"] += 1
+            # Datum không hợp lệ cũng được cache (None) để không parse lại
+            self._entries[key] = decoded
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+        return decoded
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self._stats, items=len(self._entries))
+
+
+# Cache dùng chung trong process
+datum_cache = DatumCache()
+
+
+def decode_datum(datum: Any) -> Optional[DecodedDatum]:
+    """Decode datum qua cache dùng chung."""
+    return datum_cache.decode(datum)
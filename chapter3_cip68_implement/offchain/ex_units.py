@@ -0,0 +1,288 @@
+"""
+CIP-68 Dynamic Asset - Execution Units Cache
+============================================
+Cache ex-units đã đo của từng redeemer để bỏ qua bước evaluate.
+
+Mặc định TransactionBuilder gọi `context.evaluate_tx` (một round trip tới
+Blockfrost) mỗi lần build giao dịch có Plutus script. Với cùng một thao tác
+(mint / update / burn), chi phí script gần như không đổi, nên:
+
+- Lần build đầu: builder evaluate như bình thường, ex-units đo được được lưu
+  theo khóa (script hash, redeemer constructor, kích thước giao dịch = số
+  redeemer + số asset mint/burn). Batch mint chỉ có một redeemer nhưng chi
+  phí minting policy tăng theo số token, nên số asset nằm trong khóa.
+- Các lần sau: nếu mọi redeemer đều có trong cache, ex-units (cộng thêm
+  safety margin) được gán sẵn và builder không evaluate nữa.
+- Khi giao dịch build từ cache bị từ chối lúc submit, các khóa liên quan bị
+  xóa để lần build sau đo lại.
+
+Các khóa hợp lệ được seed từ plutus.json (validator hash + constructor của
+redeemer). Số đo được lưu ra file cạnh blueprint; khi blueprint được build
+lại, script hash đổi nên số đo cũ tự bị bỏ qua.
+
+Cache đọc / ghi vài field riêng của TransactionBuilder (`_BUILDER_INTERNALS`);
+`check_builder_internals` kiểm tra chúng khi tạo cache, nên nâng PyCardano
+lên bản đã đổi các field này sẽ lỗi ngay lúc khởi động.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import fields
+from importlib.metadata import version
+from typing import Dict, List, Optional, Tuple
+
+from pycardano import *
+
+# Safety margin cộng thêm vào ex-units lấy từ cache
+EX_UNITS_MARGIN = float(os.getenv("EX_UNITS_MARGIN", "0.2"))
+# Số giao dịch gần nhất được nhớ để xóa cache khi submit thất bại
+_MAX_TRACKED_TXS = 1024
+
+# (script hash hex, redeemer constructor, số redeemer + số asset mint/burn)
+ExUnitsKey = Tuple[str, int, int]
+
+# Field riêng của TransactionBuilder mà cache đọc / ghi (viết theo PyCardano 0.19):
+# redeemer của script input, redeemer của minting script, cờ bật evaluate
+_BUILDER_INTERNALS = (
+    "_inputs_to_redeemers",
+    "_minting_script_to_redeemers",
+    "_should_estimate_execution_units",
+)
+
+
+def check_builder_internals() -> None:
+    """
+    Raise RuntimeError nếu TransactionBuilder của PyCardano đang cài không còn
+    các field riêng mà ExUnitsCache dựa vào (ví dụ sau khi nâng PyCardano),
+    thay vì âm thầm evaluate lại hoặc gán ex-units sai chỗ.
+    """
+    names = {f.name for f in fields(TransactionBuilder)}
+    missing = [name for name in _BUILDER_INTERNALS if name not in names]
+    if missing:
+        raise RuntimeError(
+            f"pycardano {version('pycardano')}: TransactionBuilder has no {', '.join(missing)}; "
+            "ExUnitsCache must be updated for this PyCardano version"
+        )
+
+
+def _skip_evaluation(builder: TransactionBuilder) -> None:
+    """Báo builder dùng ex-units đã gán sẵn trên mọi redeemer, không gọi evaluate."""
+    builder._should_estimate_execution_units = False
+
+
+class ExUnitsCache:
+    """
+    Cache ex-units theo script + redeemer constructor.
+
+    Args:
+        known: script hash hex -> {constructor index: tên constructor}
+        path: File JSON lưu các số đo (None = chỉ giữ trong bộ nhớ)
+        margin: Safety margin (0.2 = +20%)
+    """
+
+    def __init__(
+        self,
+        known: Optional[Dict[str, Dict[int, str]]] = None,
+        path: Optional[str] = None,
+        margin: float = EX_UNITS_MARGIN,
+    ):
+        check_builder_internals()
+        self.known = known or {}
+        self.path = path
+        self.margin = margin
+        self._units: Dict[ExUnitsKey, ExecutionUnits] = {}
+        # tx id -> các khóa đã dùng khi build giao dịch đó từ cache
+        self._keys_by_tx: "OrderedDict[TransactionId, List[ExUnitsKey]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0}
+        if path and os.path.exists(path):
+            self._load()
+
+    @classmethod
+    def from_blueprint(cls, blueprint_path: str, path: Optional[str] = None) -> "ExUnitsCache":
+        """
+        Seed cache từ plutus.json.
+
+        Args:
+            blueprint_path: Đường dẫn tới plutus.json
+            path: File lưu số đo (mặc định ex_units_cache.json cạnh blueprint)
+
+        Returns:
+            ExUnitsCache
+        """
+        with open(blueprint_path, 'r', encoding='utf-8') as f:
+            blueprint = json.load(f)
+        definitions = blueprint.get('definitions', {})
+        known: Dict[str, Dict[int, str]] = {}
+        for validator in blueprint['validators']:
+            constructors = known.setdefault(validator['hash'], {})
+            ref = validator.get('redeemer', {}).get('schema', {}).get('$ref')
+            if not ref:
+                continue
+            # "#/definitions/cip68~1MintRedeemer" -> "cip68/MintRedeemer"
+            name = ref.split('/')[-1].replace('~1', '/').replace('~0', '~')
+            for variant in definitions.get(name, {}).get('anyOf', []):
+                if variant.get('dataType') == 'constructor':
+                    constructors[variant['index']] = variant.get('title', str(variant['index']))
+        if path is None:
+            path = os.path.join(os.path.dirname(blueprint_path), 'ex_units_cache.json')
+        return cls(known=known, path=path)
+
+    # ------------------------------------------------------------------
+    # Build
+    # ------------------------------------------------------------------
+    def build(self, builder: TransactionBuilder, change_address: Address) -> Transaction:
+        """
+        Build unsigned transaction, dùng ex-units trong cache nếu có đủ.
+
+        Args:
+            builder: TransactionBuilder đã thêm inputs/outputs/scripts
+            change_address: Địa chỉ nhận change
+
+        Returns:
+            Transaction (body + witness set chưa có vkey)
+        """
+        entries = self._redeemer_entries(builder)
+        keys = [key for key, _ in entries]
+        cached = self._lookup(keys) if entries and all(keys) else None
+
+        if cached is not None:
+            for (_, redeemer), units in zip(entries, cached):
+                redeemer.ex_units = ExecutionUnits(
+                    int(units.mem * (1 + self.margin)),
+                    int(units.steps * (1 + self.margin)),
+                )
+            # Mọi redeemer đã có ex-units → builder không evaluate
+            _skip_evaluation(builder)
+
+        tx_body = builder.build(change_address=change_address)
+        tx = Transaction(tx_body, builder.build_witness_set())
+
+        if cached is not None:
+            self._track(tx_body.id, keys)
+        elif entries:
+            self._record(builder, entries)
+        return tx
+
+    def _redeemer_entries(self, builder: TransactionBuilder) -> List[Tuple[Optional[ExUnitsKey], Redeemer]]:
+        """(khóa, redeemer) cho mọi redeemer của builder; khóa None nếu không xác định được."""
+        pairs: List[Tuple[Optional[str], Redeemer]] = []
+        for utxo, redeemer in builder._inputs_to_redeemers.items():
+            payment_part = utxo.output.address.payment_part
+            script_hash_hex = str(payment_part) if isinstance(payment_part, ScriptHash) else None
+            pairs.append((script_hash_hex, redeemer))
+        for script, redeemer in builder._minting_script_to_redeemers:
+            if redeemer is None:
+                continue
+            if isinstance(script, UTxO):
+                script = script.output.script
+            pairs.append((str(script_hash(script)), redeemer))
+
+        count = len(pairs)
+        if builder.mint:
+            count += sum(len(assets) for assets in builder.mint.values())
+        entries = []
+        for script_hash_hex, redeemer in pairs:
+            constr_id = getattr(redeemer.data, 'CONSTR_ID', None)
+            key = None
+            if script_hash_hex in self.known and isinstance(constr_id, int):
+                key = (script_hash_hex, constr_id, count)
+            entries.append((key, redeemer))
+        return entries
+
+    def _lookup(self, keys: List[ExUnitsKey]) -> Optional[List[ExecutionUnits]]:
+        with self._lock:
+            if all(key in self._units for key in keys):
+                self._stats["hits"] += 1
+                return [self._units[key] for key in keys]
+            self._stats["misses"] += 1
+            return None
+
+    def _record(self, builder: TransactionBuilder, entries) -> None:
+        """Lưu ex-units vừa evaluate (bỏ phần buffer builder đã cộng)."""
+        mem_buffer = 1 + builder.execution_memory_buffer
+        step_buffer = 1 + builder.execution_step_buffer
+        changed = False
+        with self._lock:
+            for key, redeemer in entries:
+                if key is None or not redeemer.ex_units:
+                    continue
+                units = ExecutionUnits(
+                    int(redeemer.ex_units.mem / mem_buffer),
+                    int(redeemer.ex_units.steps / step_buffer),
+                )
+                current = self._units.get(key)
+                # Giữ số đo lớn nhất đã thấy
+                if current is None or units.mem > current.mem or units.steps > current.steps:
+                    self._units[key] = ExecutionUnits(
+                        max(units.mem, current.mem if current else 0),
+                        max(units.steps, current.steps if current else 0),
+                    )
+                    changed = True
+        if changed:
+            self._save()
+
+    def _track(self, tx_id: TransactionId, keys: List[ExUnitsKey]) -> None:
+        with self._lock:
+            self._keys_by_tx[tx_id] = keys
+            while len(self._keys_by_tx) > _MAX_TRACKED_TXS:
+                self._keys_by_tx.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # Invalidation
+    # ------------------------------------------------------------------
+    def forget(self, tx_id: TransactionId) -> None:
+        """
+        Xóa các số đo đã dùng để build giao dịch `tx_id`
+        (gọi khi submit giao dịch đó thất bại).
+        """
+        with self._lock:
+            keys = self._keys_by_tx.pop(tx_id, [])
+            for key in keys:
+                if self._units.pop(key, None) is not None:
+                    self._stats["evictions"] += 1
+        if keys:
+            self._save()
+
+    def stats(self) -> Dict[str, int]:
+        """Bộ đếm hit/miss của cache."""
+        with self._lock:
+            return dict(self._stats, entries=len(self._units))
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def _load(self) -> None:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        for item in stored:
+            # Bỏ qua số đo của script không còn trong blueprint, hoặc
+            # lưu theo khóa cũ (chỉ đếm redeemer, chưa có 'size')
+            if item['script'] in self.known and 'size' in item:
+                key = (item['script'], item['constructor'], item['size'])
+                self._units[key] = ExecutionUnits(item['mem'], item['steps'])
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            stored = [
+                {
+                    'script': script,
+                    'redeemer': self.known.get(script, {}).get(constr_id),
+                    'constructor': constr_id,
+                    'size': size,
+                    'mem': units.mem,
+                    'steps': units.steps,
+                }
+                for (script, constr_id, size), units in self._units.items()
+            ]
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(stored, f, indent=2)
+        except OSError as e:
+            print(f"Warning: cannot write ex-units cache {self.path}: {e}")
@@ -0,0 +1,110 @@
+"""
+CIP-68 Dynamic Asset - Reference Scripts
+========================================
+Deploy mint/store script một lần lên chain (CIP-33 reference scripts) rồi
+dùng lại qua reference inputs.
+
+Khi chưa deploy, mỗi giao dịch mint/update/burn phải đính kèm toàn bộ bytes
+của script trong witness set, làm tăng kích thước và phí giao dịch. Sau khi
+deploy, giao dịch chỉ cần tham chiếu tới UTxO chứa script.
+
+Địa chỉ chứa reference scripts được cấu hình qua biến môi trường
+`REFERENCE_SCRIPT_ADDRESS`. Coin selection của PyCardano bỏ qua các UTxO có
+script nên có thể deploy về chính ví của mình.
+"""
+import os
+from typing import Dict, Iterable, List, Optional, Union
+
+from pycardano import *
+
+# Địa chỉ chứa các UTxO reference script (None = đính kèm script như cũ)
+REFERENCE_SCRIPT_ADDRESS = os.getenv("REFERENCE_SCRIPT_ADDRESS")
+
+ScriptSource = Union[UTxO, PlutusV3Script]
+
+
+def deploy_reference_scripts(
+    context: ChainContext,
+    payment_skey: PaymentSigningKey,
+    wallet_address: Address,
+    scripts: List[PlutusV3Script],
+    target_address: Optional[Address] = None,
+) -> dict:
+    """
+    Deploy các script thành reference scripts (một output cho mỗi script).
+
+    Args:
+        context: Chain context
+        payment_skey: Payment signing key của ví trả phí
+        wallet_address: Địa chỉ ví trả phí
+        scripts: Các script cần deploy
+        target_address: Địa chỉ giữ reference scripts (mặc định wallet_address)
+
+    Returns:
+        Dict với tx_hash, target_address và refs (script hash -> "tx_hash#index")
+    """
+    target_address = target_address or wallet_address
+
+    builder = TransactionBuilder(context)
+    builder.add_input_address(wallet_address)
+    for script in scripts:
+        output = TransactionOutput(target_address, Value(0), script=script)
+        # Lượng ADA tối thiểu phụ thuộc kích thước script
+        output.amount = Value(min_lovelace_post_alonzo(output, context))
+        builder.add_output(output)
+
+    signed_tx = builder.build_and_sign([payment_skey], change_address=wallet_address)
+    context.submit_tx(signed_tx)
+    tx_hash = str(signed_tx.id)
+
+    return {
+        "tx_hash": tx_hash,
+        "target_address": str(target_address),
+        "refs": {
+            str(script_hash(script)): f"{tx_hash}#{index}"
+            for index, script in enumerate(scripts)
+        },
+    }
+
+
+def find_reference_scripts(
+    context: ChainContext,
+    address: Union[str, Address, None],
+    scripts: Iterable[PlutusV3Script],
+) -> Dict[ScriptHash, UTxO]:
+    """
+    Tìm các UTxO tại `address` đang chứa reference script của `scripts`.
+
+    Args:
+        context: Chain context
+        address: Địa chỉ chứa reference scripts (None = không dùng)
+        scripts: Các script cần tìm
+
+    Returns:
+        Dict script hash -> UTxO chứa script (chỉ gồm các script đã deploy)
+    """
+    if not address:
+        return {}
+    wanted = {script_hash(script) for script in scripts}
+    found: Dict[ScriptHash, UTxO] = {}
+    for utxo in context.utxos(address):
+        if utxo.output.script is None:
+            continue
+        hash_ = script_hash(utxo.output.script)
+        if hash_ in wanted and hash_ not in found:
+            found[hash_] = utxo
+    return found
+
+
+def script_source(
+    script: PlutusV3Script,
+    reference_scripts: Optional[Dict[ScriptHash, UTxO]] = None,
+) -> ScriptSource:
+    """
+    UTxO reference script nếu script đã được deploy, ngược lại chính script đó.
+
+    Kết quả truyền thẳng vào `add_minting_script` / `add_script_input`.
+    """
+    if reference_scripts:
+        return reference_scripts.get(script_hash(script), script)
+    return script
@@ -0,0 +1,333 @@
+"""
+CIP-68 Dynamic Asset - Store Index
+==================================
+Index in-memory các reference token (100) đang nằm tại store address.
+
+Thay vì mỗi request gọi `context.utxos(store_address)` rồi duyệt toàn bộ
+UTxO/asset, index được nạp một lần khi khởi động và cập nhật dần (incremental)
+bằng các giao dịch mới của store address do ChainFollower phát tới. Mỗi giao
+dịch được ghi vào journal theo block height để hoàn tác khi chain rollback.
+
+Lookup theo base token name là O(1). Danh sách base name được giữ theo thứ
+tự sắp xếp để phân trang bằng cursor mà không phải sort lại mỗi request.
+"""
+import bisect
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from pycardano import *
+from pycardano.hash import SCRIPT_HASH_SIZE
+
+from .chain_follower import CHAIN_FOLLOWER_ROLLBACK_DEPTH
+from .cip68_utils import CIP68_REFERENCE_PREFIX, CIP68Datum
+from .datum_cache import DecodedDatum, decode_datum
+
+
+@dataclass
+class IndexedToken:
+    """
+    Một reference token trong index.
+
+    Fields:
+        utxo: UTxO chứa reference token (giữ nguyên datum gốc để spend)
+        decoded: Datum đã decode, lấy từ datum cache (None nếu datum không hợp lệ)
+    """
+    utxo: UTxO
+    decoded: Optional[DecodedDatum]
+
+    @property
+    def datum(self) -> Optional[CIP68Datum]:
+        """CIP68Datum đã decode (None nếu datum không hợp lệ)"""
+        return self.decoded.datum if self.decoded is not None else None
+
+
+def decode_cip68_datum(datum: Any) -> Optional[CIP68Datum]:
+    """
+    Decode datum của reference UTxO thành CIP68Datum (qua datum cache).
+
+    Args:
+        datum: Datum lấy từ TransactionOutput (RawCBOR, CIP68Datum hoặc None)
+
+    Returns:
+        CIP68Datum hoặc None nếu không decode được
+    """
+    if isinstance(datum, CIP68Datum):
+        return datum
+    decoded = decode_datum(datum)
+    return decoded.datum if decoded is not None else None
+
+
+class StoreIndex:
+    """
+    Index base token name -> (UTxO, CIP68Datum) cho store address.
+
+    Args:
+        context: BlockFrost chain context
+        store_address: Địa chỉ store script
+        policy_id: Policy ID của mint script
+        journal_depth: Số block gần nhất giữ journal để rollback
+    """
+
+    def __init__(
+        self,
+        context: BlockFrostChainContext,
+        store_address: Address,
+        policy_id: ScriptHash,
+        journal_depth: int = CHAIN_FOLLOWER_ROLLBACK_DEPTH,
+    ):
+        self.context = context
+        self.store_address = store_address
+        self.policy_id = policy_id
+        self.journal_depth = journal_depth
+        self._tokens: Dict[bytes, IndexedToken] = {}
+        # Base names đã sắp xếp, phục vụ phân trang theo cursor
+        self._sorted_names: List[bytes] = []
+        # TransactionInput -> các base name nằm trong UTxO đó (để xóa khi bị spend)
+        self._names_by_input: Dict[TransactionInput, List[bytes]] = {}
+        # (block height, UTxO đã bị xóa, input đã thêm) của từng giao dịch đã áp dụng
+        self._journal: List[Tuple[int, List[UTxO], List[TransactionInput]]] = []
+        # Journal đầy đủ cho các block có height > giá trị này
+        self._journal_floor = 0
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+    def get(self, token_name: Union[str, bytes]) -> Optional[IndexedToken]:
+        """Lấy reference token theo base name (không có prefix)."""
+        if isinstance(token_name, str):
+            token_name = token_name.encode('utf-8')
+        return self._tokens.get(token_name)
+
+    def items(self) -> List[Tuple[bytes, IndexedToken]]:
+        """Snapshot (base_name, IndexedToken) của toàn bộ index."""
+        with self._lock:
+            return list(self._tokens.items())
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def scan(
+        self,
+        after: Optional[bytes] = None,
+        prefix: bytes = b"",
+        predicate: Optional[Callable[[IndexedToken], bool]] = None,
+        limit: int = 100,
+    ) -> Tuple[List[Tuple[bytes, IndexedToken]], Optional[bytes]]:
+        """
+        Lấy một trang token theo thứ tự base name.
+
+        Args:
+            after: Cursor - chỉ lấy các base name lớn hơn giá trị này
+            prefix: Chỉ lấy các base name bắt đầu bằng prefix
+            predicate: Bộ lọc thêm trên IndexedToken (owner, version, ...)
+            limit: Số token tối đa của trang
+
+        Returns:
+            Tuple (danh sách (base_name, IndexedToken), cursor trang sau hoặc None)
+        """
+        page: List[Tuple[bytes, IndexedToken]] = []
+        with self._lock:
+            names = self._sorted_names
+            start = bisect.bisect_left(names, prefix)
+            if after is not None and after >= prefix:
+                start = bisect.bisect_right(names, after)
+            for i in range(start, len(names)):
+                name = names[i]
+                if not name.startswith(prefix):
+                    return page, None
+                entry = self._tokens[name]
+                if predicate is not None and not predicate(entry):
+                    continue
+                if len(page) == limit:
+                    return page, page[-1][0]
+                page.append((name, entry))
+        return page, None
+
+    # ------------------------------------------------------------------
+    # Sync
+    # ------------------------------------------------------------------
+    def load(self) -> int:
+        """
+        Nạp toàn bộ index từ store address.
+
+        Returns:
+            Số reference token đã index
+        """
+        utxos = self.context.utxos(self.store_address)
+        with self._lock:
+            self._reset(utxos)
+        return len(self._tokens)
+
+    def _reset(self, utxos: List[UTxO]) -> None:
+        self._tokens.clear()
+        self._sorted_names.clear()
+        self._names_by_input.clear()
+        self._journal.clear()
+        self._journal_floor = 0
+        for utxo in utxos:
+            self._add_utxo(utxo)
+
+    # ------------------------------------------------------------------
+    # ChainFollower handler
+    # ------------------------------------------------------------------
+    def resync(self) -> None:
+        """Nạp lại toàn bộ index (khi chưa có checkpoint hoặc rollback quá sâu)."""
+        self.load()
+
+    def apply_transaction(self, tx_hash: str, block_height: int, tx_utxos) -> None:
+        """Áp dụng delta của một giao dịch: xóa input đã spend, thêm output mới."""
+        store_address = str(self.store_address)
+        removed: List[UTxO] = []
+        added: List[TransactionInput] = []
+        with self._lock:
+            for tx_in in tx_utxos.inputs:
+                # Reference input không bị spend, collateral chỉ bị lấy khi script fail
+                if getattr(tx_in, "reference", False) or getattr(tx_in, "collateral", False):
+                    continue
+                if tx_in.address == store_address:
+                    utxo = self._remove_input(
+                        TransactionInput.from_primitive([tx_in.tx_hash, tx_in.output_index])
+                    )
+                    if utxo is not None:
+                        removed.append(utxo)
+            for tx_out in tx_utxos.outputs:
+                if getattr(tx_out, "collateral", False):
+                    continue
+                if tx_out.address == store_address:
+                    utxo = self._utxo_from_output(tx_hash, tx_out)
+                    # Giao dịch được áp dụng lại sau resync: output đã có sẵn
+                    known = utxo.input in self._names_by_input
+                    if self._add_utxo(utxo) and not known:
+                        added.append(utxo.input)
+            if removed or added:
+                self._journal.append((block_height, removed, added))
+            # Bỏ journal của các block đã đủ sâu (không còn bị rollback)
+            floor = block_height - self.journal_depth
+            if self._journal and self._journal[0][0] <= floor:
+                self._journal = [entry for entry in self._journal if entry[0] > floor]
+                self._journal_floor = max(self._journal_floor, floor)
+
+    def rollback(self, height: int) -> bool:
+        """
+        Hoàn tác các giao dịch ở block có height > `height`.
+
+        Returns:
+            False nếu journal không còn đủ để hoàn tác
+        """
+        with self._lock:
+            if height < self._journal_floor:
+                return False
+            while self._journal and self._journal[-1][0] > height:
+                _, removed, added = self._journal.pop()
+                for tx_in in added:
+                    self._remove_input(tx_in)
+                for utxo in removed:
+                    self._add_utxo(utxo)
+        return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Trạng thái index (UTxO + journal) dạng JSON để lưu cùng checkpoint."""
+        with self._lock:
+            utxos = {entry.utxo.input: entry.utxo for entry in self._tokens.values()}
+            return {
+                "utxos": [utxo.to_cbor_hex() for utxo in utxos.values()],
+                "journal": [
+                    [height, [utxo.to_cbor_hex() for utxo in removed], [tx_in.to_cbor_hex() for tx_in in added]]
+                    for height, removed, added in self._journal
+                ],
+                "journal_floor": self._journal_floor,
+            }
+
+    def restore(self, state: Optional[Dict[str, Any]]) -> bool:
+        """Khôi phục index từ snapshot (False nếu snapshot không dùng được)."""
+        if not state:
+            return False
+        try:
+            utxos = [self._utxo_from_cbor(cbor) for cbor in state["utxos"]]
+            journal = [
+                (
+                    height,
+                    [self._utxo_from_cbor(cbor) for cbor in removed],
+                    [TransactionInput.from_cbor(cbor) for cbor in added],
+                )
+                for height, removed, added in state["journal"]
+            ]
+        except Exception:
+            return False
+        with self._lock:
+            self._reset(utxos)
+            self._journal = journal
+            self._journal_floor = state.get("journal_floor", 0)
+        return True
+
+    @staticmethod
+    def _utxo_from_cbor(cbor: str) -> UTxO:
+        utxo = UTxO.from_cbor(cbor)
+        # Giữ datum dạng RawCBOR như UTxO lấy từ Blockfrost
+        datum = utxo.output.datum
+        if datum is not None and not isinstance(datum, RawCBOR):
+            utxo.output.datum = RawCBOR(datum.to_cbor())
+        return utxo
+
+    def _utxo_from_output(self, tx_hash: str, tx_out) -> UTxO:
+        """Chuyển output JSON của Blockfrost `/txs/{hash}/utxos` thành UTxO."""
+        lovelace = 0
+        multi_asset = MultiAsset()
+        for item in tx_out.amount:
+            if item.unit == "lovelace":
+                lovelace = int(item.quantity)
+                continue
+            data = bytes.fromhex(item.unit)
+            pid = ScriptHash(data[:SCRIPT_HASH_SIZE])
+            if pid not in multi_asset:
+                multi_asset[pid] = Asset()
+            multi_asset[pid][AssetName(data[SCRIPT_HASH_SIZE:])] = int(item.quantity)
+
+        datum = None
+        datum_hash = None
+        if getattr(tx_out, "inline_datum", None):
+            datum = RawCBOR(bytes.fromhex(tx_out.inline_datum))
+        elif getattr(tx_out, "data_hash", None):
+            datum_hash = DatumHash.from_primitive(tx_out.data_hash)
+
+        return UTxO(
+            TransactionInput.from_primitive([tx_hash, tx_out.output_index]),
+            TransactionOutput(
+                self.store_address,
+                Value(lovelace, multi_asset),
+                datum_hash=datum_hash,
+                datum=datum,
+            ),
+        )
+
+    def _add_utxo(self, utxo: UTxO) -> bool:
+        multi_asset = utxo.output.amount.multi_asset
+        if not multi_asset or self.policy_id not in multi_asset:
+            return False
+        names = [
+            asset_name.payload[len(CIP68_REFERENCE_PREFIX):]
+            for asset_name in multi_asset[self.policy_id].keys()
+            if asset_name.payload.startswith(CIP68_REFERENCE_PREFIX)
+        ]
+        if not names:
+            return False
+        decoded = decode_datum(utxo.output.datum)
+        for name in names:
+            if name not in self._tokens:
+                bisect.insort(self._sorted_names, name)
+            self._tokens[name] = IndexedToken(utxo=utxo, decoded=decoded)
+        self._names_by_input[utxo.input] = names
+        return True
+
+    def _remove_input(self, tx_in: TransactionInput) -> Optional[UTxO]:
+        """Xóa các token của UTxO đã bị spend, trả về UTxO đó (None nếu không có)."""
+        removed = None
+        for name in self._names_by_input.pop(tx_in, []):
+            entry = self._tokens.get(name)
+            if entry is not None and entry.utxo.input == tx_in:
+                removed = entry.utxo
+                del self._tokens[name]
+                del self._sorted_names[bisect.bisect_left(self._sorted_names, name)]
+        return removed
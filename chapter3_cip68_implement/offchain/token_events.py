@@ -0,0 +1,185 @@
+"""
+CIP-68 Dynamic Asset - Token Events
+===================================
+Feed sự kiện `minted` / `updated` / `burned` của reference token tại store
+address, dùng chung cho mọi client đang mở `/api/events`.
+
+TokenEventFeed là một handler của ChainFollower: follower đã poll store
+address cho store index, feed chỉ đọc thêm delta của cùng các giao dịch đó.
+Với mỗi giao dịch, reference token (100) được so giữa input và output tại
+store address:
+
+- chỉ có ở output: minted
+- có ở cả input và output: updated (version / owner lấy từ datum mới)
+- chỉ có ở input: burned
+
+Sự kiện được đánh số tăng dần và giữ trong ring buffer `TOKEN_EVENTS_BUFFER`
+phần tử. Client chờ trên một asyncio.Event dùng chung, nên số client không
+làm tăng số lần poll Blockfrost; client kết nối lại với `Last-Event-ID` nhận
+tiếp các sự kiện còn trong buffer.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from pycardano import *
+from pycardano.hash import SCRIPT_HASH_SIZE
+
+from .cip68_utils import CIP68_REFERENCE_PREFIX
+from .datum_cache import decode_datum
+
+# Số sự kiện gần nhất giữ lại cho client kết nối lại
+TOKEN_EVENTS_BUFFER = int(os.getenv("TOKEN_EVENTS_BUFFER", "1000"))
+
+MINTED = "minted"
+UPDATED = "updated"
+BURNED = "burned"
+# Follower rollback / nạp lại store index: client nên tải lại danh sách token
+ROLLBACK = "rollback"
+RESYNC = "resync"
+
+
+class TokenEventFeed:
+    """
+    Handler ChainFollower phát sự kiện thay đổi reference token.
+
+    Args:
+        store_address: Địa chỉ store script
+        policy_id: Policy ID của mint script
+        buffer_size: Số sự kiện gần nhất giữ lại
+    """
+
+    def __init__(self, store_address: Address, policy_id: ScriptHash,
+                 buffer_size: int = TOKEN_EVENTS_BUFFER):
+        self.store_address = str(store_address)
+        self.unit_prefix = policy_id.payload.hex() + CIP68_REFERENCE_PREFIX.hex()
+        self._events: Deque[Tuple[int, Dict[str, Any]]] = deque(maxlen=buffer_size)
+        self._last_id = 0
+        self._lock = threading.Lock()
+        # Event dùng chung cho mọi client, thay mới sau mỗi lần phát
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._changed: Optional[asyncio.Event] = None
+        self._stats: Dict[str, int] = {MINTED: 0, UPDATED: 0, BURNED: 0, ROLLBACK: 0, RESYNC: 0}
+
+    def bind(self) -> None:
+        """Gắn feed với event loop hiện tại (gọi trong lifespan)."""
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+
+    # ------------------------------------------------------------------
+    # ChainFollower handler
+    # ------------------------------------------------------------------
+    def apply_transaction(self, tx_hash: str, block_height: int, tx_utxos) -> None:
+        """So reference token giữa input và output tại store address."""
+        spent = self._reference_tokens(
+            tx_in for tx_in in tx_utxos.inputs
+            if not getattr(tx_in, "reference", False) and not getattr(tx_in, "collateral", False)
+        )
+        created = self._reference_tokens(
+            tx_out for tx_out in tx_utxos.outputs if not getattr(tx_out, "collateral", False)
+        )
+        events = []
+        for name, datum in created.items():
+            kind = UPDATED if name in spent else MINTED
+            events.append(self._event(kind, name, datum, tx_hash, block_height))
+        for name, datum in spent.items():
+            if name not in created:
+                events.append(self._event(BURNED, name, datum, tx_hash, block_height))
+        if events:
+            self._publish(events)
+
+    def rollback(self, height: int) -> bool:
+        self._publish([{"event": ROLLBACK, "block_height": height}])
+        return True
+
+    def resync(self) -> None:
+        self._publish([{"event": RESYNC}])
+
+    def snapshot(self) -> None:
+        # Feed không có trạng thái cần lưu
+        return None
+
+    def restore(self, state: Any) -> bool:
+        return True
+
+    def _reference_tokens(self, items) -> Dict[bytes, Any]:
+        """Base name -> datum của các reference token nằm ở store address."""
+        tokens = {}
+        for item in items:
+            if item.address != self.store_address:
+                continue
+            for amount in item.amount:
+                if amount.unit.startswith(self.unit_prefix):
+                    name = bytes.fromhex(amount.unit[len(self.unit_prefix):])
+                    tokens[name] = getattr(item, "inline_datum", None)
+        return tokens
+
+    @staticmethod
+    def _event(kind: str, name: bytes, inline_datum: Optional[str],
+               tx_hash: str, block_height: int) -> Dict[str, Any]:
+        event = {
+            "event": kind,
+            "token_name": name.decode("utf-8", errors="replace"),
+            "version": None,
+            "owner": None,
+            "tx_hash": tx_hash,
+            "block_height": block_height,
+        }
+        decoded = decode_datum(RawCBOR(bytes.fromhex(inline_datum))) if inline_datum else None
+        if decoded is not None:
+            event["version"] = decoded.version
+            event["owner"] = decoded.owner_hex
+        return event
+
+    # ------------------------------------------------------------------
+    # Fan-out
+    # ------------------------------------------------------------------
+    def _publish(self, events: List[Dict[str, Any]]) -> None:
+        """Ghi sự kiện vào buffer (từ thread của follower) và đánh thức client."""
+        now = time.time()
+        with self._lock:
+            for event in events:
+                self._last_id += 1
+                event["timestamp"] = now
+                self._events.append((self._last_id, event))
+                self._stats[event["event"]] += 1
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._notify)
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def since(self, last_id: int) -> Tuple[List[Tuple[int, Dict[str, Any]]], bool]:
+        """
+        Các sự kiện có id > `last_id`.
+
+        Returns:
+            Tuple (danh sách (id, sự kiện), True nếu đã lỡ sự kiện bị đẩy khỏi buffer)
+        """
+        with self._lock:
+            events = [(event_id, event) for event_id, event in self._events if event_id > last_id]
+            oldest = self._events[0][0] if self._events else self._last_id + 1
+            missed = last_id < self._last_id and last_id + 1 < oldest
+        return events, missed
+
+    async def wait(self, last_id: int, timeout: float) -> List[Tuple[int, Dict[str, Any]]]:
+        """Chờ tới khi có sự kiện mới hơn `last_id` (trả về rỗng khi hết timeout)."""
+        events, _ = self.since(last_id)
+        if events:
+            return events
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return []
+        return self.since(last_id)[0]
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._stats, last_id=self._last_id, buffered=len(self._events))
@@ -0,0 +1,369 @@
+"""
+CIP-68 Dynamic Asset - Transaction Tracker
+==========================================
+Hàng đợi submit và theo dõi xác nhận cho các giao dịch gửi qua backend.
+
+Trạng thái của một giao dịch:
+
+    queued → submitted → in_block → confirmed
+      │          │           │
+      ▼          ▼           ▼
+    failed     failed    rolled_back → in_block (vào lại block khác)
+
+- queued: đang chờ trong hàng đợi submit
+- submitted: node đã nhận, giao dịch nằm trong mempool
+- in_block: đã vào block; `confirmations` = số block từ block đó tới tip
+- confirmed: đủ `TX_CONFIRMATIONS` block (trạng thái cuối)
+- failed: node từ chối, quá TTL (invalid_hereafter) mà chưa vào block, hoặc
+  sau `TX_TIMEOUT_SECONDS` giây vẫn không có trong block lẫn mempool
+- rolled_back: block chứa giao dịch bị rollback; giao dịch vẫn được theo dõi
+  vì có thể được đưa lại vào block khác
+
+Một poller dùng chung cho mọi giao dịch đang chờ. Mỗi lần poll lấy tip, các
+block mới (hash + danh sách tx hash của block) và khi cần là mempool, mỗi thứ
+một lần, rồi đối chiếu với toàn bộ giao dịch đang chờ. Số request tới
+Blockfrost tăng theo số block mới chứ không theo số giao dịch được theo dõi.
+"""
+import asyncio
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from blockfrost import ApiError
+from pycardano import *
+
+# Số block cần để coi giao dịch là confirmed
+TX_CONFIRMATIONS = int(os.getenv("TX_CONFIRMATIONS", "10"))
+# Chu kỳ (giây) poll xác nhận
+TX_POLL_SECONDS = float(os.getenv("TX_POLL_SECONDS", "10"))
+# Số submit gửi song song tới node
+TX_SUBMIT_CONCURRENCY = int(os.getenv("TX_SUBMIT_CONCURRENCY", "4"))
+# Số giao dịch tối đa chờ trong hàng đợi submit
+TX_SUBMIT_QUEUE = int(os.getenv("TX_SUBMIT_QUEUE", "256"))
+# Sau bao lâu (giây) giao dịch chưa vào block và không còn trong mempool thì failed
+TX_TIMEOUT_SECONDS = float(os.getenv("TX_TIMEOUT_SECONDS", "900"))
+# Giao dịch ở trạng thái cuối được giữ lại bao lâu (giây) để client hỏi
+TX_HISTORY_SECONDS = float(os.getenv("TX_HISTORY_SECONDS", "3600"))
+# Số block trước tip được quét khi bắt đầu theo dõi (giao dịch vào block giữa hai lần poll)
+TX_LOOKBACK_BLOCKS = 3
+
+QUEUED = "queued"
+SUBMITTED = "submitted"
+IN_BLOCK = "in_block"
+CONFIRMED = "confirmed"
+FAILED = "failed"
+ROLLED_BACK = "rolled_back"
+
+FINAL_STATUSES = {CONFIRMED, FAILED}
+# Các trạng thái poller cần đối chiếu với chain
+WATCHED_STATUSES = {SUBMITTED, IN_BLOCK, ROLLED_BACK}
+
+
+@dataclass
+class TrackedTx:
+    """Trạng thái của một giao dịch được theo dõi"""
+    tx_hash: str
+    status: str = QUEUED
+    confirmations: int = 0
+    block_height: Optional[int] = None
+    block_hash: Optional[str] = None
+    # Slot cuối giao dịch còn hợp lệ (TTL của body), None = không giới hạn
+    invalid_hereafter: Optional[int] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    submitted_at: Optional[float] = None
+    updated_at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class TxTracker:
+    """
+    State machine + poller xác nhận dùng chung cho các giao dịch đã submit.
+
+    Phần đồng bộ (`track`, `poll`) thread-safe và gọi Blockfrost trực tiếp
+    (chạy qua `AsyncChainContext.run`). Phần async (`start`, `submit`,
+    `subscribe`) gắn với event loop của backend.
+
+    Args:
+        context: BlockFrost chain context (cần `.api`)
+        confirmations: Số block để coi là confirmed
+        timeout: Số giây chờ vào block trước khi kiểm tra mempool
+        submit_concurrency: Số submit song song
+        submit_queue: Số giao dịch tối đa chờ submit
+    """
+
+    def __init__(
+        self,
+        context: BlockFrostChainContext,
+        confirmations: int = TX_CONFIRMATIONS,
+        timeout: float = TX_TIMEOUT_SECONDS,
+        submit_concurrency: int = TX_SUBMIT_CONCURRENCY,
+        submit_queue: int = TX_SUBMIT_QUEUE,
+    ):
+        self.context = context
+        self.confirmations = confirmations
+        self.timeout = timeout
+        self.submit_concurrency = submit_concurrency
+        self.submit_queue = submit_queue
+        # Giữ đủ block để giao dịch confirmed trước khi block của nó bị bỏ khỏi cửa sổ
+        self.depth = confirmations + 10
+        self._txs: Dict[str, TrackedTx] = {}
+        # height -> (block hash, tx hash trong block) của các block gần tip
+        self._blocks: Dict[int, Tuple[str, Set[str]]] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            "submitted": 0, "submit_failed": 0, "confirmed": 0, "failed": 0,
+            "rolled_back": 0, "polls": 0, "blocks_fetched": 0, "mempool_checks": 0,
+        }
+        # Các object asyncio, tạo trong start()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    # ------------------------------------------------------------------
+    # State machine
+    # ------------------------------------------------------------------
+    def get(self, tx_hash: str) -> Optional[TrackedTx]:
+        return self._txs.get(tx_hash)
+
+    def track(self, tx_hash: str, invalid_hereafter: Optional[int] = None,
+              status: str = SUBMITTED) -> TrackedTx:
+        """
+        Bắt đầu theo dõi một giao dịch (ví dụ đã submit từ nơi khác).
+
+        Returns:
+            TrackedTx đang có nếu giao dịch đã được theo dõi và chưa failed
+        """
+        with self._lock:
+            self._prune()
+            tracked = self._txs.get(tx_hash)
+            if tracked is not None and tracked.status != FAILED:
+                return tracked
+            tracked = TrackedTx(tx_hash=tx_hash, status=status, invalid_hereafter=invalid_hereafter)
+            if status == SUBMITTED:
+                tracked.submitted_at = tracked.created_at
+            self._txs[tx_hash] = tracked
+            return tracked
+
+    def _set(self, tracked: TrackedTx, status: str, **changes) -> bool:
+        """Cập nhật trạng thái; trả về True nếu có thay đổi (cần thông báo)."""
+        changes["status"] = status
+        if all(getattr(tracked, key) == value for key, value in changes.items()):
+            return False
+        for key, value in changes.items():
+            setattr(tracked, key, value)
+        tracked.updated_at = time.time()
+        if status in (CONFIRMED, FAILED, ROLLED_BACK):
+            self._stats[status] += 1
+        return True
+
+    def _prune(self) -> None:
+        cutoff = time.time() - TX_HISTORY_SECONDS
+        expired = [
+            tx_hash for tx_hash, tracked in self._txs.items()
+            if tracked.status in FINAL_STATUSES and tracked.updated_at < cutoff
+        ]
+        for tx_hash in expired:
+            del self._txs[tx_hash]
+
+    # ------------------------------------------------------------------
+    # Poller
+    # ------------------------------------------------------------------
+    def poll(self) -> List[Dict[str, Any]]:
+        """
+        Đối chiếu mọi giao dịch đang chờ với các block mới và mempool.
+
+        Returns:
+            Trạng thái mới của các giao dịch vừa thay đổi
+        """
+        with self._lock:
+            watched = [t for t in self._txs.values() if t.status in WATCHED_STATUSES]
+            if not watched:
+                # Không có gì để theo dõi: bỏ cửa sổ block, lần sau quét lại từ tip
+                self._blocks.clear()
+                return []
+            self._stats["polls"] += 1
+            tip = self.context.api.block_latest()
+            self._sync_blocks(tip)
+
+            hashes = {t.tx_hash for t in watched}
+            located: Dict[str, Tuple[int, str]] = {}
+            for height, (block_hash, block_txs) in self._blocks.items():
+                for tx_hash in hashes & block_txs:
+                    located[tx_hash] = (height, block_hash)
+
+            now = time.time()
+            mempool: Optional[Set[str]] = None
+            changed = []
+            for tracked in watched:
+                if tracked.tx_hash in located:
+                    height, block_hash = located[tracked.tx_hash]
+                    confirmations = tip.height - height + 1
+                    status = CONFIRMED if confirmations >= self.confirmations else IN_BLOCK
+                    updated = self._set(tracked, status, block_height=height,
+                                        block_hash=block_hash, confirmations=confirmations)
+                elif tracked.status == IN_BLOCK:
+                    updated = self._set(tracked, ROLLED_BACK, block_height=None,
+                                        block_hash=None, confirmations=0)
+                elif tracked.invalid_hereafter is not None and tip.slot > tracked.invalid_hereafter:
+                    updated = self._set(tracked, FAILED, error=(
+                        f"Transaction expired at slot {tracked.invalid_hereafter} without being included"
+                    ))
+                elif now - (tracked.submitted_at or tracked.created_at) > self.timeout:
+                    if mempool is None:
+                        mempool = self._mempool()
+                    updated = False
+                    if mempool is not None and tracked.tx_hash not in mempool:
+                        updated = self._set(tracked, FAILED, error=(
+                            f"Transaction not in a block or the mempool after {self.timeout:.0f}s"
+                        ))
+                else:
+                    updated = False
+                if updated:
+                    changed.append(tracked.to_dict())
+
+            # Chỉ bỏ block cũ sau khi đã đối chiếu (giao dịch trong đó đã đủ confirmations)
+            for height in [h for h in self._blocks if h <= tip.height - self.depth]:
+                del self._blocks[height]
+            return changed
+
+    def _sync_blocks(self, tip: Any) -> None:
+        """Cập nhật cửa sổ block gần tip, bỏ các block đã bị rollback."""
+        for height in [h for h in self._blocks if h >= tip.height]:
+            if height > tip.height or self._blocks[height][0] != tip.hash:
+                del self._blocks[height]
+
+        height = max(self._blocks) + 1 if self._blocks else tip.height - TX_LOOKBACK_BLOCKS
+        height = max(height, tip.height - self.depth + 1)
+        while height <= tip.height:
+            block = tip if height == tip.height else self.context.api.block(str(height))
+            parent = self._blocks.get(height - 1)
+            if parent is not None and block.previous_block != parent[0]:
+                # Block cha không còn trên chain: bỏ nó (và các block sau) rồi lấy lại
+                for h in [h for h in self._blocks if h >= height - 1]:
+                    del self._blocks[h]
+                height -= 1
+                continue
+            block_txs = self.context.api.block_transactions(block.hash, gather_pages=True)
+            self._blocks[height] = (block.hash, set(block_txs))
+            self._stats["blocks_fetched"] += 1
+            height += 1
+
+    def _mempool(self) -> Optional[Set[str]]:
+        """Tx hash trong mempool của Blockfrost (None nếu không lấy được)."""
+        self._stats["mempool_checks"] += 1
+        try:
+            return {tx.tx_hash for tx in self.context.api.mempool(gather_pages=True)}
+        except ApiError as e:
+            if e.status_code == 404:
+                return set()
+            return None
+
+    # ------------------------------------------------------------------
+    # Submission queue (async)
+    # ------------------------------------------------------------------
+    def start(self, async_chain: Any) -> None:
+        """Tạo hàng đợi và các submit worker trên event loop hiện tại."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.submit_queue)
+        self._workers = [
+            loop.create_task(self._submit_worker(async_chain))
+            for _ in range(self.submit_concurrency)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers, self._loop = [], None
+
+    async def submit(self, tx: Transaction) -> TrackedTx:
+        """
+        Đưa giao dịch đã ký vào hàng đợi và chờ node nhận.
+
+        Giao dịch đã được theo dõi (và chưa failed) không bị gửi lại.
+
+        Raises:
+            Exception: lỗi từ node khi submit (giao dịch chuyển sang failed)
+        """
+        tx_hash = str(tx.id)
+        existing = self.get(tx_hash)
+        if existing is not None and existing.status != FAILED:
+            return existing
+        tracked = self.track(tx_hash, invalid_hereafter=tx.transaction_body.ttl, status=QUEUED)
+        self._publish(tracked.to_dict())
+        future = self._loop.create_future()
+        # Hàng đợi đầy → chờ ở đây (backpressure lên request)
+        await self._queue.put((tx, tracked, future))
+        await future
+        return tracked
+
+    async def _submit_worker(self, async_chain: Any) -> None:
+        while True:
+            tx, tracked, future = await self._queue.get()
+            try:
+                await async_chain.submit_tx_cbor(tx.to_cbor())
+            except Exception as e:
+                with self._lock:
+                    self._stats["submit_failed"] += 1
+                    self._set(tracked, FAILED, error=str(e))
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                with self._lock:
+                    self._stats["submitted"] += 1
+                    tracked.submitted_at = time.time()
+                    self._set(tracked, SUBMITTED)
+                if not future.done():
+                    future.set_result(tracked)
+            finally:
+                self._publish(tracked.to_dict())
+                self._queue.task_done()
+
+    async def poll_async(self, async_chain: Any) -> int:
+        """Chạy `poll` trong thread pool chain I/O và đẩy các thay đổi tới subscriber."""
+        changed = await async_chain.run(self.poll)
+        for state in changed:
+            self._publish(state)
+        return len(changed)
+
+    # ------------------------------------------------------------------
+    # Push (SSE / WebSocket)
+    # ------------------------------------------------------------------
+    def subscribe(self, tx_hash: str) -> asyncio.Queue:
+        """Hàng đợi nhận trạng thái mới của giao dịch mỗi khi thay đổi."""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(tx_hash, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, tx_hash: str, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(tx_hash)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[tx_hash]
+
+    def _publish(self, state: Dict[str, Any]) -> None:
+        for queue in self._subscribers.get(state["tx_hash"], ()):
+            queue.put_nowait(state)
+
+    def stats(self) -> Dict[str, Any]:
+        """Bộ đếm submit / xác nhận và số giao dịch theo từng trạng thái."""
+        by_status: Dict[str, int] = {}
+        for tracked in list(self._txs.values()):
+            by_status[tracked.status] = by_status.get(tracked.status, 0) + 1
+        return dict(
+            self._stats,
+            tracked=by_status,
+            submit_queue=self._queue.qsize() if self._queue else 0,
+            block_window=len(self._blocks),
+            subscribers=sum(len(q) for q in self._subscribers.values()),
+        )
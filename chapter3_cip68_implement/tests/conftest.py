@@ -0,0 +1,134 @@
+"""
+Fixture dùng chung cho test của offchain/.
+
+Chạy từ thư mục chapter3_cip68_implement:
+    python -m pytest tests
+"""
+import hashlib
+import os
+import sys
+from fractions import Fraction
+from types import SimpleNamespace
+
+import pytest
+from pycardano import *
+from pycardano.backend.base import GenesisParameters, ProtocolParameters
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from offchain.cip68_utils import CIP68_REFERENCE_PREFIX, create_cip68_datum
+
+PROTOCOL_PARAMS = ProtocolParameters(
+    min_fee_constant=155381, min_fee_coefficient=44, max_block_size=90112, max_tx_size=16384,
+    max_block_header_size=1100, key_deposit=2000000, pool_deposit=500000000,
+    pool_influence=Fraction(3, 10), monetary_expansion=Fraction(3, 1000),
+    treasury_expansion=Fraction(1, 5), decentralization_param=Fraction(0), extra_entropy="",
+    protocol_major_version=9, protocol_minor_version=0, min_utxo=1000000, min_pool_cost=170000000,
+    price_mem=Fraction(577, 10000), price_step=Fraction(721, 10000000),
+    max_tx_ex_mem=14000000, max_tx_ex_steps=10000000000,
+    max_block_ex_mem=62000000, max_block_ex_steps=20000000000,
+    max_val_size=5000, collateral_percent=150, max_collateral_inputs=3,
+    coins_per_utxo_word=4310, coins_per_utxo_byte=4310, cost_models={},
+)
+
+
+class FakeChainContext(ChainContext):
+    """ChainContext trong bộ nhớ: UTxO theo địa chỉ, không gọi mạng."""
+
+    def __init__(self):
+        self.utxos_by_address = {}
+
+    @property
+    def protocol_param(self):
+        return PROTOCOL_PARAMS
+
+    @property
+    def genesis_param(self):
+        return GenesisParameters(
+            active_slots_coefficient=0.05, update_quorum=5, max_lovelace_supply=45000000000000000,
+            network_magic=1, epoch_length=432000, system_start=1666656000, slots_per_kes_period=129600,
+            slot_length=1, max_kes_evolutions=62, security_param=2160,
+        )
+
+    @property
+    def network(self):
+        return Network.TESTNET
+
+    @property
+    def epoch(self):
+        return 300
+
+    @property
+    def last_block_slot(self):
+        return 50_000_000
+
+    def _utxos(self, address):
+        return list(self.utxos_by_address.get(str(address), []))
+
+
+def tx_id(seed: str) -> TransactionId:
+    return TransactionId(hashlib.sha256(seed.encode()).digest())
+
+
+@pytest.fixture
+def context():
+    return FakeChainContext()
+
+
+@pytest.fixture
+def wallet(context):
+    """Địa chỉ ví với 10 UTxO chỉ có ADA."""
+    address = Address(PaymentSigningKey.generate().to_verification_key().hash(), network=Network.TESTNET)
+    context.utxos_by_address[str(address)] = [
+        UTxO(TransactionInput(tx_id(f"wallet-{i}"), 0), TransactionOutput(address, Value(50_000_000)))
+        for i in range(10)
+    ]
+    return address
+
+
+@pytest.fixture
+def policy_id():
+    return ScriptHash(bytes(range(28)))
+
+
+@pytest.fixture
+def store_address():
+    return Address(ScriptHash(bytes(range(28, 56))), network=Network.TESTNET)
+
+
+@pytest.fixture
+def make_datum(policy_id):
+    """(token name, description, version) -> CIP68Datum"""
+    def make(name: str, description: str = "demo", version: int = 1):
+        return create_cip68_datum(
+            policy_id=bytes(policy_id),
+            asset_name=name.encode(),
+            owner_pkh=bytes(28),
+            metadata=description,
+            version=version,
+        )
+    return make
+
+
+@pytest.fixture
+def bf_output(policy_id, store_address):
+    """
+    Output dạng JSON Blockfrost `/txs/{hash}/utxos` chứa reference token (100).
+    (token name, datum, index, address) -> SimpleNamespace
+    """
+    def make(name: str, datum, index: int = 0, address=None, tx_hash: str = ""):
+        unit = (bytes(policy_id) + CIP68_REFERENCE_PREFIX + name.encode()).hex()
+        return SimpleNamespace(
+            address=str(address or store_address),
+            tx_hash=tx_hash,
+            output_index=index,
+            amount=[
+                SimpleNamespace(unit="lovelace", quantity="2000000"),
+                SimpleNamespace(unit=unit, quantity="1"),
+            ],
+            inline_datum=datum.to_cbor_hex() if datum is not None else None,
+            data_hash=None,
+            reference=False,
+            collateral=False,
+        )
+    return make
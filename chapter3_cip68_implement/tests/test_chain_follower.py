@@ -0,0 +1,116 @@
+"""ChainFollower: poll không có giao dịch chỉ lưu cursor, restart bắt kịp từ checkpoint."""
+from types import SimpleNamespace
+
+import pytest
+
+from offchain.chain_follower import ChainFollower, JSONCheckpoint
+
+
+class FakeApi:
+    """Chain tuyến tính: block `h` có hash `b{h}`, giao dịch theo block height."""
+
+    def __init__(self, height=100):
+        self.height = height
+        self.txs = {}
+
+    def block_latest(self):
+        return SimpleNamespace(height=self.height, hash=f"b{self.height}")
+
+    def block(self, height):
+        return SimpleNamespace(hash=f"b{height}")
+
+    def address_transactions(self, address, from_block, to_block, gather_pages):
+        return [
+            SimpleNamespace(tx_hash=tx_hash, block_height=height, tx_index=0)
+            for tx_hash, height in self.txs.items()
+            if int(from_block) <= height <= int(to_block)
+        ]
+
+    def transaction_utxos(self, tx_hash):
+        return SimpleNamespace(inputs=[], outputs=[])
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.applied = []
+        self.snapshots = 0
+        self.restored = None
+
+    def apply_transaction(self, tx_hash, block_height, tx_utxos):
+        self.applied.append(tx_hash)
+
+    def rollback(self, height):
+        return True
+
+    def resync(self):
+        pass
+
+    def snapshot(self):
+        self.snapshots += 1
+        return {"applied": list(self.applied)}
+
+    def restore(self, state):
+        self.restored = state
+        return state is not None
+
+
+@pytest.fixture
+def api():
+    return FakeApi()
+
+
+def follower(api, path):
+    handler = RecordingHandler()
+    return ChainFollower(SimpleNamespace(api=api), ["addr"], {"h": handler}, JSONCheckpoint(str(path))), handler
+
+
+def test_idle_polls_do_not_snapshot_handlers(api, tmp_path):
+    chain, handler = follower(api, tmp_path / "checkpoint.json")
+    assert not chain.start()
+    assert handler.snapshots == 1
+
+    for _ in range(5):
+        api.height += 1
+        assert chain.poll() == 0
+    assert handler.snapshots == 1
+
+    api.height += 1
+    api.txs["t1"] = api.height
+    assert chain.poll() == 1
+    assert handler.snapshots == 2
+
+
+def test_restart_resumes_from_latest_cursor(api, tmp_path):
+    path = tmp_path / "checkpoint.json"
+    chain, _ = follower(api, path)
+    chain.start()
+    api.height += 1
+    api.txs["t1"] = api.height
+    chain.poll()
+    api.height += 3
+    chain.poll()
+
+    restarted, handler = follower(api, path)
+    assert restarted.start()
+    assert restarted.cursor == (api.height, f"b{api.height}")
+    assert handler.restored == {"applied": ["t1"]}
+    # Không áp dụng lại giao dịch đã có trong snapshot
+    assert restarted.poll() == 0
+    assert handler.applied == []
+
+
+def test_full_checkpoint_supersedes_stale_cursor_file(api, tmp_path):
+    path = tmp_path / "checkpoint.json"
+    chain, _ = follower(api, path)
+    chain.start()
+    api.height += 5
+    chain.poll()  # chỉ ghi file .cursor
+
+    # Checkpoint đầy đủ mới (id mới) → file .cursor cũ không còn được dùng
+    api.txs["t1"] = api.height + 1
+    api.height += 1
+    chain.poll()
+    (tmp_path / "checkpoint.json.cursor").write_text(
+        '{"id": 0, "cursor": [1, "b1"], "recent": [[1, "b1"]]}'
+    )
+    assert JSONCheckpoint(str(path)).load()["cursor"] == [api.height, f"b{api.height}"]
@@ -0,0 +1,156 @@
+"""Batch mint / update: giao dịch nối chuỗi evaluate được trên output chưa submit."""
+import os
+from types import SimpleNamespace
+
+import pytest
+from pycardano import *
+
+from conftest import FakeChainContext, tx_id
+from offchain.async_chain import AsyncChainContext
+from offchain.cip68_batch import build_batch_mint_transactions, build_batch_update_transactions
+from offchain.cip68_utils import CIP68_REFERENCE_PREFIX, create_cip68_datum, get_policy_id, get_script_address, load_mint_script, load_store_script
+from offchain.ex_units import ExUnitsCache
+from offchain.utxo_leases import UTxOLeaseManager
+
+BLUEPRINT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cip68_dynamic_asset", "plutus.json")
+EX_UNITS = ExecutionUnits(200_000, 80_000_000)
+
+
+class EvaluatingContext(FakeChainContext):
+    """
+    Như node thật: evaluate chỉ resolve được input đã có trên chain, hoặc
+    được gửi kèm qua additional UTxO set (`api.transaction_evaluate_utxos`).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.api = SimpleNamespace(transaction_evaluate_utxos=self._evaluate_utxos)
+        self.additional = []
+
+    def evaluate_tx_cbor(self, cbor):
+        return self._evaluate(cbor, set())
+
+    def _evaluate_utxos(self, cbor_hex, additional_utxo_set):
+        self.additional.append(additional_utxo_set)
+        extra = {
+            TransactionInput(TransactionId.from_primitive(tx_in["txId"]), tx_in["index"])
+            for tx_in, _ in additional_utxo_set
+        }
+        units = self._evaluate(cbor_hex, extra)
+        evaluation = SimpleNamespace(**{
+            key: SimpleNamespace(memory=value.mem, steps=value.steps) for key, value in units.items()
+        })
+        return SimpleNamespace(result=SimpleNamespace(EvaluationResult=evaluation))
+
+    def _evaluate(self, cbor, extra):
+        if isinstance(cbor, str):
+            cbor = bytes.fromhex(cbor)
+        tx = Transaction.from_cbor(cbor)
+        known = {utxo.input for utxos in self.utxos_by_address.values() for utxo in utxos} | extra
+        unknown = [tx_in for tx_in in tx.transaction_body.inputs if tx_in not in known]
+        if unknown:
+            raise TransactionFailedException(f"Unknown transaction input (missing from UTxO set): {unknown}")
+        redeemers = tx.transaction_witness_set.redeemer or []
+        if isinstance(redeemers, RedeemerMap):
+            keys = [(key.tag, key.index) for key in redeemers.keys()]
+        else:
+            keys = [(redeemer.tag, redeemer.index) for redeemer in redeemers]
+        return {f"{tag.name.lower()}:{index}": ExecutionUnits(EX_UNITS.mem, EX_UNITS.steps) for tag, index in keys}
+
+
+@pytest.fixture
+def context():
+    return EvaluatingContext()
+
+
+@pytest.fixture
+def scripts():
+    mint_script = load_mint_script(BLUEPRINT)
+    store_script = load_store_script(BLUEPRINT)
+    return mint_script, get_policy_id(mint_script), get_script_address(store_script, Network.TESTNET)
+
+
+def assert_chained(batch):
+    """Giao dịch sau spend change output của giao dịch trước."""
+    for previous, current in zip(batch, batch[1:]):
+        previous_id = previous.transaction.transaction_body.id
+        assert any(tx_in.transaction_id == previous_id for tx_in in current.transaction.transaction_body.inputs)
+
+
+def test_batch_mint_evaluates_chained_transactions(context, wallet, scripts):
+    mint_script, policy_id, store_address = scripts
+    items = [(f"token{i}", f"demo {i}") for i in range(5)]
+
+    batch = build_batch_mint_transactions(
+        context, wallet, items, mint_script, policy_id, store_address, max_pairs=2,
+    )
+
+    # 2 + 2 + 1: không bị thu nhỏ về 1 cặp / giao dịch vì evaluate lỗi
+    assert [item.token_names for item in batch] == [["token0", "token1"], ["token2", "token3"], ["token4"]]
+    assert_chained(batch)
+    # Giao dịch 2 và 3 gửi kèm change output của giao dịch trước khi evaluate
+    assert len(context.additional) == 2
+    for additional, previous in zip(context.additional, batch):
+        assert {tx_in["txId"] for tx_in, _ in additional} == {str(previous.transaction.transaction_body.id)}
+
+
+def reference_utxos(context, wallet, policy_id, store_address, count):
+    """Reference token (100) đã mint tại store address, owner là `wallet`."""
+    items = []
+    for i in range(count):
+        name = f"token{i}"
+        datum = create_cip68_datum(
+            policy_id=bytes(policy_id),
+            asset_name=name.encode(),
+            owner_pkh=wallet.payment_part.to_primitive(),
+            metadata="demo",
+            version=1,
+        )
+        asset = Asset({AssetName(CIP68_REFERENCE_PREFIX + name.encode()): 1})
+        utxo = UTxO(
+            TransactionInput(tx_id(f"ref-{i}"), 0),
+            TransactionOutput(store_address, Value(2_000_000, MultiAsset({policy_id: asset})), datum=datum),
+        )
+        context.utxos_by_address.setdefault(str(store_address), []).append(utxo)
+        items.append((name, utxo, 1, f"updated {i}"))
+    return items
+
+
+def test_batch_update_evaluates_chained_transactions(context, wallet, scripts):
+    _, policy_id, store_address = scripts
+    store_script = load_store_script(BLUEPRINT)
+    items = reference_utxos(context, wallet, policy_id, store_address, 5)
+
+    batch = build_batch_update_transactions(
+        context, wallet, items, store_script, policy_id, store_address, max_inputs=2,
+    )
+
+    assert [item.token_names for item in batch] == [["token0", "token1"], ["token2", "token3"], ["token4"]]
+    assert_chained(batch)
+    assert len(context.additional) == 2
+    # Mỗi reference UTxO được spend đúng một lần, với UpdateMetadata redeemer riêng
+    spent = [tx_in for item in batch for tx_in in item.transaction.transaction_body.inputs]
+    assert all(spent.count(utxo.input) == 1 for _, utxo, _, _ in items)
+
+
+def test_batch_mint_through_cold_ex_units_cache_and_leases(context, wallet, scripts, tmp_path):
+    # Như backend: cache ex-units trống, chunk cuối ít cặp hơn (khóa cache khác) nên luôn miss
+    mint_script, policy_id, store_address = scripts
+    chain = AsyncChainContext(
+        context,
+        ex_units=ExUnitsCache.from_blueprint(BLUEPRINT, path=str(tmp_path / "ex_units.json")),
+        leases=UTxOLeaseManager(),
+    )
+    items = [(f"token{i}", f"demo {i}") for i in range(5)]
+    try:
+        batch = build_batch_mint_transactions(
+            context, wallet, items, mint_script, policy_id, store_address, max_pairs=3,
+            build=chain.build_transaction_sync, discard=chain.discard_transaction,
+        )
+    finally:
+        chain.shutdown()
+
+    assert [len(item.token_names) for item in batch] == [3, 2]
+    assert_chained(batch)
+    assert chain.ex_units.stats()["misses"] == 2
+    assert chain.leases.stats()["leased_transactions"] == 2
@@ -0,0 +1,59 @@
+"""DatumCache: mỗi datum hash chỉ decode một lần, LRU, metadata chỉ đọc."""
+import pytest
+from pycardano import *
+
+from offchain.datum_cache import DatumCache
+
+
+def test_same_cbor_is_decoded_once(make_datum):
+    cache = DatumCache()
+    cbor = make_datum("token").to_cbor()
+
+    first = cache.decode(RawCBOR(cbor))
+    second = cache.decode(RawCBOR(cbor))
+    assert first is second
+    assert cache.stats() == {"hits": 1, "misses": 1, "items": 1}
+    assert first.version == 1
+    assert first.owner_hex == "00" * 28
+
+
+def test_raw_cbor_and_datum_object_share_entry(make_datum):
+    cache = DatumCache()
+    datum = make_datum("token")
+    assert cache.decode(datum) is cache.decode(RawCBOR(datum.to_cbor()))
+
+
+def test_invalid_datum_is_cached_as_none():
+    cache = DatumCache()
+    garbage = RawCBOR(Unit().to_cbor())
+    assert cache.decode(garbage) is None
+    assert cache.decode(garbage) is None
+    assert cache.stats()["misses"] == 1
+    assert cache.decode(None) is None
+
+
+def test_lru_eviction(make_datum):
+    cache = DatumCache(max_items=2)
+    a, b, c = (RawCBOR(make_datum(name).to_cbor()) for name in "abc")
+    cache.decode(a)
+    cache.decode(b)
+    cache.decode(a)  # a mới dùng → b bị đẩy ra khi thêm c
+    cache.decode(c)
+    assert len(cache) == 2
+    misses = cache.stats()["misses"]
+    cache.decode(a)
+    assert cache.stats()["misses"] == misses
+    cache.decode(b)
+    assert cache.stats()["misses"] == misses + 1
+
+
+def test_metadata_view_is_read_only_and_decoded(make_datum):
+    decoded = DatumCache().decode(make_datum("token", "hello"))
+    metadata = decoded.metadata
+    assert metadata["description"] == "hello"
+    assert metadata.to_dict() == {"description": "hello"}
+    assert decoded.metadata is metadata
+    with pytest.raises(TypeError):
+        metadata["description"] = "changed"
+    with pytest.raises(AttributeError):
+        decoded.datum = None
@@ -0,0 +1,87 @@
+"""ExUnitsCache: evaluate một lần rồi dùng số đo đã lưu, khóa theo số asset mint, kiểm tra field của TransactionBuilder."""
+import os
+
+import pytest
+from pycardano import *
+
+from conftest import FakeChainContext
+from offchain import ex_units
+from offchain.cip68_utils import MintToken, get_policy_id, load_mint_script
+from offchain.ex_units import ExUnitsCache
+
+BLUEPRINT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cip68_dynamic_asset", "plutus.json")
+
+
+class CountingContext(FakeChainContext):
+    def __init__(self):
+        super().__init__()
+        self.evaluations = 0
+
+    def evaluate_tx_cbor(self, cbor):
+        self.evaluations += 1
+        return {"mint:0": ExecutionUnits(100_000, 40_000_000)}
+
+
+@pytest.fixture
+def context():
+    return CountingContext()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ExUnitsCache.from_blueprint(BLUEPRINT, path=str(tmp_path / "ex_units.json"))
+
+
+def mint_builder(context, wallet, names):
+    mint_script = load_mint_script(BLUEPRINT)
+    policy_id = get_policy_id(mint_script)
+    builder = TransactionBuilder(context)
+    builder.add_input_address(wallet)
+    assets = Asset({AssetName(name.encode()): 1 for name in names})
+    builder.mint = MultiAsset({policy_id: assets})
+    builder.add_output(TransactionOutput(wallet, Value(2_000_000, MultiAsset({policy_id: assets}))))
+    builder.add_minting_script(mint_script, redeemer=Redeemer(MintToken(token_name=names[0].encode())))
+    return builder
+
+
+def mint_ex_units(tx):
+    redeemers = tx.transaction_witness_set.redeemer
+    if isinstance(redeemers, RedeemerMap):
+        return next(iter(redeemers.values())).ex_units
+    return redeemers[0].ex_units
+
+
+def test_second_build_uses_cached_ex_units(context, wallet, cache):
+    cache.build(mint_builder(context, wallet, ["a"]), wallet)
+    tx = cache.build(mint_builder(context, wallet, ["b"]), wallet)
+
+    assert context.evaluations == 1
+    assert cache.stats()["hits"] == 1
+    # Số đo lưu không gồm buffer của builder, dùng lại với EX_UNITS_MARGIN
+    assert mint_ex_units(tx) == ExecutionUnits(int(100_000 * (1 + cache.margin)), int(40_000_000 * (1 + cache.margin)))
+
+
+def test_key_counts_minted_assets(context, wallet, cache):
+    cache.build(mint_builder(context, wallet, ["a"]), wallet)
+    cache.build(mint_builder(context, wallet, ["b", "c"]), wallet)
+    assert context.evaluations == 2
+
+
+def test_forget_and_reload(context, wallet, cache):
+    cache.build(mint_builder(context, wallet, ["a"]), wallet)
+    # Số đo được lưu ra file, cache mới đọc lại được
+    reloaded = ExUnitsCache.from_blueprint(BLUEPRINT, path=cache.path)
+    assert reloaded.stats()["entries"] == 1
+
+    tx = cache.build(mint_builder(context, wallet, ["b"]), wallet)
+    cache.forget(tx.transaction_body.id)
+    assert cache.stats()["entries"] == 0
+    cache.build(mint_builder(context, wallet, ["c"]), wallet)
+    assert context.evaluations == 2
+
+
+def test_missing_builder_internals_fail_loudly(monkeypatch):
+    ex_units.check_builder_internals()
+    monkeypatch.setattr(ex_units, "_BUILDER_INTERNALS", ex_units._BUILDER_INTERNALS + ("_renamed_field",))
+    with pytest.raises(RuntimeError, match="_renamed_field"):
+        ExUnitsCache()
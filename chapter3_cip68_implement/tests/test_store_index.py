@@ -0,0 +1,123 @@
+"""StoreIndex: phân trang bằng cursor, áp dụng delta giao dịch và rollback theo journal."""
+from types import SimpleNamespace
+
+import pytest
+from pycardano import *
+
+from offchain.store_index import StoreIndex
+
+
+@pytest.fixture
+def index(context, store_address, policy_id):
+    return StoreIndex(context, store_address, policy_id, journal_depth=5)
+
+
+def tx(inputs=(), outputs=()):
+    return SimpleNamespace(inputs=list(inputs), outputs=list(outputs))
+
+
+def mint(index, bf_output, make_datum, name, tx_hash, height, description="demo"):
+    """Mint `name` ở block `height`, trả về output (dùng làm input khi spend)."""
+    output = bf_output(name, make_datum(name, description), tx_hash=tx_hash)
+    index.apply_transaction(tx_hash, height, tx(outputs=[output]))
+    return output
+
+
+def names(page):
+    return [name.decode() for name, _ in page]
+
+
+def test_scan_pages_in_name_order_with_cursor(index, bf_output, make_datum):
+    for i, name in enumerate(["delta", "alpha", "charlie", "bravo", "alpine"]):
+        mint(index, bf_output, make_datum, name, "aa" * 31 + f"{i:02x}", 10)
+
+    page, cursor = index.scan(limit=2)
+    assert names(page) == ["alpha", "alpine"]
+    page, cursor = index.scan(after=cursor, limit=2)
+    assert names(page) == ["bravo", "charlie"]
+    page, cursor = index.scan(after=cursor, limit=2)
+    assert names(page) == ["delta"]
+    assert cursor is None
+
+
+def test_scan_prefix_and_predicate(index, bf_output, make_datum):
+    for i, name in enumerate(["alpha", "alpine", "bravo"]):
+        mint(index, bf_output, make_datum, name, "bb" * 31 + f"{i:02x}", 10, description=f"d{i % 2}")
+
+    page, cursor = index.scan(prefix=b"al")
+    assert names(page) == ["alpha", "alpine"] and cursor is None
+    page, _ = index.scan(predicate=lambda entry: entry.decoded.metadata["description"] == "d0")
+    assert names(page) == ["alpha", "bravo"]
+
+
+def test_empty_index_is_falsy_but_scannable(index):
+    assert len(index) == 0
+    assert index.scan() == ([], None)
+
+
+def test_update_then_rollback_restores_previous_utxo(index, bf_output, make_datum):
+    minted = mint(index, bf_output, make_datum, "token", "cc" * 32, 10)
+    assert index.get("token").datum.version == 1
+
+    # Update ở block 11: spend UTxO cũ, trả lại store với version 2
+    index.apply_transaction("dd" * 32, 11, tx(
+        inputs=[minted],
+        outputs=[bf_output("token", make_datum("token", "new", version=2))],
+    ))
+    assert index.get("token").datum.version == 2
+    assert str(index.get("token").utxo.input.transaction_id) == "dd" * 32
+
+    assert index.rollback(10)
+    entry = index.get("token")
+    assert entry.datum.version == 1
+    assert str(entry.utxo.input.transaction_id) == "cc" * 32
+
+    assert index.rollback(9)
+    assert index.get("token") is None
+    assert len(index) == 0
+
+
+def test_burn_then_rollback(index, bf_output, make_datum):
+    minted = mint(index, bf_output, make_datum, "token", "cc" * 32, 10)
+    index.apply_transaction("ee" * 32, 12, tx(inputs=[minted]))
+    assert index.get("token") is None
+    assert index.rollback(11)
+    assert index.get("token").datum.version == 1
+
+
+def test_ignores_other_addresses_reference_and_collateral_inputs(index, bf_output, make_datum, wallet):
+    minted = mint(index, bf_output, make_datum, "token", "cc" * 32, 10)
+    reference = SimpleNamespace(**dict(vars(minted), reference=True))
+    collateral = SimpleNamespace(**dict(vars(minted), collateral=True))
+    index.apply_transaction("ff" * 32, 11, tx(
+        inputs=[reference, collateral],
+        outputs=[bf_output("elsewhere", make_datum("elsewhere"), address=wallet)],
+    ))
+    assert index.get("token") is not None
+    assert index.get("elsewhere") is None
+
+
+def test_rollback_below_journal_window_fails(index, bf_output, make_datum):
+    mint(index, bf_output, make_datum, "old", "cc" * 32, 10)
+    # journal_depth=5: block 20 đẩy journal của block <= 15 ra ngoài
+    mint(index, bf_output, make_datum, "new", "dd" * 32, 20)
+    assert not index.rollback(12)
+    assert index.rollback(19)
+    assert index.get("new") is None
+    assert index.get("old") is not None
+
+
+def test_snapshot_restore_round_trip(index, context, store_address, policy_id, bf_output, make_datum):
+    minted = mint(index, bf_output, make_datum, "token", "cc" * 32, 10)
+    index.apply_transaction("dd" * 32, 11, tx(
+        inputs=[minted],
+        outputs=[bf_output("token", make_datum("token", "new", version=2))],
+    ))
+
+    restored = StoreIndex(context, store_address, policy_id, journal_depth=5)
+    assert restored.restore(index.snapshot())
+    assert restored.get("token").datum.version == 2
+    # Journal cũng được khôi phục nên vẫn rollback được
+    assert restored.rollback(10)
+    assert restored.get("token").datum.version == 1
+    assert not restored.restore(None)
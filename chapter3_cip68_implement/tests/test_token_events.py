@@ -0,0 +1,110 @@
+"""TokenEventFeed: minted / updated / burned từ delta giao dịch, ring buffer, replay theo Last-Event-ID."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from offchain.token_events import BURNED, MINTED, ROLLBACK, UPDATED, TokenEventFeed
+
+
+@pytest.fixture
+def feed(store_address, policy_id):
+    return TokenEventFeed(store_address, policy_id, buffer_size=5)
+
+
+def tx_utxos(inputs=(), outputs=()):
+    return SimpleNamespace(inputs=list(inputs), outputs=list(outputs))
+
+
+def test_mint_update_burn_events(feed, bf_output, make_datum):
+    v1, v2 = make_datum("token", version=1), make_datum("token", version=2)
+    feed.apply_transaction("t1", 10, tx_utxos(outputs=[bf_output("token", v1)]))
+    feed.apply_transaction("t2", 11, tx_utxos([bf_output("token", v1)], [bf_output("token", v2)]))
+    feed.apply_transaction("t3", 12, tx_utxos(inputs=[bf_output("token", v2)]))
+    # Reference input / output ở địa chỉ khác không phải thay đổi token
+    reference = bf_output("token", v2)
+    reference.reference = True
+    feed.apply_transaction("t4", 13, tx_utxos([reference], [bf_output("other", v1, address="addr_test1elsewhere")]))
+
+    events, missed = feed.since(0)
+    assert not missed
+    assert [(event_id, e["event"], e["tx_hash"], e["version"]) for event_id, e in events] == [
+        (1, MINTED, "t1", 1), (2, UPDATED, "t2", 2), (3, BURNED, "t3", 2),
+    ]
+    assert events[0][1]["token_name"] == "token"
+    assert events[0][1]["owner"] == "00" * 28
+    assert feed.stats()[MINTED] == 1 and feed.last_id == 3
+
+
+def test_last_event_id_replays_only_newer_events(feed):
+    for height in range(1, 4):
+        feed.rollback(height)
+    events, missed = feed.since(1)
+    assert [event_id for event_id, _ in events] == [2, 3]
+    assert [event["block_height"] for _, event in events] == [2, 3]
+    assert not missed
+    assert feed.since(3) == ([], False)
+
+
+def test_ring_buffer_reports_missed_events(feed):
+    for height in range(8):
+        feed.rollback(height)
+    # Buffer 5 phần tử: chỉ còn id 4..8
+    assert [event_id for event_id, _ in feed.since(0)[0]] == [4, 5, 6, 7, 8]
+    assert feed.since(2)[1] is True
+    assert feed.since(3)[1] is False
+    assert feed.stats()["buffered"] == 5
+
+
+def test_wait_wakes_on_publish_from_another_thread(feed):
+    async def scenario():
+        feed.bind()
+        waiter = asyncio.ensure_future(feed.wait(0, timeout=5))
+        await asyncio.sleep(0)
+        # Follower chạy trong thread pool chain I/O
+        await asyncio.get_running_loop().run_in_executor(None, feed.rollback, 42)
+        events = await waiter
+        assert await feed.wait(feed.last_id, timeout=0.01) == []
+        return events
+
+    ((event_id, event),) = asyncio.run(scenario())
+    assert event_id == 1 and event["event"] == ROLLBACK
+
+
+def sse_events(response, count):
+    """`count` sự kiện SSE đầu tiên của StreamingResponse: [(id, event)]."""
+    async def read():
+        chunks = []
+        async for chunk in response.body_iterator:
+            chunks.append(chunk)
+            if len(chunks) == count:
+                break
+        return chunks
+
+    result = []
+    for chunk in asyncio.run(read()):
+        fields = dict(line.split(": ", 1) for line in chunk.strip().splitlines())
+        result.append((int(fields["id"]), fields["event"]))
+    return result
+
+
+@pytest.mark.parametrize("last_event_id", ["1", "99"])
+def test_stream_resets_client_with_stale_last_event_id(feed, monkeypatch, last_event_id):
+    from backend import main
+
+    for height in range(8):
+        feed.rollback(height)
+    monkeypatch.setattr(main, "token_events", feed)
+    # Id đã bị đẩy khỏi buffer (1) hoặc của lần chạy trước (99) → reset về id mới nhất
+    response = asyncio.run(main.stream_token_events(last_event_id=last_event_id))
+    assert sse_events(response, 1) == [(8, "reset")]
+
+
+def test_stream_replays_from_last_event_id(feed, monkeypatch):
+    from backend import main
+
+    for height in range(8):
+        feed.rollback(height)
+    monkeypatch.setattr(main, "token_events", feed)
+    response = asyncio.run(main.stream_token_events(last_event_id="6"))
+    assert sse_events(response, 2) == [(7, ROLLBACK), (8, ROLLBACK)]
@@ -0,0 +1,237 @@
+"""TxTracker: state machine queued → submitted → in_block → confirmed / failed / rolled_back, poller dùng chung."""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from blockfrost import ApiError
+
+from offchain import tx_tracker
+from offchain.tx_tracker import (
+    CONFIRMED,
+    FAILED,
+    IN_BLOCK,
+    QUEUED,
+    ROLLED_BACK,
+    SUBMITTED,
+    TxTracker,
+)
+
+
+class FakeChain:
+    """
+    Blockfrost trong bộ nhớ: dãy block (hash, block cha, slot, tx hash) và mempool.
+    Đếm số request để kiểm tra poller không gọi theo từng giao dịch.
+    """
+
+    def __init__(self, height=100):
+        self.blocks = {h: (f"b{h}", f"b{h - 1}", h * 20, []) for h in range(height - 10, height + 1)}
+        self.mempool_txs = set()
+        self.calls = {"block_latest": 0, "block": 0, "block_transactions": 0, "mempool": 0}
+        self._fork = 0
+
+    @property
+    def height(self):
+        return max(self.blocks)
+
+    def add_block(self, *tx_hashes):
+        height = self.height + 1
+        self.blocks[height] = (f"b{height}{'x' * self._fork}", self.blocks[height - 1][0], height * 20, list(tx_hashes))
+        self.mempool_txs -= set(tx_hashes)
+
+    def rollback(self, height):
+        """Bỏ các block sau `height`; block mới sau đó có hash khác (nhánh mới)."""
+        for h in [h for h in self.blocks if h > height]:
+            del self.blocks[h]
+        self._fork += 1
+
+    def _block(self, height):
+        block_hash, previous, slot, _ = self.blocks[height]
+        return SimpleNamespace(height=height, hash=block_hash, previous_block=previous, slot=slot)
+
+    def block_latest(self):
+        self.calls["block_latest"] += 1
+        return self._block(self.height)
+
+    def block(self, height):
+        self.calls["block"] += 1
+        return self._block(int(height))
+
+    def block_transactions(self, block_hash, gather_pages=False):
+        self.calls["block_transactions"] += 1
+        return next(txs for h, _, _, txs in self.blocks.values() if h == block_hash)
+
+    def mempool(self, gather_pages=False):
+        self.calls["mempool"] += 1
+        if not self.mempool_txs:
+            raise ApiError(SimpleNamespace(status_code=404, text="", json=lambda: {}))
+        return [SimpleNamespace(tx_hash=tx_hash) for tx_hash in self.mempool_txs]
+
+
+@pytest.fixture
+def chain():
+    return FakeChain()
+
+
+@pytest.fixture
+def tracker(chain):
+    return TxTracker(SimpleNamespace(api=chain), confirmations=3, timeout=60)
+
+
+def statuses(tracker, *tx_hashes):
+    return [tracker.get(tx_hash).status for tx_hash in tx_hashes]
+
+
+def test_in_block_then_confirmed(tracker, chain):
+    tracker.track("t1")
+    assert tracker.poll() == []
+    assert statuses(tracker, "t1") == [SUBMITTED]
+
+    chain.add_block("t1")
+    (state,) = tracker.poll()
+    assert state["status"] == IN_BLOCK
+    assert (state["block_height"], state["confirmations"]) == (chain.height, 1)
+
+    chain.add_block()
+    assert tracker.poll()[0]["confirmations"] == 2
+    chain.add_block()
+    (state,) = tracker.poll()
+    assert state["status"] == CONFIRMED and state["confirmations"] == 3
+    # Trạng thái cuối: không còn được poll
+    chain.add_block()
+    assert tracker.poll() == []
+    assert tracker.stats()["confirmed"] == 1
+
+
+def test_one_shared_poll_for_many_transactions(tracker, chain):
+    for i in range(50):
+        tracker.track(f"t{i}")
+    tracker.poll()
+    before = dict(chain.calls)
+
+    chain.add_block(*(f"t{i}" for i in range(0, 50, 2)))
+    chain.add_block(*(f"t{i}" for i in range(1, 50, 2)))
+    changed = tracker.poll()
+    assert len(changed) == 50
+    assert all(state["status"] == IN_BLOCK for state in changed)
+    # Một tip + hai block mới, không phụ thuộc 50 giao dịch
+    assert chain.calls["block_latest"] - before["block_latest"] == 1
+    assert chain.calls["block_transactions"] - before["block_transactions"] == 2
+
+
+def test_rollback_then_included_in_another_block(tracker, chain):
+    tracker.track("t1")
+    tracker.poll()
+    chain.add_block("t1")
+    assert tracker.poll()[0]["status"] == IN_BLOCK
+
+    # Block chứa t1 bị bỏ, nhánh mới chưa có t1
+    chain.rollback(chain.height - 1)
+    chain.add_block()
+    chain.add_block()
+    (state,) = tracker.poll()
+    assert state["status"] == ROLLED_BACK
+    assert state["block_hash"] is None and state["confirmations"] == 0
+    assert tracker.stats()["rolled_back"] == 1
+
+    # Giao dịch được đưa lại vào block khác
+    chain.add_block("t1")
+    (state,) = tracker.poll()
+    assert state["status"] == IN_BLOCK
+    assert state["block_hash"] == chain.blocks[chain.height][0]
+
+
+def test_expired_ttl_fails(tracker, chain):
+    tracker.track("t1", invalid_hereafter=chain.blocks[chain.height][2] + 30)
+    tracker.poll()
+    chain.add_block()
+    assert tracker.poll() == []
+    chain.add_block()
+    (state,) = tracker.poll()
+    assert state["status"] == FAILED
+    assert "expired" in state["error"]
+
+
+def test_timeout_checks_mempool_once_per_poll(tracker, chain, monkeypatch):
+    # TrackedTx.created_at dùng time.time thật → bắt đầu từ thời điểm hiện tại
+    now = [time.time()]
+    monkeypatch.setattr(tx_tracker.time, "time", lambda: now[0])
+    tracker.track("gone")
+    tracker.track("waiting")
+    chain.mempool_txs = {"waiting"}
+
+    tracker.poll()
+    assert chain.calls["mempool"] == 0
+
+    now[0] += 61
+    (state,) = tracker.poll()
+    assert state["tx_hash"] == "gone" and state["status"] == FAILED
+    assert statuses(tracker, "waiting") == [SUBMITTED]
+    assert chain.calls["mempool"] == 1
+
+
+def test_track_does_not_reset_a_tracked_transaction(tracker, chain):
+    tracker.track("t1")
+    tracker.poll()
+    chain.add_block("t1")
+    tracker.poll()
+    assert tracker.track("t1").status == IN_BLOCK
+
+
+class FakeAsyncChain:
+    """AsyncChainContext tối giản: submit qua `submit`, `run` chạy hàm đồng bộ."""
+
+    def __init__(self, submit):
+        self.submit = submit
+
+    async def submit_tx_cbor(self, cbor):
+        return self.submit(cbor)
+
+    async def run(self, fn, *args):
+        return fn(*args)
+
+
+def fake_tx(name, ttl=None):
+    return SimpleNamespace(id=name, to_cbor=lambda: name.encode(), transaction_body=SimpleNamespace(ttl=ttl))
+
+
+def test_submit_queue_publishes_every_transition(tracker, chain):
+    async def scenario():
+        async_chain = FakeAsyncChain(lambda cbor: cbor.decode())
+        tracker.start(async_chain)
+        updates = tracker.subscribe("t1")
+        tracked = await tracker.submit(fake_tx("t1"))
+        assert tracked.status == SUBMITTED
+        # Submit lại giao dịch đang theo dõi → không gửi lần hai
+        assert await tracker.submit(fake_tx("t1")) is tracked
+
+        chain.add_block("t1")
+        assert await tracker.poll_async(async_chain) == 1
+        await tracker.stop()
+        seen = []
+        while not updates.empty():
+            seen.append(updates.get_nowait()["status"])
+        return seen
+
+    assert asyncio.run(scenario()) == [QUEUED, SUBMITTED, IN_BLOCK]
+    assert tracker.stats()["submitted"] == 1
+
+
+def test_submit_failure_marks_failed_and_raises(tracker):
+    def reject(cbor):
+        raise RuntimeError("BadInputsUTxO")
+
+    async def scenario():
+        tracker.start(FakeAsyncChain(reject))
+        updates = tracker.subscribe("t1")
+        with pytest.raises(RuntimeError, match="BadInputsUTxO"):
+            await tracker.submit(fake_tx("t1"))
+        await tracker.stop()
+        return [updates.get_nowait()["status"] for _ in range(updates.qsize())]
+
+    assert asyncio.run(scenario()) == [QUEUED, FAILED]
+    tracked = tracker.get("t1")
+    assert tracked.status == FAILED and tracked.error == "BadInputsUTxO"
+    assert tracker.stats()["submit_failed"] == 1
+    # Giao dịch failed được theo dõi lại khi submit lần nữa
+    assert tracker.track("t1").status == SUBMITTED
@@ -0,0 +1,113 @@
+"""UTxOLeaseManager: build đồng thời từ cùng ví không chọn trùng input."""
+import pytest
+from pycardano import *
+
+import offchain.utxo_leases as utxo_leases
+from offchain.utxo_leases import UTxOLeaseManager
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.monotonic giả, tăng bằng clock.advance(seconds)."""
+    class Clock:
+        now = 1000.0
+
+        def advance(self, seconds):
+            self.now += seconds
+
+    fake = Clock()
+    monkeypatch.setattr(utxo_leases.time, "monotonic", lambda: fake.now)
+    return fake
+
+
+def make_tx(inputs, fee=0):
+    body = TransactionBody(inputs=list(inputs), outputs=[], fee=fee)
+    return Transaction(body, TransactionWitnessSet())
+
+
+def new_builder(context, wallet):
+    builder = TransactionBuilder(context)
+    builder.add_input_address(wallet)
+    builder.add_output(TransactionOutput(wallet, Value(10_000_000)))
+    return builder
+
+
+def build_once(builder):
+    tx_body = builder.build(change_address=builder.input_addresses[0])
+    return Transaction(tx_body, builder.build_witness_set())
+
+
+def inputs_of(context, wallet, count):
+    return [utxo.input for utxo in context.utxos(wallet)[:count]]
+
+
+def test_acquire_conflicts_until_release(context, wallet, clock):
+    leases = UTxOLeaseManager(lease_ttl=60, spent_ttl=120)
+    a, b = inputs_of(context, wallet, 2)
+    first = make_tx([a, b])
+    second = make_tx([b], fee=1)
+
+    assert leases.acquire(first)
+    # Cùng giao dịch lease lại là hợp lệ, giao dịch khác chạm input b thì không
+    assert leases.acquire(first)
+    assert not leases.acquire(second)
+    assert leases.leased_inputs() == {a, b}
+
+    leases.release(first.id)
+    assert leases.leased_inputs() == set()
+    assert leases.acquire(second)
+
+
+def test_lease_and_spent_ttl(context, wallet, clock):
+    leases = UTxOLeaseManager(lease_ttl=60, spent_ttl=120)
+    (a,) = inputs_of(context, wallet, 1)
+    tx = make_tx([a])
+
+    leases.acquire(tx)
+    clock.advance(61)
+    assert leases.leased_inputs() == set()
+
+    leases.acquire(tx)
+    leases.release(tx.id, spent=True)
+    clock.advance(100)
+    # Đã submit: vẫn bị loại trừ sau lease_ttl, cho tới hết spent_ttl
+    assert leases.leased_inputs() == {a}
+    clock.advance(21)
+    assert leases.stats() == {"leased_transactions": 0, "leased_inputs": 0}
+
+
+def test_sequential_builds_use_disjoint_inputs(context, wallet):
+    leases = UTxOLeaseManager()
+    txs = [leases.build(new_builder(context, wallet), build_once) for _ in range(5)]
+    inputs = [set(tx.transaction_body.inputs) for tx in txs]
+    assert all(inputs)
+    assert len(set().union(*inputs)) == sum(len(i) for i in inputs)
+
+
+def test_build_retries_when_concurrent_build_leases_same_input(context, wallet):
+    leases = UTxOLeaseManager()
+    calls, builders = [], []
+
+    def racing_build_once(builder):
+        builders.append(builder)
+        tx = build_once(builder)
+        if not calls:
+            # Build khác lease đúng các input này ngay trước khi build đầu kịp lease
+            assert leases.acquire(make_tx(tx.transaction_body.inputs, fee=1))
+        calls.append(tx)
+        return tx
+
+    tx = leases.build(new_builder(context, wallet), racing_build_once)
+    assert len(calls) == 2
+    assert not set(tx.transaction_body.inputs) & set(calls[0].transaction_body.inputs)
+    assert set(tx.transaction_body.inputs) <= leases.leased_inputs()
+    # Build lại trên bản sao chưa build của builder (không còn input / fee của lần đầu), cùng chain context
+    assert builders[1] is not builders[0] and builders[1].context is context
+    assert len(tx.transaction_body.inputs) == len(calls[0].transaction_body.inputs)
+
+
+def test_build_fails_when_every_input_is_leased(context, wallet):
+    leases = UTxOLeaseManager()
+    assert leases.acquire(make_tx(inputs_of(context, wallet, 10)))
+    with pytest.raises(UTxOSelectionException):
+        leases.build(new_builder(context, wallet), build_once)
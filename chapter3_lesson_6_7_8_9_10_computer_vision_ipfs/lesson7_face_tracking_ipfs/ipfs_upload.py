@@ -15,9 +15,10 @@ import os
 import sys
 from pathlib import Path
 
-import requests
 from dotenv import load_dotenv
 
+from http_client import get_http_client
+
 # Load .env từ thư mục gốc repo
 env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
@@ -38,14 +39,16 @@ class PinataIPFS:
     def __init__(self, jwt_token: str):
         self.jwt = jwt_token
         self.headers = {"Authorization": f"Bearer {jwt_token}"}
+        # Session dùng chung: keep-alive + retry khi 429/5xx
+        self.http = get_http_client()
         self._verify_auth()
 
     def _verify_auth(self):
         """Kiểm tra JWT token hợp lệ"""
-        resp = requests.get(
+        resp = self.http.get(
             f"{PINATA_API_URL}/data/testAuthentication",
             headers=self.headers,
-            timeout=10,
+            deadline=10,
         )
         if resp.status_code != 200:
             raise ValueError(f"❌ Pinata JWT không hợp lệ: {resp.text}")
@@ -73,11 +76,11 @@ class PinataIPFS:
         }
 
         print(f"📤 Uploading JSON to Pinata IPFS...")
-        resp = requests.post(
+        resp = self.http.post(
             f"{PINATA_API_URL}/pinning/pinJSONToIPFS",
             json=payload,
             headers={**self.headers, "Content-Type": "application/json"},
-            timeout=30,
+            deadline=30,
         )
 
         if resp.status_code != 200:
@@ -116,14 +119,14 @@ class PinataIPFS:
         pin_name = name or path.name
 
         print(f"📤 Uploading file to Pinata IPFS: {path.name}")
-        with open(file_path, "rb") as f:
-            resp = requests.post(
-                f"{PINATA_API_URL}/pinning/pinFileToIPFS",
-                files={"file": (path.name, f)},
-                data={"pinataMetadata": json.dumps({"name": pin_name})},
-                headers=self.headers,
-                timeout=60,
-            )
+        # Đọc hết nội dung (không truyền file object) để retry gửi lại được
+        resp = self.http.post(
+            f"{PINATA_API_URL}/pinning/pinFileToIPFS",
+            files={"file": (path.name, path.read_bytes())},
+            data={"pinataMetadata": json.dumps({"name": pin_name})},
+            headers=self.headers,
+            deadline=60,
+        )
 
         if resp.status_code != 200:
             raise Exception(f"Upload failed: {resp.text}")
@@ -154,9 +157,9 @@ class PinataIPFS:
             Parsed JSON data
         """
         print(f"📥 Fetching from IPFS: {cid}")
-        resp = requests.get(
+        resp = self.http.get(
             f"https://gateway.pinata.cloud/ipfs/{cid}",
-            timeout=30,
+            deadline=30,
         )
 
         if resp.status_code != 200:
@@ -8,13 +8,20 @@ Usage:
     python -m uvicorn app.main:app --reload --port 8000
 """
 
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from app.routers import did, face
+from app.services.async_chain import get_chain_executor, run_blocking, shutdown_chain_executor
+from app.services.chain_follower import CHAIN_FOLLOWER_POLL_SECONDS
+from app.services.face_index import sync_face_index
+from app.services.face_pipeline import get_face_pipeline
+from app.services.warmup import run_warmup, warmup_state
 
 # Logging
 logging.basicConfig(
@@ -24,12 +31,45 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+async def follow_chain(follower):
+    """Background task: áp dụng delta của block mới tại script address vào DID registry"""
+    while True:
+        try:
+            # Face index theo kịp registry (chỉ đọc DID thay đổi từ lần trước, kể cả từ worker khác)
+            synced = await run_blocking(sync_face_index)
+            if synced.get("added") or synced.get("removed"):
+                logger.info(f"🧭 Face index: {synced}")
+        except Exception as e:
+            logger.warning(f"⚠️ Face index sync failed: {e}")
+        await asyncio.sleep(CHAIN_FOLLOWER_POLL_SECONDS)
+        try:
+            applied = await run_blocking(follower.poll)
+            if applied:
+                logger.info(f"⛓️ Chain follower: applied {applied} TX(s)")
+        except Exception as e:
+            logger.warning(f"⚠️ Chain follower poll failed: {e}")
+
+
+async def warm_up_and_follow():
+    """Background task: warm-up mọi service (→ /ready), sau đó follow block mới"""
+    svc = await run_warmup()
+    if svc is not None:
+        await follow_chain(svc.follower)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup & shutdown events"""
     logger.info("🚀 Starting DApp Backend...")
+    get_chain_executor()
+    get_face_pipeline().start()
+    # Warm-up chạy nền: server nhận /health, /ready ngay; /ready = 200 khi warm-up xong
+    background = asyncio.create_task(warm_up_and_follow())
     yield
     logger.info("🛑 Shutting down...")
+    background.cancel()
+    await get_face_pipeline().stop()
+    shutdown_chain_executor()
 
 
 app = FastAPI(
@@ -68,5 +108,11 @@ app.include_router(did.router, prefix="/api/v1", tags=["DID Management"])
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {"status": "ok", "service": "did-face-dapp"}
+    """Health check endpoint (liveness — process còn sống)"""
+    return {"status": "ok", "service": "did-face-dapp", "ready": warmup_state.ready}
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe — 503 cho tới khi warm-up (model, contract, protocol params) xong"""
+    return JSONResponse(warmup_state.to_dict(), status_code=200 if warmup_state.ready else 503)
@@ -21,6 +21,31 @@ class FaceDetectResponse(BaseModel):
     faces_detected: int
     faces: List[FaceInfo]
     ipfs_cid: Optional[str] = None
+    job_id: Optional[str] = None  # wait=false: poll GET /face/jobs/{job_id}
+
+
+class FaceJobResponse(BaseModel):
+    job_id: str
+    filename: str
+    status: str  # pending | pinned | failed
+    ipfs_cid: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float
+    finished_at: Optional[float] = None
+
+
+class FaceBatchItem(BaseModel):
+    filename: str
+    faces_detected: int = 0
+    faces: List[FaceInfo] = []
+    ipfs_cid: Optional[str] = None
+    error: Optional[str] = None
+
+
+class FaceBatchResponse(BaseModel):
+    images: int
+    faces_detected: int
+    results: List[FaceBatchItem]
 
 
 # ═══════════════════════════════════════════════
@@ -59,6 +84,21 @@ class DIDInfo(BaseModel):
     tx_history: List[dict] = []
 
 
+class IdentifyMatch(BaseModel):
+    did_id: str
+    similarity: float
+    match: bool
+    status: Optional[str] = None
+
+
+class IdentifyResponse(BaseModel):
+    faces_detected: int
+    threshold: float
+    matches: List[IdentifyMatch] = []
+    search_ms: float = 0.0
+    message: str = ""
+
+
 class DIDListResponse(BaseModel):
     total: int
     dids: List[DIDInfo]
@@ -1,8 +1,10 @@
 """DID Management Router"""
 
 import logging
+import time
+from typing import Optional
 
-from fastapi import APIRouter, File, HTTPException, UploadFile
+from fastapi import APIRouter, BackgroundTasks, File, HTTPException, Query, UploadFile
 
 from app.models.schemas import (
     DIDActionResponse,
@@ -11,25 +13,35 @@ from app.models.schemas import (
     DIDInfo,
     DIDListResponse,
     FaceVerifyResponse,
+    IdentifyMatch,
+    IdentifyResponse,
 )
+from app.services.async_chain import run_blocking
 from app.services.cardano_service import get_cardano_service
-from app.services.face_tracker import get_face_tracker
+from app.services.face_index import get_face_index, sync_face_index
+from app.services.face_pipeline import get_face_pipeline
 from app.services.ipfs_service import get_ipfs_service
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/did")
 
+# Cosine similarity tối thiểu để coi là cùng một người
+MATCH_THRESHOLD = 0.7
+
 
 @router.post("/create", response_model=DIDCreateResponse)
-async def create_did(req: DIDCreateRequest):
+async def create_did(req: DIDCreateRequest, background_tasks: BackgroundTasks):
     """Tạo DID mới + Lock vào smart contract"""
     try:
-        svc = get_cardano_service()
-        result = svc.create_did(
+        svc = await run_blocking(get_cardano_service)
+        result = await run_blocking(
+            svc.create_did,
             ipfs_hash=req.ipfs_hash,
             did_id=req.did_id,
             amount=req.amount,
         )
+        # Thêm embedding của DID mới vào face index (sau khi trả response)
+        background_tasks.add_task(sync_face_index)
         return DIDCreateResponse(**result)
     except Exception as e:
         logger.error(f"❌ Create DID failed: {e}")
@@ -40,8 +52,8 @@ async def create_did(req: DIDCreateRequest):
 async def register_did(did_id: str):
     """Register DID (CKV continuing output)"""
     try:
-        svc = get_cardano_service()
-        result = svc.perform_action(did_id, "register")
+        svc = await run_blocking(get_cardano_service)
+        result = await run_blocking(svc.perform_action, did_id, "register")
         return DIDActionResponse(**result)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -60,8 +72,8 @@ async def verify_did(did_id: str, file: UploadFile = File(...)):
     """
     import numpy as np
 
-    svc = get_cardano_service()
-    did_info = svc.get_did(did_id)
+    svc = await run_blocking(get_cardano_service)
+    did_info = await run_blocking(svc.get_did, did_id)
     if not did_info:
         raise HTTPException(status_code=404, detail=f"DID not found: {did_id}")
 
@@ -70,8 +82,7 @@ async def verify_did(did_id: str, file: UploadFile = File(...)):
         image_bytes = await file.read()
         logger.info(f"🔍 Verify: received image ({len(image_bytes)} bytes)")
 
-        tracker = get_face_tracker()
-        faces = tracker.detect_and_embed(image_bytes)
+        faces = await get_face_pipeline().detect(image_bytes)
 
         if not faces:
             return FaceVerifyResponse(
@@ -97,8 +108,10 @@ async def verify_did(did_id: str, file: UploadFile = File(...)):
         ipfs_cid = did_info["ipfs_hash"]
         logger.info(f"📦 Fetching original embedding from IPFS: {ipfs_cid}")
 
-        original_data = ipfs.get_json(ipfs_cid)
-        original_embedding = original_data["faces"][0]["embedding"]
+        original_embeddings = await run_blocking(ipfs.get_embeddings, ipfs_cid)
+        if original_embeddings is None:
+            raise ValueError(f"No face embedding stored at {ipfs_cid}")
+        original_embedding = original_embeddings[0]
 
         # Step 3: Cosine similarity
         vec_new = np.array(new_embedding, dtype=np.float32)
@@ -118,7 +131,7 @@ async def verify_did(did_id: str, file: UploadFile = File(...)):
         tx_hash = None
         explorer_url = None
         if match:
-            result = svc.perform_action(did_id, "verify")
+            result = await run_blocking(svc.perform_action, did_id, "verify")
             tx_hash = result["tx_hash"]
             explorer_url = result["explorer_url"]
             logger.info(f"✅ Verify TX submitted: {tx_hash}")
@@ -140,12 +153,61 @@ async def verify_did(did_id: str, file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/identify", response_model=IdentifyResponse)
+async def identify_face(file: UploadFile = File(...), k: int = Query(5, ge=1, le=100)):
+    """
+    Nhận diện 1:N — khuôn mặt này thuộc DID nào?
+
+    Embedding của ảnh được so với face index (mọi DID chưa revoke),
+    trả về top-k DID theo cosine similarity.
+    """
+    image_bytes = await file.read()
+    try:
+        faces = await get_face_pipeline().detect(image_bytes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not faces or not faces[0]["embedding"]:
+        return IdentifyResponse(
+            faces_detected=len(faces),
+            threshold=MATCH_THRESHOLD,
+            message="No face detected in uploaded image",
+        )
+
+    index = await run_blocking(get_face_index)
+    start = time.perf_counter()
+    results = index.search(faces[0]["embedding"], k)
+    search_ms = (time.perf_counter() - start) * 1000
+
+    svc = await run_blocking(get_cardano_service)
+    matches = []
+    for did_id, similarity in results:
+        did = await run_blocking(svc.get_did, did_id)
+        matches.append(IdentifyMatch(
+            did_id=did_id,
+            similarity=round(similarity, 4),
+            match=similarity >= MATCH_THRESHOLD,
+            status=did["status"] if did else None,
+        ))
+
+    best = matches[0] if matches else None
+    return IdentifyResponse(
+        faces_detected=len(faces),
+        threshold=MATCH_THRESHOLD,
+        matches=matches,
+        search_ms=round(search_ms, 3),
+        message=f"Identified as {best.did_id}" if best and best.match else "No matching DID",
+    )
+
+
 @router.post("/{did_id}/revoke", response_model=DIDActionResponse)
-async def revoke_did(did_id: str):
+async def revoke_did(did_id: str, background_tasks: BackgroundTasks):
     """Thu hồi DID vĩnh viễn"""
     try:
-        svc = get_cardano_service()
-        result = svc.perform_action(did_id, "revoke")
+        svc = await run_blocking(get_cardano_service)
+        result = await run_blocking(svc.perform_action, did_id, "revoke")
+        # DID đã revoke không còn được nhận diện
+        background_tasks.add_task(sync_face_index)
         return DIDActionResponse(**result)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -157,19 +219,43 @@ async def revoke_did(did_id: str):
 @router.get("/{did_id}", response_model=DIDInfo)
 async def get_did(did_id: str):
     """Lấy thông tin DID"""
-    svc = get_cardano_service()
-    did = svc.get_did(did_id)
+    svc = await run_blocking(get_cardano_service)
+    did = await run_blocking(svc.get_did, did_id)
     if not did:
         raise HTTPException(status_code=404, detail=f"DID not found: {did_id}")
     return DIDInfo(**did)
 
 
+@router.get("/stats/cache")
+async def chain_cache_stats():
+    """Hit/miss của chain cache (UTxO, epoch, protocol params), UTxO leases, chain follower và IPFS cache"""
+    svc = await run_blocking(get_cardano_service)
+    if not svc.ready:
+        raise HTTPException(status_code=503, detail="CardanoService not ready")
+    return dict(
+        svc.context.stats(),
+        utxo_leases=svc.leases.stats(),
+        pending_outputs=svc.context.pending_count(),
+        chain_follower=svc.follower.stats() if svc.follower else None,
+        face_index=get_face_index().stats(),
+        ipfs_cache=get_ipfs_service().cache.stats(),
+        ipfs_http=get_ipfs_service().http.stats(),
+        face_pipeline=get_face_pipeline().stats(),
+    )
+
+
 @router.get("/list/all", response_model=DIDListResponse)
-async def list_dids():
-    """Liệt kê tất cả DIDs"""
-    svc = get_cardano_service()
-    dids = svc.list_dids()
+async def list_dids(
+    status: Optional[str] = None,
+    owner: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+):
+    """Liệt kê DIDs (lọc theo status/owner, phân trang)"""
+    svc = await run_blocking(get_cardano_service)
+    dids = await run_blocking(svc.list_dids, status=status, owner=owner, limit=limit, offset=offset)
+    total = await run_blocking(svc.count_dids, status=status, owner=owner)
     return DIDListResponse(
-        total=len(dids),
+        total=total,
         dids=[DIDInfo(**d) for d in dids],
     )
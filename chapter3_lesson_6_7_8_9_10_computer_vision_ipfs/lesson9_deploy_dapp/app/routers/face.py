@@ -1,69 +1,123 @@
 """Face Detection Router"""
 
+import asyncio
+import io
 import logging
+import os
+import zipfile
+from typing import List, Tuple
 
-from fastapi import APIRouter, File, HTTPException, UploadFile
+from fastapi import APIRouter, File, HTTPException, Query, UploadFile
 
-from app.models.schemas import FaceDetectResponse, FaceInfo
-from app.services.face_tracker import get_face_tracker
-from app.services.ipfs_service import get_ipfs_service
+from app.models.schemas import FaceBatchItem, FaceBatchResponse, FaceDetectResponse, FaceInfo, FaceJobResponse
+from app.services.async_chain import run_blocking
+from app.services.face_pipeline import get_face_pipeline
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/face")
 
+# Số ảnh tối đa trong một request batch (tính cả ảnh trong file zip)
+FACE_BATCH_MAX_IMAGES = int(os.getenv("FACE_BATCH_MAX_IMAGES", "500"))
+# Tổng dung lượng ảnh (byte, sau khi giải nén) tối đa trong một request batch
+FACE_BATCH_MAX_BYTES = int(os.getenv("FACE_BATCH_MAX_BYTES", str(256 * 1024 * 1024)))
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def _face_infos(faces: List[dict]) -> List[FaceInfo]:
+    return [
+        FaceInfo(
+            face_id=f["face_id"],
+            confidence=f["confidence"],
+            bbox=f["bbox"],
+            landmark_count=f["landmark_count"],
+            embedding_dim=f["embedding_dim"],
+        )
+        for f in faces
+    ]
+
+
+def _expand_uploads(uploads: List[Tuple[str, bytes]]) -> List[Tuple[str, bytes]]:
+    """
+    Giải nén các file zip thành danh sách (tên, bytes) của từng ảnh.
+
+    Số ảnh và tổng dung lượng được kiểm tra từ `infolist()` trước khi giải nén
+    (413 nếu vượt FACE_BATCH_MAX_IMAGES / FACE_BATCH_MAX_BYTES), nên zip có
+    nhiều entry hoặc tỉ lệ nén cao bị từ chối mà không tốn bộ nhớ.
+    """
+    # Mỗi upload: (ảnh thường, None) hoặc (zip, các entry ảnh), giữ thứ tự upload
+    parts = []
+    count = total = 0
+    for filename, data in uploads:
+        if not zipfile.is_zipfile(io.BytesIO(data)):
+            parts.append(((filename, data), None))
+            count += 1
+            total += len(data)
+            continue
+        archive = zipfile.ZipFile(io.BytesIO(data))
+        entries = [
+            info for info in archive.infolist()
+            if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+        parts.append((archive, entries))
+        count += len(entries)
+        total += sum(info.file_size for info in entries)
+
+    try:
+        if count > FACE_BATCH_MAX_IMAGES:
+            raise HTTPException(status_code=413, detail=f"Too many images: {count} > {FACE_BATCH_MAX_IMAGES}")
+        if total > FACE_BATCH_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"Images too large: {total} > {FACE_BATCH_MAX_BYTES} bytes")
+        images = []
+        for part, entries in parts:
+            if entries is None:
+                images.append(part)
+            else:
+                images.extend((info.filename, part.read(info)) for info in entries)
+        return images
+    finally:
+        for part, entries in parts:
+            if entries is not None:
+                part.close()
+
 
 @router.post("/detect", response_model=FaceDetectResponse)
-async def detect_faces(file: UploadFile = File(...)):
+async def detect_faces(
+    file: UploadFile = File(...),
+    wait: bool = Query(True, description="false: trả về job_id ngay, pin IPFS chạy nền"),
+):
     """
     Upload ảnh → phát hiện khuôn mặt → upload embedding lên IPFS
 
     Returns:
-        Danh sách faces + IPFS CID
+        Danh sách faces + IPFS CID (hoặc job_id khi wait=false)
     """
     try:
         image_bytes = await file.read()
         logger.info(f"📸 Received image: {file.filename} ({len(image_bytes)} bytes)")
 
-        # Face detection
-        tracker = get_face_tracker()
-        faces = tracker.detect_and_embed(image_bytes)
+        # Face detection (stage detect của pipeline, không chặn event loop)
+        pipeline = get_face_pipeline()
+        faces = await pipeline.detect(image_bytes)
 
         if not faces:
             return FaceDetectResponse(faces_detected=0, faces=[])
 
         # Upload embedding lên IPFS
-        ipfs_cid = None
-        try:
-            ipfs = get_ipfs_service()
-            embedding_data = {
-                "faces": [
-                    {
-                        "face_id": f["face_id"],
-                        "confidence": f["confidence"],
-                        "embedding": f["embedding"],
-                    }
-                    for f in faces
-                ]
-            }
-            ipfs_cid = ipfs.upload_json(embedding_data, name=file.filename or "face")
-        except Exception as e:
-            logger.warning(f"⚠️ IPFS upload failed: {e}")
-
-        face_infos = [
-            FaceInfo(
-                face_id=f["face_id"],
-                confidence=f["confidence"],
-                bbox=f["bbox"],
-                landmark_count=f["landmark_count"],
-                embedding_dim=f["embedding_dim"],
-            )
-            for f in faces
-        ]
+        name = file.filename or "face"
+        ipfs_cid = job_id = None
+        if wait:
+            try:
+                ipfs_cid = await pipeline.pin(faces, name)
+            except Exception as e:
+                logger.warning(f"⚠️ IPFS upload failed: {e}")
+        else:
+            job_id = (await pipeline.submit(faces, name)).job_id
 
         return FaceDetectResponse(
             faces_detected=len(faces),
-            faces=face_infos,
+            faces=_face_infos(faces),
             ipfs_cid=ipfs_cid,
+            job_id=job_id,
         )
 
     except Exception as e:
@@ -71,3 +125,72 @@ async def detect_faces(file: UploadFile = File(...)):
         error_details = traceback.format_exc()
         logger.error(f"❌ Face detection failed: {e}\n{error_details}")
         raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
+
+
+@router.post("/detect/batch", response_model=FaceBatchResponse)
+async def detect_faces_batch(files: List[UploadFile] = File(...), upload: bool = True):
+    """
+    Nhiều ảnh (multipart và/hoặc file .zip) → detect + embedding cả batch → upload IPFS
+
+    Ảnh được decode song song, embedding của mọi khuôn mặt tính trong một lần.
+    Mỗi ảnh có khuôn mặt được upload thành một CID riêng (đăng ký cả danh sách nhân viên).
+    """
+    uploads = [(f.filename or f"image_{i}", await f.read()) for i, f in enumerate(files)]
+    try:
+        images = await run_blocking(_expand_uploads, uploads)
+    except zipfile.BadZipFile as e:
+        raise HTTPException(status_code=400, detail=f"Invalid zip file: {e}")
+    if not images:
+        raise HTTPException(status_code=400, detail="No images in request")
+    logger.info(f"📸 Received batch: {len(images)} image(s)")
+
+    try:
+        pipeline = get_face_pipeline()
+        detections = await pipeline.detect_batch([data for _, data in images])
+    except Exception as e:
+        logger.error(f"❌ Batch face detection failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
+
+    results = []
+    for (filename, _), faces in zip(images, detections):
+        if faces is None:
+            results.append(FaceBatchItem(filename=filename, error="Cannot decode image"))
+        else:
+            results.append(FaceBatchItem(
+                filename=filename,
+                faces_detected=len(faces),
+                faces=_face_infos(faces),
+            ))
+
+    # Upload embedding của các ảnh có khuôn mặt lên IPFS song song (giới hạn bởi stage pin)
+    if upload:
+        pending = [
+            (item, faces)
+            for item, faces in zip(results, detections)
+            if faces
+        ]
+        cids = await asyncio.gather(
+            *(pipeline.pin(faces, item.filename) for item, faces in pending),
+            return_exceptions=True,
+        )
+        for (item, _), cid in zip(pending, cids):
+            if isinstance(cid, Exception):
+                logger.warning(f"⚠️ IPFS upload failed for {item.filename}: {cid}")
+                item.error = f"IPFS upload failed: {cid}"
+            else:
+                item.ipfs_cid = cid
+
+    return FaceBatchResponse(
+        images=len(images),
+        faces_detected=sum(item.faces_detected for item in results),
+        results=results,
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=FaceJobResponse)
+async def get_pin_job(job_id: str):
+    """Trạng thái pin IPFS của một request /face/detect?wait=false"""
+    job = get_face_pipeline().get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return FaceJobResponse(**job.to_dict())
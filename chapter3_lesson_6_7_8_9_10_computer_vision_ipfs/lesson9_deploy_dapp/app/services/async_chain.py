@@ -0,0 +1,49 @@
+"""
+Async Chain I/O — bounded thread pool cho PyCardano/Blockfrost
+
+CardanoService dùng BlockFrostChainContext (đồng bộ). Router `async def`
+phải chạy các lời gọi này qua run_blocking() để không chặn event loop.
+"""
+
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Số thread tối đa cho chain I/O
+CHAIN_IO_WORKERS = int(os.getenv("CHAIN_IO_WORKERS", "64"))
+
+# Singleton
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_chain_executor() -> ThreadPoolExecutor:
+    """Lazy singleton — thread pool dùng chung cho mọi chain call"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=CHAIN_IO_WORKERS,
+            thread_name_prefix="chain-io",
+        )
+        logger.info(f"✅ Chain I/O pool initialized ({CHAIN_IO_WORKERS} workers)")
+    return _executor
+
+
+async def run_blocking(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Chạy hàm đồng bộ (Blockfrost/TransactionBuilder) trong chain I/O pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_chain_executor(), functools.partial(fn, *args, **kwargs)
+    )
+
+
+def shutdown_chain_executor():
+    """Dừng thread pool khi tắt app"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -8,9 +8,10 @@ import hashlib
 import json
 import logging
 import os
+import threading
 import time
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import List, Optional, Tuple
 
 from dotenv import load_dotenv
 from dataclasses import dataclass
@@ -23,12 +24,20 @@ from pycardano import (
     PlutusData,
     PlutusV3Script,
     Redeemer,
+    Transaction,
     TransactionBuilder,
     TransactionOutput,
     Value,
+    UTxO,
     plutus_script_hash,
 )
 
+from app.services.chain_cache import CachedChainContext
+from app.services.chain_follower import ChainFollower
+from app.services.did_registry import DIDRegistry, RegistryCheckpoint, create_did_registry
+from app.services.pending_outputs import PendingChainContext
+from app.services.utxo_leases import UTxOLeaseManager
+
 logger = logging.getLogger(__name__)
 # Load .env — hỗ trợ cả local và Docker
 env_path = Path(__file__).parent.parent.parent.parent / ".env"
@@ -76,15 +85,22 @@ ACTION_MAP = {
     "revoke": Revoke,
 }
 
+# Trạng thái DID sau mỗi action
+STATUS_MAP = {"register": "registered", "verify": "verified", "update": "locked", "revoke": "revoked"}
+
 
 # Singleton
 _instance: Optional["CardanoService"] = None
+_instance_lock = threading.Lock()
 
 
 def get_cardano_service() -> "CardanoService":
+    # Có thể được gọi đồng thời từ chain I/O threads → khởi tạo một lần
     global _instance
     if _instance is None:
-        _instance = CardanoService()
+        with _instance_lock:
+            if _instance is None:
+                _instance = CardanoService()
     return _instance
 
 
@@ -100,12 +116,20 @@ class CardanoService:
             self.ready = False
             return
 
-        # Blockfrost
-        self.context = BlockFrostChainContext(
-            project_id=blockfrost_id,
-            base_url="https://cardano-preprod.blockfrost.io/api/",
+        # Blockfrost (bọc cache: UTxO TTL ngắn, protocol params theo epoch)
+        # + overlay output chưa xác nhận để action kế tiếp spend ngay (TX chaining)
+        self.context = PendingChainContext(
+            CachedChainContext(
+                BlockFrostChainContext(
+                    project_id=blockfrost_id,
+                    base_url="https://cardano-preprod.blockfrost.io/api/",
+                )
+            )
         )
 
+        # Lease input giữa các TX build đồng thời từ cùng ví
+        self.leases = UTxOLeaseManager()
+
         # Wallet
         hd = HDWallet.from_mnemonic(mnemonic)
         pay_node = hd.derive_from_path("m/1852'/1815'/0'/0/0")
@@ -140,8 +164,18 @@ class CardanoService:
             self.script = None
             self.script_address = None
 
-        # In-memory DID registry
-        self.dids: Dict[str, dict] = {}
+        # DID registry bền vững (SQLite mặc định) — dùng chung giữa các worker
+        self.registry: DIDRegistry = create_did_registry()
+
+        # Follow block mới tại script address, checkpoint lưu cùng registry
+        self.follower = None
+        if self.script_address:
+            self.follower = ChainFollower(
+                self.context,
+                [self.script_address],
+                {"did_registry": self},
+                checkpoint=RegistryCheckpoint(self.registry),
+            )
         self.ready = True
 
         logger.info(f"✅ CardanoService initialized")
@@ -149,11 +183,165 @@ class CardanoService:
         if self.script_address:
             logger.info(f"   Script: {self.script_address}")
 
+    @staticmethod
+    def _decode_datum(utxo: UTxO) -> Optional[DIDDatum]:
+        """Inline datum của UTxO tại script address → DIDDatum (None nếu không hợp lệ)"""
+        datum = utxo.output.datum
+        if datum is None:
+            return None
+        try:
+            cbor = datum.cbor if hasattr(datum, "cbor") else datum.to_cbor()
+            return DIDDatum.from_cbor(cbor)
+        except Exception:
+            return None
+
+    def sync_registry(self) -> dict:
+        """
+        Dựng lại registry từ UTxO tại script address (on-chain là nguồn gốc).
+
+        DID còn UTxO được upsert theo datum; DID trong registry không còn UTxO
+        nào được đánh dấu revoked (chỉ Revoke tiêu UTxO mà không tạo output mới).
+        """
+        if not self.ready or not self.script_address:
+            return {"synced": 0, "revoked": 0}
+
+        seen = set()
+        for utxo in self.context.utxos(self.script_address):
+            datum = self._decode_datum(utxo)
+            did_id = (
+                self._upsert_datum(datum, str(utxo.input.transaction_id), authoritative=True)
+                if datum else None
+            )
+            if did_id:
+                seen.add(did_id)
+
+        revoked = 0
+        for did in self.registry.list():
+            if did["did_id"] not in seen and did["status"] != "revoked":
+                did["status"] = "revoked"
+                self.registry.upsert(did)
+                revoked += 1
+
+        logger.info(f"✅ DID registry synced: {len(seen)} on-chain, {revoked} revoked")
+        return {"synced": len(seen), "revoked": revoked}
+
+    def _upsert_datum(self, datum: DIDDatum, tx_hash: str, authoritative: bool = False) -> Optional[str]:
+        """
+        Cập nhật registry theo DIDDatum của output `tx_hash`, trả về did_id.
+
+        authoritative=True khi output là UTxO hiện tại (sync_registry): các entry
+        sau `tx_hash` trong tx_history (TX đã bị rollback) bị bỏ.
+        """
+        try:
+            did_id = datum.did_id.decode("utf-8")
+            ipfs_hash = datum.face_ipfs_hash.decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+
+        existing = self.registry.get(did_id)
+        history = existing["tx_history"] if existing else []
+        known = next((i for i, entry in enumerate(history) if entry["tx_hash"] == tx_hash), None)
+        if known is None:
+            history.append({"action": "sync", "tx_hash": tx_hash})
+        elif not authoritative:
+            # TX đã được ghi nhận (do chính service submit) → registry đã mới hơn
+            return did_id
+        else:
+            history = history[:known + 1]
+
+        last_action = history[-1]["action"]
+        if datum.verified:
+            status = "verified"
+        elif last_action in ("create", "register", "update"):
+            status = STATUS_MAP.get(last_action, "locked")
+        elif existing and existing["status"] in ("locked", "registered"):
+            # register giữ nguyên datum → không phân biệt được từ chain
+            status = existing["status"]
+        else:
+            status = "locked"
+
+        self.registry.upsert({
+            "did_id": did_id,
+            "ipfs_hash": ipfs_hash,
+            "owner": bytes(datum.owner).hex(),
+            "created_at": datum.created_at,
+            "verified": bool(datum.verified),
+            "status": status,
+            "tx_history": history,
+        })
+        return did_id
+
+    # ── ChainFollower handler: registry đã bền vững nên không cần snapshot ──
+    def apply_transaction(self, tx_hash: str, block_height: int, tx_utxos):
+        """Delta của một TX tại script address: output mới → upsert, input không có output tiếp → revoked"""
+        script_address = str(self.script_address)
+        spent = set()
+        for tx_in in tx_utxos.inputs:
+            if getattr(tx_in, "reference", False) or getattr(tx_in, "collateral", False):
+                continue
+            if tx_in.address == script_address:
+                datum = self._decode_inline_datum(tx_in)
+                if datum is not None:
+                    spent.add(datum.did_id.decode("utf-8", errors="replace"))
+        for tx_out in tx_utxos.outputs:
+            if getattr(tx_out, "collateral", False) or tx_out.address != script_address:
+                continue
+            datum = self._decode_inline_datum(tx_out)
+            if datum is not None:
+                spent.discard(self._upsert_datum(datum, tx_hash))
+        for did_id in spent:
+            did = self.registry.get(did_id)
+            if did and did["status"] != "revoked" and did["tx_history"][-1]["tx_hash"] != tx_hash:
+                self.registry.record_action(did_id, "revoke", tx_hash, "revoked")
+
+    @staticmethod
+    def _decode_inline_datum(tx_io) -> Optional[DIDDatum]:
+        """Inline datum (hex) của input/output trong `/txs/{hash}/utxos` → DIDDatum"""
+        inline_datum = getattr(tx_io, "inline_datum", None)
+        if not inline_datum:
+            return None
+        try:
+            return DIDDatum.from_cbor(bytes.fromhex(inline_datum))
+        except Exception:
+            return None
+
+    def rollback(self, height: int) -> bool:
+        # Không giữ journal → follower gọi resync() (dựng lại từ UTxO)
+        return False
+
+    def resync(self):
+        self.sync_registry()
+
+    def snapshot(self):
+        return None
+
+    def restore(self, state) -> bool:
+        # Checkpoint nằm cùng registry nên luôn khớp với dữ liệu đã lưu
+        return True
+
     def get_balance(self) -> float:
         """Balance in ADA"""
         utxos = self.context.utxos(self.address)
         return sum(u.output.amount.coin for u in utxos) / 1_000_000
 
+    def _build_and_submit(self, builder: TransactionBuilder) -> Transaction:
+        """Build + ký + submit TX, input được lease để TX đồng thời không chọn trùng"""
+        signed_tx = self.leases.build(
+            builder,
+            lambda b: b.build_and_sign(
+                signing_keys=[self.pay_skey, self.stake_skey],
+                change_address=self.address,
+            ),
+        )
+        try:
+            self.context.submit_tx(signed_tx)
+        except Exception:
+            self.leases.release(signed_tx.id)
+            raise
+        # Input đã tiêu: tiếp tục loại trừ cho tới khi UTxO set cập nhật
+        self.leases.release(signed_tx.id, spent=True)
+        return signed_tx
+
     def create_did(self, ipfs_hash: str, did_id: str = None, amount: int = 2_000_000) -> dict:
         """Tạo DID mới + Lock vào smart contract"""
         if not self.ready or not self.script:
@@ -179,15 +367,11 @@ class CardanoService:
             )
         )
 
-        signed_tx = builder.build_and_sign(
-            signing_keys=[self.pay_skey, self.stake_skey],
-            change_address=self.address,
-        )
-        self.context.submit_tx(signed_tx)
+        signed_tx = self._build_and_submit(builder)
         tx_hash = str(signed_tx.id)
 
         # Lưu vào registry
-        self.dids[did_id] = {
+        self.registry.upsert({
             "did_id": did_id,
             "ipfs_hash": ipfs_hash,
             "owner": bytes(self.pay_vkey.hash()).hex(),
@@ -195,7 +379,7 @@ class CardanoService:
             "verified": False,
             "status": "locked",
             "tx_history": [{"action": "create", "tx_hash": tx_hash}],
-        }
+        })
 
         logger.info(f"✅ DID created: {did_id} | TX: {tx_hash}")
         return {
@@ -208,23 +392,30 @@ class CardanoService:
 
     def perform_action(self, did_id: str, action_name: str, new_ipfs_hash: str = None) -> dict:
         """Thực hiện action (register/verify/update/revoke) trên DID — CKV logic"""
-        if did_id not in self.dids:
+        did_info = self.registry.get(did_id)
+        if did_info is None:
             raise ValueError(f"DID not found: {did_id}")
 
         action_class = ACTION_MAP.get(action_name.lower())
         if not action_class:
             raise ValueError(f"Unknown action: {action_name}")
 
-        did_info = self.dids[did_id]
         last_tx = did_info["tx_history"][-1]["tx_hash"]
 
-        # Tìm UTxO
+        # Tìm UTxO (gồm cả output chưa xác nhận của TX trước → không chờ block)
         utxos = self.context.utxos(self.script_address)
         target = None
         for utxo in utxos:
             if str(utxo.input.transaction_id) == last_tx:
                 target = utxo
                 break
+        if not target:
+            # Worker khác có thể đã chạy action → tìm theo did_id trong datum
+            for utxo in utxos:
+                datum = self._decode_datum(utxo)
+                if datum is not None and datum.did_id == did_id.encode("utf-8"):
+                    target = utxo
+                    break
 
         if not target:
             raise ValueError(f"UTxO not found for TX: {last_tx}")
@@ -277,31 +468,35 @@ class CardanoService:
                 self.script_address, Value(target.output.amount.coin), datum=target.output.datum,
             ))
 
-        signed_tx = builder.build_and_sign(
-            signing_keys=[self.pay_skey, self.stake_skey],
-            change_address=self.address,
-        )
-        self.context.submit_tx(signed_tx)
+        signed_tx = self._build_and_submit(builder)
         tx_hash = str(signed_tx.id)
 
         # Update registry — map action to proper status name
-        STATUS_MAP = {"register": "registered", "verify": "verified", "update": "locked", "revoke": "revoked"}
-        did_info["status"] = STATUS_MAP.get(action_name, action_name)
-        did_info["tx_history"].append({"action": action_name, "tx_hash": tx_hash})
-        if action_name == "verify":
-            did_info["verified"] = True
+        status = STATUS_MAP.get(action_name, action_name)
+        self.registry.record_action(
+            did_id, action_name, tx_hash, status,
+            verified=True if action_name == "verify" else None,
+            ipfs_hash=new_ipfs_hash if action_name == "update" else None,
+        )
 
         logger.info(f"✅ {action_name.upper()} DID: {did_id} | TX: {tx_hash}")
         return {
             "did_id": did_id,
             "action": action_name,
             "tx_hash": tx_hash,
-            "status": did_info["status"],
+            "status": status,
             "explorer_url": f"https://preprod.cardanoscan.io/transaction/{tx_hash}",
         }
 
     def get_did(self, did_id: str) -> Optional[dict]:
-        return self.dids.get(did_id)
+        return self.registry.get(did_id)
+
+    def list_dids(self, status: Optional[str] = None, owner: Optional[str] = None,
+                  limit: Optional[int] = None, offset: int = 0) -> List[dict]:
+        return self.registry.list(status=status, owner=owner, limit=limit, offset=offset)
+
+    def count_dids(self, status: Optional[str] = None, owner: Optional[str] = None) -> int:
+        return self.registry.count(status=status, owner=owner)
 
-    def list_dids(self) -> List[dict]:
-        return list(self.dids.values())
+    def changed_dids(self, seq: int) -> Tuple[List[dict], int]:
+        return self.registry.changed_since(seq)
@@ -0,0 +1,208 @@
+"""
+Chain Follower — cập nhật state của script address theo block mới
+
+`ChainFollower` là bản sao có chủ ý của `chapter3_cip68_implement/offchain/chain_follower.py` (bản
+gốc, có test; checkpoint ở đây là `RegistryCheckpoint`): lesson9 được deploy độc lập nên không import
+chéo sang chapter3; sửa ở bản gốc rồi chép sang đây.
+
+Poll tip từ một cursor (block height + hash), chỉ áp dụng delta (input bị
+spend, output mới) của các TX chạm tới địa chỉ được theo dõi:
+
+1. Block tại cursor không còn trên chain (rollback) → lùi về block gần nhất
+   còn trên chain và gọi `rollback(height)` của handler (False → `resync()`)
+2. TX của các địa chỉ trong (cursor, tip] → `apply_transaction()` theo thứ tự block
+3. Lưu checkpoint (cursor + snapshot handler) → restart chỉ bắt kịp block còn thiếu;
+   poll không áp dụng TX nào chỉ lưu cursor (`save_cursor`), không snapshot lại handler
+
+Handler cài đặt: apply_transaction(tx_hash, block_height, tx_utxos),
+rollback(height) -> bool, resync(), snapshot() -> JSON, restore(state) -> bool.
+"""
+
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from blockfrost import ApiError
+from pycardano import Address, BlockFrostChainContext
+
+# Chu kỳ (giây) poll block mới
+CHAIN_FOLLOWER_POLL_SECONDS = float(os.getenv("CHAIN_FOLLOWER_POLL_SECONDS", "20"))
+# Số block gần nhất giữ lại để tìm điểm rẽ nhánh khi rollback
+CHAIN_FOLLOWER_ROLLBACK_DEPTH = int(os.getenv("CHAIN_FOLLOWER_ROLLBACK_DEPTH", "100"))
+
+Cursor = Tuple[int, str]
+
+
+class ChainFollower:
+    """
+    Follow block mới cho một tập địa chỉ và phát delta tới các handler.
+
+    Args:
+        context: BlockFrost chain context (cần `.api`)
+        addresses: Các địa chỉ được theo dõi
+        handlers: Tên -> handler (tên dùng làm khóa snapshot trong checkpoint)
+        checkpoint: Nơi lưu checkpoint (có `load()` / `save(dict)` / `save_cursor(cursor, recent)`), None = không lưu
+        depth: Số block gần nhất giữ lại để xử lý rollback
+    """
+
+    def __init__(
+        self,
+        context: BlockFrostChainContext,
+        addresses: List[Address],
+        handlers: Dict[str, Any],
+        checkpoint: Optional[Any] = None,
+        depth: int = CHAIN_FOLLOWER_ROLLBACK_DEPTH,
+    ):
+        self.context = context
+        self.addresses = [str(address) for address in addresses]
+        self.handlers = handlers
+        self.checkpoint = checkpoint
+        self.depth = depth
+        # (height, hash) của block đã xử lý tới (inclusive)
+        self.cursor: Optional[Cursor] = None
+        # Các cursor gần nhất (tăng dần theo height), dùng tìm điểm rẽ nhánh
+        self._recent: List[Cursor] = []
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {"polls": 0, "transactions": 0, "rollbacks": 0, "resyncs": 0}
+
+    # ------------------------------------------------------------------
+    # Startup
+    # ------------------------------------------------------------------
+    def start(self) -> bool:
+        """
+        Khôi phục từ checkpoint, hoặc resync toàn bộ nếu không có.
+
+        Returns:
+            True nếu khôi phục được từ checkpoint
+        """
+        with self._lock:
+            saved = self.checkpoint.load() if self.checkpoint else None
+            if saved and saved.get("addresses") == self.addresses and saved.get("cursor"):
+                states = saved.get("handlers", {})
+                if all(handler.restore(states.get(name)) for name, handler in self.handlers.items()):
+                    self.cursor = tuple(saved["cursor"])
+                    self._recent = [tuple(c) for c in saved.get("recent", [])] or [self.cursor]
+                    return True
+            self._resync()
+            return False
+
+    def _resync(self) -> None:
+        # Lấy tip trước khi nạp UTxO để không bỏ sót giao dịch ở giữa;
+        # áp dụng lại giao dịch từ block này là idempotent.
+        tip = self.context.api.block_latest()
+        for handler in self.handlers.values():
+            handler.resync()
+        self.cursor = (tip.height, tip.hash)
+        self._recent = [self.cursor]
+        self._stats["resyncs"] += 1
+        self._save()
+
+    # ------------------------------------------------------------------
+    # Follow
+    # ------------------------------------------------------------------
+    def poll(self) -> int:
+        """
+        Xử lý các block mới kể từ cursor.
+
+        Returns:
+            Số giao dịch đã áp dụng
+        """
+        with self._lock:
+            if self.cursor is None:
+                self._resync()
+                return 0
+            self._stats["polls"] += 1
+            tip = self.context.api.block_latest()
+            if tip.hash == self.cursor[1]:
+                return 0
+            if not self._on_chain(self.cursor):
+                if not self._rollback():
+                    return 0
+            if tip.height <= self.cursor[0]:
+                return 0
+
+            applied = 0
+            for tx in self._transactions(self.cursor[0] + 1, tip.height):
+                tx_utxos = self.context.api.transaction_utxos(tx.tx_hash)
+                for handler in self.handlers.values():
+                    handler.apply_transaction(tx.tx_hash, tx.block_height, tx_utxos)
+                applied += 1
+
+            self.cursor = (tip.height, tip.hash)
+            self._recent.append(self.cursor)
+            self._recent = [c for c in self._recent if c[0] > tip.height - self.depth]
+            self._stats["transactions"] += applied
+            # Không có TX nào thì state của handler không đổi: chỉ lưu cursor
+            self._save(full=applied > 0)
+            return applied
+
+    def _transactions(self, from_height: int, to_height: int) -> list:
+        """Giao dịch của các địa chỉ trong [from_height, to_height], theo thứ tự block."""
+        by_hash = {}
+        for address in self.addresses:
+            try:
+                txs = self.context.api.address_transactions(
+                    address,
+                    from_block=str(from_height),
+                    to_block=str(to_height),
+                    gather_pages=True,
+                )
+            except ApiError as e:
+                if e.status_code == 404:
+                    continue
+                raise
+            for tx in txs:
+                by_hash[tx.tx_hash] = tx
+        return sorted(by_hash.values(), key=lambda tx: (tx.block_height, tx.tx_index))
+
+    def _on_chain(self, cursor: Cursor) -> bool:
+        """Block (height, hash) có còn nằm trên chain hiện tại không."""
+        try:
+            return self.context.api.block(str(cursor[0])).hash == cursor[1]
+        except ApiError as e:
+            if e.status_code == 404:
+                return False
+            raise
+
+    def _rollback(self) -> bool:
+        """
+        Lùi cursor về block gần nhất còn trên chain.
+
+        Returns:
+            False nếu không tìm được điểm rẽ nhánh (đã resync toàn bộ)
+        """
+        self._stats["rollbacks"] += 1
+        for cursor in reversed(self._recent[:-1]):
+            if not self._on_chain(cursor):
+                continue
+            for handler in self.handlers.values():
+                if not handler.rollback(cursor[0]):
+                    handler.resync()
+            self.cursor = cursor
+            self._recent = [c for c in self._recent if c[0] <= cursor[0]]
+            self._save()
+            return True
+        # Rollback sâu hơn `depth` block → nạp lại toàn bộ
+        self._resync()
+        return False
+
+    def _save(self, full: bool = True) -> None:
+        if self.checkpoint is None:
+            return
+        recent = [list(c) for c in self._recent]
+        if not full and self.checkpoint.save_cursor(list(self.cursor), recent):
+            return
+        self.checkpoint.save({
+            "addresses": self.addresses,
+            "cursor": list(self.cursor),
+            "recent": recent,
+            "handlers": {name: handler.snapshot() for name, handler in self.handlers.items()},
+        })
+
+    def stats(self) -> Dict[str, Any]:
+        """Cursor hiện tại và bộ đếm poll / giao dịch / rollback."""
+        return dict(
+            self._stats,
+            cursor_height=self.cursor[0] if self.cursor else None,
+            cursor_hash=self.cursor[1] if self.cursor else None,
+        )
@@ -0,0 +1,349 @@
+"""
+DID Registry — lưu trữ DID bền vững, có index
+
+Thay cho dict `self.dids` trong bộ nhớ của CardanoService:
+- Restart không mất DID
+- Nhiều worker/replica dùng chung một registry (SQLite WAL trên cùng volume,
+  hoặc backend khác cài đặt DIDRegistry)
+
+Backend chọn qua `DID_REGISTRY_URL`:
+    sqlite:///path/to/did_registry.db   (mặc định: sqlite:///did_registry.db)
+    memory://                           (chỉ trong process, dùng cho dev/test)
+
+Registry được dựng lại từ UTxO tại script address (CardanoService.sync_registry)
+khi chưa có checkpoint của chain follower, nên on-chain vẫn là nguồn dữ liệu gốc.
+Checkpoint được lưu cùng registry (RegistryCheckpoint) để hai thứ luôn khớp nhau.
+
+Mỗi lần ghi một DID được gán số thứ tự thay đổi tăng dần (`seq`), nên bên đọc
+(face index) chỉ cần `changed_since(seq)` thay vì liệt kê lại toàn bộ registry.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+DID_REGISTRY_URL = os.getenv("DID_REGISTRY_URL", "sqlite:///did_registry.db")
+
+
+class DIDRegistry(ABC):
+    """
+    Interface lưu trữ DID.
+
+    Mỗi DID là một dict: did_id, ipfs_hash, owner, created_at, verified,
+    status, tx_history (list {"action", "tx_hash"}).
+    """
+
+    @abstractmethod
+    def upsert(self, did: dict):
+        """Thêm mới hoặc ghi đè toàn bộ một DID"""
+
+    @abstractmethod
+    def get(self, did_id: str) -> Optional[dict]:
+        """Lấy DID theo id (None nếu không có)"""
+
+    @abstractmethod
+    def list(self, status: Optional[str] = None, owner: Optional[str] = None,
+             limit: Optional[int] = None, offset: int = 0) -> List[dict]:
+        """Liệt kê DID theo thứ tự created_at"""
+
+    @abstractmethod
+    def count(self, status: Optional[str] = None, owner: Optional[str] = None) -> int:
+        """Đếm DID theo bộ lọc"""
+
+    @abstractmethod
+    def changed_since(self, seq: int, limit: Optional[int] = None) -> Tuple[List[dict], int]:
+        """
+        DID được ghi sau số thứ tự thay đổi `seq`, theo thứ tự ghi.
+
+        Returns:
+            Tuple (danh sách DID, số thứ tự của thay đổi cuối cùng đã đọc)
+        """
+
+    @abstractmethod
+    def get_meta(self, key: str) -> Optional[dict]:
+        """Đọc giá trị phụ (checkpoint, ...) theo key"""
+
+    @abstractmethod
+    def set_meta(self, key: str, value: dict):
+        """Ghi giá trị phụ theo key"""
+
+    def record_action(self, did_id: str, action: str, tx_hash: str, status: str,
+                      verified: Optional[bool] = None, ipfs_hash: Optional[str] = None):
+        """Ghi nhận một action: thêm vào tx_history và cập nhật trạng thái"""
+        did = self.get(did_id)
+        if did is None:
+            raise ValueError(f"DID not found: {did_id}")
+        did["status"] = status
+        if verified is not None:
+            did["verified"] = verified
+        if ipfs_hash is not None:
+            did["ipfs_hash"] = ipfs_hash
+        did["tx_history"].append({"action": action, "tx_hash": tx_hash})
+        self.upsert(did)
+
+
+class InMemoryDIDRegistry(DIDRegistry):
+    """Registry trong bộ nhớ process (hành vi cũ của `self.dids`)"""
+
+    def __init__(self):
+        self._dids: Dict[str, dict] = {}
+        # did_id -> số thứ tự của lần ghi gần nhất
+        self._seqs: Dict[str, int] = {}
+        self._seq = 0
+        self._meta: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def upsert(self, did: dict):
+        with self._lock:
+            self._dids[did["did_id"]] = json.loads(json.dumps(did))
+            self._seq += 1
+            self._seqs[did["did_id"]] = self._seq
+
+    def get(self, did_id: str) -> Optional[dict]:
+        with self._lock:
+            did = self._dids.get(did_id)
+            return json.loads(json.dumps(did)) if did else None
+
+    def _filter(self, status, owner) -> List[dict]:
+        dids = sorted(self._dids.values(), key=lambda d: d["created_at"])
+        return [
+            d for d in dids
+            if (status is None or d["status"] == status)
+            and (owner is None or d["owner"] == owner)
+        ]
+
+    def list(self, status=None, owner=None, limit=None, offset=0) -> List[dict]:
+        with self._lock:
+            dids = self._filter(status, owner)[offset:]
+            if limit is not None:
+                dids = dids[:limit]
+            return json.loads(json.dumps(dids))
+
+    def count(self, status=None, owner=None) -> int:
+        with self._lock:
+            return len(self._filter(status, owner))
+
+    def changed_since(self, seq: int, limit: Optional[int] = None) -> Tuple[List[dict], int]:
+        with self._lock:
+            changed = sorted((s, did_id) for did_id, s in self._seqs.items() if s > seq)[:limit]
+            dids = [json.loads(json.dumps(self._dids[did_id])) for _, did_id in changed]
+            return dids, changed[-1][0] if changed else seq
+
+    def get_meta(self, key: str) -> Optional[dict]:
+        with self._lock:
+            value = self._meta.get(key)
+            return json.loads(value) if value is not None else None
+
+    def set_meta(self, key: str, value: dict):
+        with self._lock:
+            self._meta[key] = json.dumps(value)
+
+
+class SQLiteDIDRegistry(DIDRegistry):
+    """
+    Registry SQLite (WAL) — nhiều process đọc/ghi chung một file.
+
+    Args:
+        path: Đường dẫn file database
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS dids (
+            did_id      TEXT PRIMARY KEY,
+            ipfs_hash   TEXT NOT NULL,
+            owner       TEXT NOT NULL,
+            created_at  INTEGER NOT NULL,
+            verified    INTEGER NOT NULL DEFAULT 0,
+            status      TEXT NOT NULL,
+            tx_history  TEXT NOT NULL DEFAULT '[]',
+            seq         INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_dids_status ON dids (status, created_at);
+        CREATE INDEX IF NOT EXISTS idx_dids_owner ON dids (owner, created_at);
+        CREATE INDEX IF NOT EXISTS idx_dids_created ON dids (created_at);
+        CREATE TABLE IF NOT EXISTS meta (
+            key    TEXT PRIMARY KEY,
+            value  TEXT NOT NULL
+        );
+    """
+
+    # Số thứ tự thay đổi kế tiếp; chạy trong transaction ghi nên tăng dần giữa mọi process
+    _NEXT_SEQ = "(SELECT COALESCE(MAX(seq), 0) + 1 FROM dids)"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(self._SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(dids)")}
+            if "seq" not in columns:
+                # Database tạo trước khi có seq: đánh số các DID hiện có theo rowid
+                conn.execute("ALTER TABLE dids ADD COLUMN seq INTEGER NOT NULL DEFAULT 0")
+                conn.execute("UPDATE dids SET seq = rowid")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_dids_seq ON dids (seq)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Mỗi thread (chain I/O pool) một connection
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row_to_did(row: sqlite3.Row) -> dict:
+        return {
+            "did_id": row["did_id"],
+            "ipfs_hash": row["ipfs_hash"],
+            "owner": row["owner"],
+            "created_at": row["created_at"],
+            "verified": bool(row["verified"]),
+            "status": row["status"],
+            "tx_history": json.loads(row["tx_history"]),
+        }
+
+    @staticmethod
+    def _where(status, owner):
+        clauses, params = [], []
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if owner is not None:
+            clauses.append("owner = ?")
+            params.append(owner)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def upsert(self, did: dict):
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO dids (did_id, ipfs_hash, owner, created_at, verified, status, tx_history, seq)
+                VALUES (?, ?, ?, ?, ?, ?, ?, {next_seq})
+                ON CONFLICT(did_id) DO UPDATE SET
+                    ipfs_hash = excluded.ipfs_hash,
+                    owner = excluded.owner,
+                    created_at = excluded.created_at,
+                    verified = excluded.verified,
+                    status = excluded.status,
+                    tx_history = excluded.tx_history,
+                    seq = excluded.seq
+                """.format(next_seq=self._NEXT_SEQ),
+                (
+                    did["did_id"], did["ipfs_hash"], did["owner"], did["created_at"],
+                    int(bool(did["verified"])), did["status"], json.dumps(did["tx_history"]),
+                ),
+            )
+
+    def get(self, did_id: str) -> Optional[dict]:
+        row = self._connect().execute("SELECT * FROM dids WHERE did_id = ?", (did_id,)).fetchone()
+        return self._row_to_did(row) if row else None
+
+    def list(self, status=None, owner=None, limit=None, offset=0) -> List[dict]:
+        where, params = self._where(status, owner)
+        query = f"SELECT * FROM dids{where} ORDER BY created_at, did_id LIMIT ? OFFSET ?"
+        rows = self._connect().execute(query, params + [-1 if limit is None else limit, offset])
+        return [self._row_to_did(row) for row in rows]
+
+    def count(self, status=None, owner=None) -> int:
+        where, params = self._where(status, owner)
+        return self._connect().execute(f"SELECT COUNT(*) FROM dids{where}", params).fetchone()[0]
+
+    def changed_since(self, seq: int, limit: Optional[int] = None) -> Tuple[List[dict], int]:
+        rows = self._connect().execute(
+            "SELECT * FROM dids WHERE seq > ? ORDER BY seq LIMIT ?",
+            (seq, -1 if limit is None else limit),
+        ).fetchall()
+        return [self._row_to_did(row) for row in rows], rows[-1]["seq"] if rows else seq
+
+    def get_meta(self, key: str) -> Optional[dict]:
+        row = self._connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row["value"]) if row else None
+
+    def set_meta(self, key: str, value: dict):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, json.dumps(value)),
+            )
+
+    def record_action(self, did_id, action, tx_hash, status, verified=None, ipfs_hash=None):
+        # Đọc-sửa-ghi trong một transaction (BEGIN IMMEDIATE) để an toàn giữa các worker
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tx_history FROM dids WHERE did_id = ?", (did_id,)).fetchone()
+            if row is None:
+                raise ValueError(f"DID not found: {did_id}")
+            history = json.loads(row["tx_history"])
+            history.append({"action": action, "tx_hash": tx_hash})
+            conn.execute(
+                "UPDATE dids SET status = ?, verified = COALESCE(?, verified),"
+                f" ipfs_hash = COALESCE(?, ipfs_hash), tx_history = ?, seq = {self._NEXT_SEQ}"
+                " WHERE did_id = ?",
+                (status, None if verified is None else int(verified), ipfs_hash,
+                 json.dumps(history), did_id),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class RegistryCheckpoint:
+    """
+    Checkpoint của ChainFollower lưu trong bảng meta của registry.
+
+    Cursor của các lần poll không có TX nằm ở key `<key>.cursor` và chỉ được
+    dùng khi nó nối tiếp đúng lần ghi checkpoint đầy đủ hiện tại (cùng `id`).
+    """
+
+    def __init__(self, registry: DIDRegistry, key: str = "chain_follower"):
+        self.registry = registry
+        self.key = key
+        self.cursor_key = f"{key}.cursor"
+        # id của checkpoint đầy đủ gần nhất (None = chưa có)
+        self._id: Optional[int] = None
+
+    def load(self) -> Optional[dict]:
+        checkpoint = self.registry.get_meta(self.key)
+        if checkpoint is None:
+            return None
+        self._id = checkpoint.get("id")
+        cursor = self.registry.get_meta(self.cursor_key)
+        if self._id is not None and cursor and cursor.get("id") == self._id:
+            checkpoint["cursor"] = cursor["cursor"]
+            checkpoint["recent"] = cursor["recent"]
+        return checkpoint
+
+    def save(self, checkpoint: dict):
+        self._id = time.time_ns()
+        self.registry.set_meta(self.key, dict(checkpoint, id=self._id))
+
+    def save_cursor(self, cursor: list, recent: list) -> bool:
+        """
+        Chỉ lưu cursor; snapshot handler của checkpoint đầy đủ vẫn đúng.
+
+        Returns:
+            False nếu chưa có checkpoint đầy đủ (cần gọi `save`)
+        """
+        if self._id is None:
+            return False
+        self.registry.set_meta(self.cursor_key, {"id": self._id, "cursor": cursor, "recent": recent})
+        return True
+
+
+def create_did_registry(url: str = DID_REGISTRY_URL) -> DIDRegistry:
+    """Tạo registry theo URL (sqlite:///path hoặc memory://)"""
+    if url.startswith("memory://"):
+        return InMemoryDIDRegistry()
+    if url.startswith("sqlite:///"):
+        return SQLiteDIDRegistry(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported DID_REGISTRY_URL: {url}")
@@ -0,0 +1,111 @@
+"""
+Embedding Format — container nhị phân cho face embedding trên IPFS
+
+Thay cho JSON `{"faces": [{"embedding": [...512 số...]}]}` (~10 KB text mỗi face).
+Mọi trường là little-endian, các mảng đều căn 4 byte:
+
+    header      "<4sBBHI": magic b"FEMB", version, dtype, dim, count
+    face_ids    uint32[count]
+    confidences float32[count]
+    scales      float32[count]        (chỉ với dtype int8)
+    vectors     dtype[count * dim]
+
+dtype: 0 = float32 (đọc zero-copy bằng `np.frombuffer`), 1 = float16,
+2 = int8 (mỗi vector một scale = max|x| / 127).
+"""
+
+import struct
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"FEMB"
+VERSION = 1
+_HEADER = struct.Struct("<4sBBHI")
+
+DTYPES = {"float32": 0, "float16": 1, "int8": 2}
+_NUMPY_DTYPES = {0: np.dtype("<f4"), 1: np.dtype("<f2"), 2: np.dtype("i1")}
+
+
+def is_embedding_blob(data: bytes) -> bool:
+    return data[:4] == MAGIC
+
+
+def embedding_payload(faces: List[dict]) -> dict:
+    """Dạng JSON cũ (`EMBEDDING_FORMAT=json`) — CID cũ vẫn ở dạng này"""
+    return {
+        "faces": [
+            {
+                "face_id": f["face_id"],
+                "confidence": f["confidence"],
+                "embedding": f["embedding"],
+            }
+            for f in faces
+        ]
+    }
+
+
+def encode_embeddings(faces: List[dict], dtype: str = "float32") -> bytes:
+    """
+    Đóng gói embedding của các face (bỏ qua face không có embedding).
+
+    Args:
+        faces: Kết quả detect_and_embed (face_id, confidence, embedding)
+        dtype: "float32", "float16" hoặc "int8"
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+    faces = [f for f in faces if f.get("embedding")]
+    if not faces:
+        raise ValueError("No face embedding to encode")
+    vectors = np.asarray([f["embedding"] for f in faces], dtype=np.float32)
+    count, dim = vectors.shape
+    code = DTYPES[dtype]
+
+    parts = [
+        _HEADER.pack(MAGIC, VERSION, code, dim, count),
+        np.asarray([f["face_id"] for f in faces], dtype="<u4").tobytes(),
+        np.asarray([f["confidence"] for f in faces], dtype="<f4").tobytes(),
+    ]
+    if code == DTYPES["int8"]:
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1
+        parts.append(scales.astype("<f4").tobytes())
+        vectors = np.rint(vectors / scales[:, None])
+    parts.append(vectors.astype(_NUMPY_DTYPES[code]).tobytes())
+    return b"".join(parts)
+
+
+def decode_embeddings(data: bytes) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Đọc container.
+
+    Returns:
+        (face_ids, confidences, embeddings float32 (count, dim)) — với float32,
+        embeddings là view trên `data`, không copy
+    """
+    if len(data) < _HEADER.size:
+        raise ValueError("Embedding container truncated")
+    magic, version, code, dim, count = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not an embedding container")
+    if version != VERSION or code not in _NUMPY_DTYPES:
+        raise ValueError(f"Unsupported embedding container v{version} dtype {code}")
+
+    offset = _HEADER.size
+    face_ids = np.frombuffer(data, dtype="<u4", count=count, offset=offset)
+    offset += 4 * count
+    confidences = np.frombuffer(data, dtype="<f4", count=count, offset=offset)
+    offset += 4 * count
+    scales: Optional[np.ndarray] = None
+    if code == DTYPES["int8"]:
+        scales = np.frombuffer(data, dtype="<f4", count=count, offset=offset)
+        offset += 4 * count
+    vectors = np.frombuffer(data, dtype=_NUMPY_DTYPES[code], count=count * dim, offset=offset)
+    vectors = vectors.reshape(count, dim)
+
+    if scales is not None:
+        vectors = vectors.astype(np.float32) * scales[:, None]
+    elif code != DTYPES["float32"]:
+        vectors = vectors.astype(np.float32)
+    return face_ids, confidences, vectors
@@ -0,0 +1,346 @@
+"""
+Face Index — tìm DID theo khuôn mặt (1:N)
+
+Giữ embedding 512-D của mọi DID đang hoạt động trong một ma trận float32
+liên tục (mỗi hàng đã chuẩn hóa L2), nên cosine similarity của một khuôn mặt
+với toàn bộ DID là một phép nhân ma trận-vector.
+
+- Flat (mặc định): tìm chính xác, vài ms cho hàng chục nghìn DID
+- IVF (`FACE_INDEX_NLIST` > 0): chia embedding thành nlist cụm (spherical
+  k-means), chỉ so với `FACE_INDEX_NPROBE` cụm gần nhất
+
+Index được đồng bộ với DID registry (thêm DID mới, bỏ DID đã revoke, fetch lại
+khi update đổi ipfs_hash), chỉ đọc các DID thay đổi kể từ lần đồng bộ trước
+(`DIDRegistry.changed_since`), và lưu ra `FACE_INDEX_PATH` để restart
+không phải fetch lại mọi embedding từ IPFS.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.cardano_service import get_cardano_service
+from app.services.ipfs_service import get_ipfs_service
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 512
+FACE_INDEX_PATH = os.getenv("FACE_INDEX_PATH", "face_index.npz")
+# Số cụm IVF (0 = flat, tìm chính xác)
+FACE_INDEX_NLIST = int(os.getenv("FACE_INDEX_NLIST", "0"))
+# Số cụm được quét mỗi lần tìm
+FACE_INDEX_NPROBE = int(os.getenv("FACE_INDEX_NPROBE", "8"))
+# Số thread fetch embedding từ IPFS khi reconcile
+FACE_INDEX_FETCH_WORKERS = int(os.getenv("FACE_INDEX_FETCH_WORKERS", "16"))
+# IVF chỉ train khi mỗi cụm có trung bình ít nhất chừng này vector
+_IVF_MIN_POINTS_PER_LIST = 39
+_KMEANS_ITERATIONS = 10
+
+# Singleton
+_instance: Optional["FaceIndex"] = None
+_instance_lock = threading.Lock()
+# Số thứ tự thay đổi registry đã đồng bộ vào index (None = chưa đồng bộ lần nào)
+_synced_seq: Optional[int] = None
+# did_id -> ipfs_hash của các DID fetch embedding lỗi, thử lại lần sau
+_retry: Dict[str, str] = {}
+_sync_lock = threading.Lock()
+
+
+def get_face_index() -> "FaceIndex":
+    """Lazy singleton — nạp index đã lưu (nếu có) lần đầu khi cần"""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = FaceIndex(path=FACE_INDEX_PATH)
+                _instance.load()
+    return _instance
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+class FaceIndex:
+    """
+    Index embedding khuôn mặt theo DID.
+
+    Args:
+        dim: Số chiều embedding
+        path: File .npz lưu index (None = không lưu)
+        nlist: Số cụm IVF (0 = flat)
+        nprobe: Số cụm quét mỗi lần tìm
+    """
+
+    def __init__(
+        self,
+        dim: int = EMBEDDING_DIM,
+        path: Optional[str] = None,
+        nlist: int = FACE_INDEX_NLIST,
+        nprobe: int = FACE_INDEX_NPROBE,
+    ):
+        self.dim = dim
+        self.path = path
+        self.nlist = nlist
+        self.nprobe = nprobe
+        # Ma trận có capacity dư, chỉ `_size` hàng đầu hợp lệ
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._size = 0
+        self._ids: List[str] = []
+        self._cids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        # IVF: tâm cụm + cụm của từng hàng
+        self._centroids: Optional[np.ndarray] = None
+        self._lists = np.zeros(0, dtype=np.int32)
+        self._trained_size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def stats(self) -> dict:
+        return {
+            "identities": self._size,
+            "mode": "ivf" if self._centroids is not None else "flat",
+            "nlist": len(self._centroids) if self._centroids is not None else 0,
+            "nprobe": self.nprobe,
+        }
+
+    # ── Cập nhật ──
+    def add(self, did_id: str, cid: str, embedding: Sequence[float]):
+        """Thêm hoặc thay embedding của một DID"""
+        vector = _normalize(np.asarray(embedding, dtype=np.float32).reshape(self.dim))
+        with self._lock:
+            row = self._rows.get(did_id)
+            if row is None:
+                row = self._size
+                self._grow(row + 1)
+                self._ids.append(did_id)
+                self._cids.append(cid)
+                self._rows[did_id] = row
+                self._size += 1
+            else:
+                self._cids[row] = cid
+            self._vectors[row] = vector
+            if self._centroids is not None:
+                self._lists[row] = int(np.argmax(self._centroids @ vector))
+            self._maybe_train()
+
+    def remove(self, did_id: str) -> bool:
+        """Bỏ DID khỏi index (hàng cuối được chuyển vào chỗ trống)"""
+        with self._lock:
+            row = self._rows.pop(did_id, None)
+            if row is None:
+                return False
+            last = self._size - 1
+            if row != last:
+                self._vectors[row] = self._vectors[last]
+                self._lists[row] = self._lists[last]
+                self._ids[row] = self._ids[last]
+                self._cids[row] = self._cids[last]
+                self._rows[self._ids[row]] = row
+            self._ids.pop()
+            self._cids.pop()
+            self._size = last
+            return True
+
+    def _grow(self, size: int):
+        capacity = len(self._vectors)
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2, 1024)
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[: self._size] = self._vectors[: self._size]
+        lists = np.zeros(capacity, dtype=np.int32)
+        lists[: self._size] = self._lists[: self._size]
+        self._vectors, self._lists = vectors, lists
+
+    # ── IVF ──
+    def _maybe_train(self):
+        """Train lại các cụm khi số vector tăng gấp đôi kể từ lần train trước"""
+        n = self._size
+        if not self.nlist or n < self.nlist * _IVF_MIN_POINTS_PER_LIST or n < 2 * self._trained_size:
+            return
+        vectors = self._vectors[:n]
+        rng = np.random.default_rng(0)
+        centroids = vectors[rng.choice(n, self.nlist, replace=False)].copy()
+        for _ in range(_KMEANS_ITERATIONS):
+            assign = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, vectors)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = _normalize(sums)
+        self._centroids = centroids
+        self._lists[:n] = np.argmax(vectors @ centroids.T, axis=1)
+        self._trained_size = n
+        logger.info(f"✅ Face index IVF trained: {n} vectors, {self.nlist} lists")
+
+    # ── Tìm kiếm ──
+    def search(self, embedding: Sequence[float], k: int = 5) -> List[Tuple[str, float]]:
+        """
+        Top-k DID có cosine similarity cao nhất với embedding.
+
+        Returns:
+            Danh sách (did_id, similarity) giảm dần
+        """
+        query = _normalize(np.asarray(embedding, dtype=np.float32).reshape(self.dim))
+        with self._lock:
+            n = self._size
+            if n == 0 or k <= 0:
+                return []
+            if self._centroids is not None:
+                probe = np.argsort(self._centroids @ query)[-self.nprobe:]
+                rows = np.flatnonzero(np.isin(self._lists[:n], probe))
+                sims = self._vectors[rows] @ query
+            else:
+                rows = None
+                sims = self._vectors[:n] @ query
+            if len(sims) == 0:
+                return []
+            k = min(k, len(sims))
+            top = np.argpartition(-sims, k - 1)[:k]
+            top = top[np.argsort(-sims[top])]
+            ids = [self._ids[rows[i] if rows is not None else i] for i in top]
+            return [(did_id, float(sims[i])) for did_id, i in zip(ids, top)]
+
+    # ── Đồng bộ với registry ──
+    def cid(self, did_id: str) -> Optional[str]:
+        """CID của embedding đang có trong index (None nếu chưa có)"""
+        with self._lock:
+            row = self._rows.get(did_id)
+            return self._cids[row] if row is not None else None
+
+    def reconcile(
+        self,
+        entries: Dict[str, str],
+        fetch: Callable[[str], Optional[Sequence[float]]],
+    ) -> dict:
+        """
+        Đồng bộ index với toàn bộ danh sách DID đang hoạt động.
+
+        Args:
+            entries: did_id -> ipfs_hash của các DID chưa revoke
+            fetch: ipfs_hash -> embedding (None nếu không lấy được)
+
+        Returns:
+            Số DID đã thêm / bỏ / lỗi fetch
+        """
+        with self._lock:
+            changes: Dict[str, Optional[str]] = {did_id: None for did_id in self._ids if did_id not in entries}
+        changes.update(entries)
+        return self.apply_changes(changes, fetch)
+
+    def apply_changes(
+        self,
+        changes: Dict[str, Optional[str]],
+        fetch: Callable[[str], Optional[Sequence[float]]],
+    ) -> dict:
+        """
+        Áp dụng thay đổi của một số DID (chi phí theo số thay đổi, không theo kích thước index).
+
+        Args:
+            changes: did_id -> ipfs_hash hiện tại (None = DID đã revoke / không còn)
+            fetch: ipfs_hash -> embedding (None nếu không lấy được)
+
+        Returns:
+            Số DID đã thêm / bỏ / lỗi fetch
+        """
+        removed = sum(1 for did_id, cid in changes.items() if cid is None and self.remove(did_id))
+        missing = [(did_id, cid) for did_id, cid in changes.items() if cid is not None and self.cid(did_id) != cid]
+
+        def load(item):
+            did_id, cid = item
+            try:
+                return did_id, cid, fetch(cid)
+            except Exception as e:
+                logger.warning(f"⚠️ Face index: cannot fetch {cid} for {did_id}: {e}")
+                return did_id, cid, None
+
+        added = failed = 0
+        if missing:
+            with ThreadPoolExecutor(max_workers=FACE_INDEX_FETCH_WORKERS) as pool:
+                for did_id, cid, embedding in pool.map(load, missing):
+                    if embedding is None or len(embedding) != self.dim:
+                        failed += 1
+                        continue
+                    self.add(did_id, cid, embedding)
+                    added += 1
+
+        if added or removed:
+            self.save()
+        return {"added": added, "removed": removed, "failed": failed, "identities": self._size}
+
+    # ── Lưu / nạp ──
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            vectors = self._vectors[: self._size].copy()
+            ids = np.array(self._ids, dtype=str)
+            cids = np.array(self._cids, dtype=str)
+        tmp_path = f"{self.path}.tmp.npz"
+        np.savez(tmp_path, vectors=vectors, ids=ids, cids=cids)
+        os.replace(tmp_path, self.path)
+
+    def load(self) -> int:
+        """Nạp index đã lưu (0 nếu chưa có / không đọc được)"""
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        try:
+            with np.load(self.path) as data:
+                vectors, ids, cids = data["vectors"], data["ids"].tolist(), data["cids"].tolist()
+        except Exception as e:
+            logger.warning(f"⚠️ Cannot load face index {self.path}: {e}")
+            return 0
+        with self._lock:
+            self._size = 0
+            self._grow(len(ids))
+            self._vectors[: len(ids)] = vectors
+            self._ids, self._cids = ids, cids
+            self._rows = {did_id: row for row, did_id in enumerate(ids)}
+            self._size = len(ids)
+            self._centroids, self._trained_size = None, 0
+            self._maybe_train()
+        logger.info(f"✅ Face index loaded: {len(ids)} identities")
+        return len(ids)
+
+
+def _fetch_embedding(cid: str) -> Optional[np.ndarray]:
+    """Embedding khuôn mặt đầu tiên trong JSON đã upload lên IPFS"""
+    embeddings = get_ipfs_service().get_embeddings(cid)
+    return embeddings[0] if embeddings is not None else None
+
+
+def sync_face_index() -> dict:
+    """
+    Đồng bộ face index với DID registry (gọi sau create/update/revoke và mỗi lần follow chain).
+
+    Lần đầu trong process đối chiếu toàn bộ registry; các lần sau chỉ đọc các DID
+    được ghi sau số thứ tự đã đồng bộ (`DIDRegistry.changed_since`, kể cả ghi từ
+    worker khác), cộng các DID lần trước fetch embedding lỗi.
+    """
+    global _synced_seq
+    svc = get_cardano_service()
+    if not svc.ready:
+        return {}
+    index = get_face_index()
+    with _sync_lock:
+        dids, seq = svc.changed_dids(_synced_seq or 0)
+        changes = dict(_retry)
+        for did in dids:
+            changes[did["did_id"]] = did["ipfs_hash"] if did["status"] != "revoked" else None
+        if _synced_seq is None:
+            result = index.reconcile({did_id: cid for did_id, cid in changes.items() if cid}, _fetch_embedding)
+        else:
+            result = index.apply_changes(changes, _fetch_embedding)
+        _synced_seq = seq
+        # Fetch lỗi (IPFS timeout, ...) được thử lại ở lần đồng bộ sau
+        _retry.clear()
+        _retry.update({did_id: cid for did_id, cid in changes.items() if cid and index.cid(did_id) != cid})
+    return result
@@ -0,0 +1,261 @@
+"""
+Face Pipeline — detect → embed → pin theo từng stage
+
+Detect (CPU) và upload IPFS (network) chạy ở các stage riêng, không chặn event
+loop và không chặn lẫn nhau:
+
+1. Detect + embed: executor riêng — `FACE_DETECTOR_POOL_SIZE` thread (mỗi thread
+   mượn một detector trong pool) hoặc `FACE_DETECT_PROCESSES` process (mỗi
+   process một detector).
+   Tối đa `FACE_PIPELINE_MAX_PENDING` ảnh chờ/đang detect, request sau phải đợi.
+2. Pin: hàng đợi có giới hạn `FACE_UPLOAD_QUEUE` + `FACE_UPLOAD_CONCURRENCY`
+   worker upload song song. Hàng đợi đầy thì request chờ (backpressure).
+
+`pin()` chờ tới khi có CID; `submit()` trả về ngay một PinJob, client poll
+`GET /face/jobs/{job_id}`.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from app.services.async_chain import run_blocking
+from app.services.face_tracker import (
+    FACE_DETECTOR_POOL_SIZE,
+    ROI_SIZE,
+    detect_and_embed,
+    detect_and_embed_batch,
+    detect_faces,
+    embed_detections,
+    get_face_tracker,
+    init_detector_process,
+)
+from app.services.ipfs_service import get_ipfs_service
+
+logger = logging.getLogger(__name__)
+
+# 0 = detect bằng thread pool trong process API; > 0 = process pool
+FACE_DETECT_PROCESSES = int(os.getenv("FACE_DETECT_PROCESSES", "0"))
+FACE_PIPELINE_MAX_PENDING = int(os.getenv("FACE_PIPELINE_MAX_PENDING", "32"))
+FACE_UPLOAD_CONCURRENCY = int(os.getenv("FACE_UPLOAD_CONCURRENCY", "8"))
+FACE_UPLOAD_QUEUE = int(os.getenv("FACE_UPLOAD_QUEUE", "64"))
+# Job đã xong được giữ lại bao lâu (giây) để client poll
+FACE_JOB_TTL_SECONDS = float(os.getenv("FACE_JOB_TTL_SECONDS", "3600"))
+
+# Singleton
+_instance: Optional["FacePipeline"] = None
+_instance_lock = threading.Lock()
+
+
+def get_face_pipeline() -> "FacePipeline":
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = FacePipeline()
+    return _instance
+
+
+@dataclass
+class PinJob:
+    """Một lần pin embedding chạy nền (chế độ "return now, pin later")"""
+    job_id: str
+    filename: str
+    status: str = "pending"  # pending | pinned | failed
+    ipfs_cid: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class FacePipeline:
+    """
+    Pipeline detect → pin có backpressure.
+
+    Args:
+        processes: Số process detect (0 = thread pool trong process API)
+        max_pending: Số ảnh tối đa chờ/đang detect
+        upload_concurrency: Số upload IPFS song song
+        upload_queue: Số lần pin tối đa chờ trong hàng đợi
+    """
+
+    def __init__(
+        self,
+        processes: int = FACE_DETECT_PROCESSES,
+        max_pending: int = FACE_PIPELINE_MAX_PENDING,
+        upload_concurrency: int = FACE_UPLOAD_CONCURRENCY,
+        upload_queue: int = FACE_UPLOAD_QUEUE,
+    ):
+        self.processes = processes
+        self.max_pending = max_pending
+        self.upload_concurrency = upload_concurrency
+        self.upload_queue = upload_queue
+        self._detect_pool: Optional[Executor] = None
+        # Các object asyncio gắn với event loop đang chạy, tạo trong start()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._detect_slots: Optional[asyncio.Semaphore] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self.jobs: Dict[str, PinJob] = {}
+        self._stats = {"detected": 0, "pinned": 0, "pin_failed": 0}
+
+    @property
+    def detect_workers(self) -> int:
+        return self.processes or FACE_DETECTOR_POOL_SIZE
+
+    # ── Vòng đời ──
+    def start(self):
+        """Tạo executor detect, hàng đợi và các upload worker trên event loop hiện tại"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        if self._detect_pool is None:
+            self._detect_pool = self._create_detect_pool()
+        self._loop = loop
+        self._detect_slots = asyncio.Semaphore(self.max_pending)
+        self._queue = asyncio.Queue(maxsize=self.upload_queue)
+        self._workers = [
+            loop.create_task(self._upload_worker()) for _ in range(self.upload_concurrency)
+        ]
+        logger.info(
+            f"✅ Face pipeline started ({self.detect_workers} detect worker(s), "
+            f"{self.upload_concurrency} upload worker(s))"
+        )
+
+    def _create_detect_pool(self) -> Executor:
+        if self.processes > 0:
+            # spawn: không fork process đang giữ MediaPipe graph / thread pool
+            return ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_detector_process,
+            )
+        return ThreadPoolExecutor(max_workers=FACE_DETECTOR_POOL_SIZE, thread_name_prefix="face-detect")
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers, self._loop = [], None
+        if self._detect_pool is not None:
+            self._detect_pool.shutdown(wait=False, cancel_futures=True)
+            self._detect_pool = None
+
+    # ── Stage 1: detect + embed ──
+    async def detect(self, image_bytes: bytes) -> List[dict]:
+        """Detect + embed một ảnh (ValueError nếu không decode được)"""
+        faces = await self._run_detect(detect_and_embed, image_bytes)
+        self._stats["detected"] += 1
+        return faces
+
+    async def detect_batch(self, images: List[bytes]) -> List[Optional[List[dict]]]:
+        """
+        Detect + embed nhiều ảnh, embedding của mọi khuôn mặt tính trong một lần.
+
+        Thread mode: cả batch chạy trong một lần gọi (decode + detect song song
+        bằng detector pool). Process mode: mỗi process chỉ có một detector nên
+        từng ảnh được detect ở một process, ROI gom về process API để embed.
+        """
+        if self.processes > 0:
+            detections = await asyncio.gather(*(self._run_detect(detect_faces, image) for image in images))
+            results = await run_blocking(embed_detections, list(detections))
+        else:
+            results = await self._run_detect(detect_and_embed_batch, images)
+        self._stats["detected"] += len(images)
+        return results
+
+    async def warm_up(self):
+        """Mỗi detect worker chạy một lần detect trên ảnh trống (spawn process / dựng graph trước)"""
+        blank = cv2.imencode(".png", np.zeros((ROI_SIZE, ROI_SIZE, 3), np.uint8))[1].tobytes()
+        await asyncio.gather(*(self._run_detect(detect_and_embed, blank) for _ in range(self.detect_workers)))
+
+    async def _run_detect(self, fn, arg):
+        self.start()
+        async with self._detect_slots:
+            return await self._loop.run_in_executor(self._detect_pool, fn, arg)
+
+    # ── Stage 2: pin ──
+    async def pin(self, faces: List[dict], name: str) -> str:
+        """Đưa embedding vào hàng đợi upload và chờ CID"""
+        return await self._enqueue(faces, name)
+
+    async def submit(self, faces: List[dict], name: str) -> PinJob:
+        """Đưa embedding vào hàng đợi upload, trả về PinJob ngay (không chờ CID)"""
+        self._prune_jobs()
+        job = PinJob(job_id=uuid.uuid4().hex, filename=name)
+        self.jobs[job.job_id] = job
+        future = await self._enqueue_nowait(faces, name)
+        future.add_done_callback(lambda f: self._finish_job(job, f))
+        return job
+
+    def get_job(self, job_id: str) -> Optional[PinJob]:
+        return self.jobs.get(job_id)
+
+    async def _enqueue(self, faces: List[dict], name: str) -> str:
+        return await (await self._enqueue_nowait(faces, name))
+
+    async def _enqueue_nowait(self, faces: List[dict], name: str) -> asyncio.Future:
+        self.start()
+        future = self._loop.create_future()
+        # Hàng đợi đầy → chờ ở đây (backpressure lên request)
+        await self._queue.put((faces, name, future))
+        return future
+
+    async def _upload_worker(self):
+        ipfs = get_ipfs_service()
+        while True:
+            faces, name, future = await self._queue.get()
+            try:
+                cid = await run_blocking(ipfs.upload_embeddings, faces, name=name)
+            except Exception as e:
+                self._stats["pin_failed"] += 1
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                self._stats["pinned"] += 1
+                if not future.done():
+                    future.set_result(cid)
+            finally:
+                self._queue.task_done()
+
+    @staticmethod
+    def _finish_job(job: PinJob, future: asyncio.Future):
+        job.finished_at = time.time()
+        if future.cancelled():
+            job.status, job.error = "failed", "cancelled"
+        elif future.exception() is not None:
+            job.status, job.error = "failed", str(future.exception())
+            logger.warning(f"⚠️ IPFS pin job {job.job_id} failed: {job.error}")
+        else:
+            job.status, job.ipfs_cid = "pinned", future.result()
+
+    def _prune_jobs(self):
+        cutoff = time.time() - FACE_JOB_TTL_SECONDS
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def stats(self) -> dict:
+        return dict(
+            self._stats,
+            detect_workers=self.detect_workers,
+            detector_pool=get_face_tracker().pool.stats() if not self.processes else None,
+            upload_queue=self._queue.qsize() if self._queue else 0,
+            pending_jobs=sum(1 for job in self.jobs.values() if job.status == "pending"),
+        )
@@ -4,12 +4,23 @@ Face Detection Service — MediaPipe Tasks API (v0.10.32+)
 Dùng mp.tasks.vision.FaceDetector thay vì mp.solutions (deprecated).
 Singleton service cho face detection trong API router.
 Auto-download model nếu chưa có.
+
+Batch (detect_and_embed_batch): decode ảnh song song trong thread pool, gom
+mọi face ROI thành một mảng (N,128,128,3) rồi tính embedding một lần (vectorized).
+
+FaceDetector không thread-safe → service giữ một pool `FACE_DETECTOR_POOL_SIZE`
+detector (mặc định số CPU); mỗi lần detect mượn một detector rồi trả lại, nên
+nhiều thread detect song song trên nhiều core.
 """
 
 import logging
+import queue
+import threading
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Iterator, List, Optional, Tuple
 
 import cv2
 import mediapipe as mp
@@ -28,8 +39,19 @@ else:
     MODELS_DIR = Path(__file__).parent.parent.parent / "models"
 MODEL_PATH = MODELS_DIR / "blaze_face_short_range.tflite"
 
-# Singleton
+# Embedding: ROI resize về ROI_SIZE×ROI_SIZE, lấy EMBEDDING_DIM phần tử đầu
+ROI_SIZE = 128
+EMBEDDING_DIM = 512
+# Số thread decode ảnh trong batch
+FACE_DECODE_WORKERS = int(os.getenv("FACE_DECODE_WORKERS", str(os.cpu_count() or 4)))
+# Số FaceDetector trong pool (số ảnh detect song song)
+FACE_DETECTOR_POOL_SIZE = int(os.getenv("FACE_DETECTOR_POOL_SIZE", str(os.cpu_count() or 1)))
+
+# Singleton (được gọi đồng thời từ thread detect → khóa khi khởi tạo)
 _instance: Optional["FaceTrackerService"] = None
+_instance_lock = threading.Lock()
+_decode_pool: Optional[ThreadPoolExecutor] = None
+_decode_pool_lock = threading.Lock()
 
 
 def _ensure_model():
@@ -38,33 +60,167 @@ def _ensure_model():
         return
     MODELS_DIR.mkdir(parents=True, exist_ok=True)
     logger.info(f"📥 Downloading model: blaze_face_short_range.tflite ...")
-    urllib.request.urlretrieve(MODEL_URL, str(MODEL_PATH))
+    # Tải vào file tạm rồi đổi tên: process detect khác không đọc phải file đang tải dở
+    tmp_path = MODEL_PATH.with_name(f"{MODEL_PATH.name}.{os.getpid()}.tmp")
+    urllib.request.urlretrieve(MODEL_URL, str(tmp_path))
+    os.replace(tmp_path, MODEL_PATH)
     logger.info(f"   ✅ Saved to {MODEL_PATH}")
 
 
+def _get_decode_pool() -> ThreadPoolExecutor:
+    """Lazy singleton — thread pool decode ảnh (cv2.imdecode nhả GIL)"""
+    global _decode_pool
+    if _decode_pool is None:
+        with _decode_pool_lock:
+            if _decode_pool is None:
+                _decode_pool = ThreadPoolExecutor(
+                    max_workers=FACE_DECODE_WORKERS,
+                    thread_name_prefix="face-decode",
+                )
+    return _decode_pool
+
+
+def _decode_image(image_bytes: bytes) -> Optional[np.ndarray]:
+    """Bytes → BGR frame (None nếu không decode được)"""
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+
+def embed_rois(rois: np.ndarray) -> np.ndarray:
+    """
+    (N,128,128,3) BGR uint8 → (N,512) float32, một lần cho cả batch.
+
+    Mỗi hàng: RGB flatten / 255, chia cho L2 norm của toàn bộ vector, giữ 512
+    phần tử đầu. Norm không phụ thuộc thứ tự kênh và ||x/255|| = ||x||/255 nên
+    chỉ cần tổng bình phương (số nguyên, trên uint8) của cả ROI; chỉ 512 phần
+    tử đầu được đổi sang float.
+    """
+    n = len(rois)
+    pixels = rois.reshape(n, -1, 3)
+    flat = pixels.reshape(n, -1)
+    norms = np.sqrt(np.einsum("ij,ij->i", flat, flat, dtype=np.int64)).astype(np.float32)[:, np.newaxis]
+
+    # 512 phần tử đầu của RGB flatten nằm trong ceil(512/3) pixel đầu
+    head_pixels = -(-EMBEDDING_DIM // 3)
+    head = pixels[:, :head_pixels, ::-1].reshape(n, -1)[:, :EMBEDDING_DIM].astype(np.float32)
+    return np.divide(head, norms, out=np.zeros_like(head), where=norms > 0)
+
+
 def get_face_tracker() -> "FaceTrackerService":
     """Lazy singleton — khởi tạo lần đầu khi cần"""
     global _instance
     if _instance is None:
-        _instance = FaceTrackerService()
+        with _instance_lock:
+            if _instance is None:
+                _instance = FaceTrackerService()
     return _instance
 
 
-class FaceTrackerService:
-    """MediaPipe Face Detection (Tasks API v0.10.32+) + Embedding"""
+# Hàm top-level để chạy được trong process pool (mỗi process có singleton riêng)
+def init_detector_process():
+    """Initializer của process detect: mỗi process một detector (song song theo process)"""
+    global _instance
+    _instance = FaceTrackerService(pool_size=1)
 
-    def __init__(self, min_confidence: float = 0.3):
-        # Auto-download model nếu chưa có
-        _ensure_model()
 
+def detect_and_embed(image_bytes: bytes) -> List[dict]:
+    return get_face_tracker().detect_and_embed(image_bytes)
+
+
+def detect_and_embed_batch(images: List[bytes]) -> List[Optional[List[dict]]]:
+    return get_face_tracker().detect_and_embed_batch(images)
+
+
+def detect_faces(image_bytes: bytes) -> Optional[Tuple[List[dict], List[Optional[np.ndarray]]]]:
+    """Decode + detect một ảnh, chưa tính embedding (None nếu không decode được)"""
+    return get_face_tracker()._decode_and_detect(image_bytes)
+
+
+def embed_detections(
+    detections: List[Optional[Tuple[List[dict], List[Optional[np.ndarray]]]]],
+) -> List[Optional[List[dict]]]:
+    """Gom ROI của mọi ảnh, tính embedding trong một lần và gán vào faces"""
+    results: List[Optional[List[dict]]] = []
+    all_faces, all_rois = [], []
+    for detection in detections:
+        if detection is None:
+            results.append(None)
+            continue
+        faces, rois = detection
+        results.append(faces)
+        all_faces.extend(faces)
+        all_rois.extend(rois)
+
+    FaceTrackerService._attach_embeddings(all_faces, all_rois)
+    logger.info(f"Detected {len(all_faces)} face(s) in {len(detections)} image(s)")
+    return results
+
+
+class DetectorPool:
+    """
+    Pool FaceDetector với checkout/return — mỗi detector chỉ một thread dùng tại một thời điểm.
+
+    Args:
+        size: Số detector
+        min_confidence: Ngưỡng confidence của detector
+    """
+
+    def __init__(self, size: int, min_confidence: float):
+        self.size = max(1, size)
+        self._idle: "queue.Queue" = queue.Queue()
+        for _ in range(self.size):
+            self._idle.put(self._create(min_confidence))
+        self._stats = {"checkouts": 0, "waits": 0}
+
+    @staticmethod
+    def _create(min_confidence: float):
         # New Tasks API
         base_options = mp.tasks.BaseOptions(model_asset_path=str(MODEL_PATH))
         options = mp.tasks.vision.FaceDetectorOptions(
             base_options=base_options,
             min_detection_confidence=min_confidence,
         )
-        self.detector = mp.tasks.vision.FaceDetector.create_from_options(options)
-        logger.info("✅ FaceTrackerService initialized (Tasks API v0.10.32)")
+        return mp.tasks.vision.FaceDetector.create_from_options(options)
+
+    @contextmanager
+    def checkout(self) -> Iterator:
+        """Mượn một detector (chờ nếu mọi detector đang bận), tự trả lại khi xong"""
+        self._stats["checkouts"] += 1
+        try:
+            detector = self._idle.get_nowait()
+        except queue.Empty:
+            self._stats["waits"] += 1
+            detector = self._idle.get()
+        try:
+            yield detector
+        finally:
+            self._idle.put(detector)
+
+    def warm_up(self):
+        """Chạy một lần inference trên mọi detector (khởi tạo graph / delegate trước request đầu)"""
+        blank = mp.Image(image_format=mp.ImageFormat.SRGB, data=np.zeros((ROI_SIZE, ROI_SIZE, 3), np.uint8))
+        detectors = [self._idle.get() for _ in range(self.size)]
+        try:
+            for detector in detectors:
+                detector.detect(blank)
+        finally:
+            for detector in detectors:
+                self._idle.put(detector)
+
+    def stats(self) -> dict:
+        return dict(self._stats, size=self.size, idle=self._idle.qsize())
+
+
+class FaceTrackerService:
+    """MediaPipe Face Detection (Tasks API v0.10.32+) + Embedding"""
+
+    def __init__(self, min_confidence: float = 0.3, pool_size: int = FACE_DETECTOR_POOL_SIZE):
+        # Auto-download model nếu chưa có
+        _ensure_model()
+
+        self.pool = DetectorPool(pool_size, min_confidence)
+        self.pool.warm_up()
+        logger.info(f"✅ FaceTrackerService initialized (Tasks API v0.10.32, {self.pool.size} detector(s))")
 
     def detect_and_embed(self, image_bytes: bytes) -> List[dict]:
         """
@@ -73,22 +229,43 @@ class FaceTrackerService:
         Returns:
             List of {"face_id", "confidence", "bbox", "landmark_count", "embedding", "embedding_dim"}
         """
-        # Decode image
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        frame = _decode_image(image_bytes)
         if frame is None:
             raise ValueError("Cannot decode image")
 
+        faces, rois = self._detect(frame)
+        self._attach_embeddings(faces, rois)
+        logger.info(f"Detected {len(faces)} face(s)")
+        return faces
+
+    def detect_and_embed_batch(self, images: List[bytes]) -> List[Optional[List[dict]]]:
+        """
+        Detect faces + embeddings cho nhiều ảnh.
+
+        Returns:
+            Với mỗi ảnh: danh sách faces như detect_and_embed, hoặc None nếu không decode được
+        """
+        # Decode + detect song song (mỗi thread mượn một detector), gom ROI của mọi ảnh
+        detections = list(_get_decode_pool().map(self._decode_and_detect, images))
+        return embed_detections(detections)
+
+    def _decode_and_detect(self, image_bytes: bytes) -> Optional[Tuple[List[dict], List[Optional[np.ndarray]]]]:
+        frame = _decode_image(image_bytes)
+        return self._detect(frame) if frame is not None else None
+
+    def _detect(self, frame: np.ndarray) -> Tuple[List[dict], List[Optional[np.ndarray]]]:
+        """Detect faces trong frame → (faces chưa có embedding, ROI 128×128 của từng face)"""
         h, w, _ = frame.shape
 
         # Convert BGR→RGB for mediapipe
         rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb)
 
-        # Detect faces using Tasks API
-        result = self.detector.detect(mp_image)
+        # Detect faces using Tasks API (detector mượn từ pool)
+        with self.pool.checkout() as detector:
+            result = detector.detect(mp_image)
 
-        faces = []
+        faces, rois = [], []
         for idx, detection in enumerate(result.detections):
             bbox = detection.bounding_box
             x = max(0, bbox.origin_x)
@@ -98,25 +275,34 @@ class FaceTrackerService:
 
             score = detection.categories[0].score if detection.categories else 0.0
 
-            # Extract embedding from face ROI
-            embedding = self._extract_embedding(frame, (x, y, bw, bh))
-
             faces.append({
                 "face_id": idx,
                 "confidence": round(float(score), 4),
                 "bbox": (x, y, bw, bh),
                 "landmark_count": len(detection.keypoints) if detection.keypoints else 0,
-                "embedding": embedding,
-                "embedding_dim": len(embedding) if embedding else 0,
+                "embedding": None,
+                "embedding_dim": 0,
             })
+            rois.append(self._crop_roi(frame, (x, y, bw, bh)))
 
-        logger.info(f"Detected {len(faces)} face(s)")
-        return faces
+        return faces, rois
+
+    @staticmethod
+    def _attach_embeddings(faces: List[dict], rois: List[Optional[np.ndarray]]):
+        """Tính embedding của mọi ROI hợp lệ trong một lần rồi gán vào faces"""
+        valid = [i for i, roi in enumerate(rois) if roi is not None]
+        if not valid:
+            return
+        embeddings = embed_rois(np.stack([rois[i] for i in valid])).tolist()
+        for i, embedding in zip(valid, embeddings):
+            faces[i]["embedding"] = embedding
+            faces[i]["embedding_dim"] = len(embedding)
 
-    def _extract_embedding(
-        self, frame: np.ndarray, bbox: Tuple[int, int, int, int]
-    ) -> Optional[List[float]]:
-        """512D unit vector from face ROI"""
+    @staticmethod
+    def _crop_roi(
+        frame: np.ndarray, bbox: Tuple[int, int, int, int]
+    ) -> Optional[np.ndarray]:
+        """Face ROI resize về 128×128 (None nếu bbox rỗng)"""
         x, y, w, h = bbox
         if w <= 0 or h <= 0:
             return None
@@ -125,17 +311,4 @@ class FaceTrackerService:
         if roi.size == 0:
             return None
 
-        resized = cv2.resize(roi, (128, 128))
-        rgb = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
-        flat = rgb.flatten().astype(np.float32) / 255.0
-
-        norm = np.linalg.norm(flat)
-        if norm > 0:
-            flat = flat / norm
-
-        if len(flat) < 512:
-            flat = np.pad(flat, (0, 512 - len(flat)))
-        else:
-            flat = flat[:512]
-
-        return flat.tolist()
+        return cv2.resize(roi, (ROI_SIZE, ROI_SIZE))
@@ -0,0 +1,149 @@
+"""
+HTTP Client — session dùng chung cho Pinata API và IPFS gateway
+
+Một `requests.Session` với connection pool (keep-alive) thay cho `requests.get/post`
+ở cấp module (mỗi lần gọi một TCP + TLS handshake mới):
+
+- Pool `HTTP_POOL_SIZE` connection mỗi host, dùng chung giữa các thread
+- Retry khi lỗi kết nối / 429 / 5xx, backoff lũy thừa có jitter, tôn trọng `Retry-After`.
+  POST (pin lên Pinata) không idempotent: chỉ retry khi chưa gửi được request (lỗi kết nối)
+  hoặc server báo chưa xử lý (429 / 503); timeout / 500 / 502 / 504 có thể đã pin xong nên
+  trả lỗi ngay thay vì pin lần hai
+- Mỗi lần gọi có `deadline` (giây) tính cho cả các lần retry
+- `stats()`: số request, retry, connection đã mở → tỉ lệ tái sử dụng connection
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF_SECONDS = float(os.getenv("HTTP_BACKOFF_SECONDS", "0.5"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Method gửi lại được mà không tạo thêm tác dụng phụ
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# Status mà server chắc chắn chưa xử lý request (retry được cả với POST)
+UNPROCESSED_STATUSES = {429, 503}
+
+# Singleton
+_instance: Optional["HTTPClient"] = None
+_instance_lock = threading.Lock()
+
+
+def get_http_client() -> "HTTPClient":
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = HTTPClient()
+    return _instance
+
+
+class HTTPClient:
+    """
+    HTTP client có connection pool + retry.
+
+    Args:
+        pool_size: Số connection giữ lại mỗi host
+        retries: Số lần thử lại tối đa
+        backoff: Thời gian chờ cơ sở giữa các lần thử (nhân đôi mỗi lần, có jitter)
+    """
+
+    def __init__(
+        self,
+        pool_size: int = HTTP_POOL_SIZE,
+        retries: int = HTTP_RETRIES,
+        backoff: float = HTTP_BACKOFF_SECONDS,
+    ):
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        self._adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=False)
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "errors": 0}
+
+    def get(self, url: str, deadline: float = 30, **kwargs) -> requests.Response:
+        return self.request("GET", url, deadline=deadline, **kwargs)
+
+    def post(self, url: str, deadline: float = 30, **kwargs) -> requests.Response:
+        return self.request("POST", url, deadline=deadline, **kwargs)
+
+    def request(self, method: str, url: str, deadline: float = 30, **kwargs) -> requests.Response:
+        """
+        Gửi request, retry lỗi tạm thời cho tới khi hết `deadline` giây.
+        Method không idempotent (POST) chỉ retry lỗi kết nối và `UNPROCESSED_STATUSES`.
+
+        Returns:
+            Response cuối cùng (có thể vẫn là 429/5xx nếu hết lượt retry)
+        """
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_statuses = RETRY_STATUSES if idempotent else UNPROCESSED_STATUSES
+        end = time.monotonic() + deadline
+        attempt = 0
+        while True:
+            remaining = end - time.monotonic()
+            self._count("requests")
+            try:
+                resp = self.session.request(method, url, timeout=max(remaining, 0.1), **kwargs)
+            except requests.ConnectionError as e:
+                # Gồm cả ConnectTimeout: request chưa tới server
+                resp, error = None, e
+            except requests.Timeout as e:
+                if not idempotent:
+                    # Server có thể đã nhận và xử lý request
+                    self._count("errors")
+                    raise
+                resp, error = None, e
+            else:
+                if resp.status_code not in retry_statuses:
+                    return resp
+                error = None
+
+            delay = self._delay(attempt, resp)
+            if attempt >= self.retries or time.monotonic() + delay >= end:
+                self._count("errors")
+                if error is not None:
+                    raise error
+                return resp
+            attempt += 1
+            self._count("retries")
+            reason = error or f"HTTP {resp.status_code}"
+            logger.warning(f"⚠️ {method} {url} failed ({reason}), retry {attempt}/{self.retries} in {delay:.2f}s")
+            time.sleep(delay)
+
+    def _delay(self, attempt: int, resp: Optional[requests.Response]) -> float:
+        """Backoff lũy thừa có jitter, hoặc `Retry-After` nếu server yêu cầu"""
+        retry_after = resp.headers.get("Retry-After") if resp is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self) -> dict:
+        """Số request / retry / lỗi và số connection thực sự được mở"""
+        connections = sent = 0
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+                sent += pool.num_requests
+        return dict(
+            self._stats,
+            connections_opened=connections,
+            connection_reuse=round(1 - connections / sent, 4) if sent else None,
+        )
@@ -0,0 +1,156 @@
+"""
+IPFS Cache — cache nội dung theo CID
+
+Nội dung của một CID không bao giờ đổi, nên kết quả `get_json` được cache vĩnh viễn:
+
+- Tầng bộ nhớ: LRU `IPFS_CACHE_MAX_ITEMS` CID gần nhất (JSON đã parse + ma trận embedding)
+- Tầng đĩa (`IPFS_CACHE_DIR`): `<cid>.npy` chứa embedding của mọi face dạng float32 (N, D),
+  đọc bằng memory-map; `<cid>.json` chứa phần còn lại của payload (không có embedding)
+
+Verify lặp lại không gọi gateway và không parse lại list 512 float từ JSON.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+IPFS_CACHE_DIR = os.getenv("IPFS_CACHE_DIR", "ipfs_cache")
+IPFS_CACHE_MAX_ITEMS = int(os.getenv("IPFS_CACHE_MAX_ITEMS", "1024"))
+
+# CID (v0 base58 / v1 base32) — chỉ dùng tên file an toàn
+_CID_PATTERN = re.compile(r"^[A-Za-z0-9]+$")
+
+# (payload không có embedding, ma trận embedding hoặc None)
+Entry = Tuple[dict, Optional[np.ndarray]]
+
+
+def split_embeddings(data: dict) -> Entry:
+    """Tách embedding của các face ra một ma trận float32 (nếu mọi face đều có embedding cùng độ dài)"""
+    faces = data.get("faces") if isinstance(data, dict) else None
+    if not faces or not isinstance(faces, list):
+        return data, None
+    embeddings = [face.get("embedding") if isinstance(face, dict) else None for face in faces]
+    if any(not e for e in embeddings) or len({len(e) for e in embeddings}) != 1:
+        return data, None
+    meta = dict(data)
+    meta["faces"] = [{k: v for k, v in face.items() if k != "embedding"} for face in faces]
+    return meta, np.asarray(embeddings, dtype=np.float32)
+
+
+def join_embeddings(meta: dict, embeddings: Optional[np.ndarray]) -> dict:
+    """Ghép lại payload JSON từ phần metadata và ma trận embedding"""
+    if embeddings is None:
+        return meta
+    data = dict(meta)
+    data["faces"] = [
+        dict(face, embedding=embedding)
+        for face, embedding in zip(meta["faces"], embeddings.tolist())
+    ]
+    return data
+
+
+class IPFSCache:
+    """
+    Cache 2 tầng (LRU trong bộ nhớ + đĩa) cho nội dung IPFS theo CID.
+
+    Args:
+        directory: Thư mục tầng đĩa (None = chỉ cache trong bộ nhớ)
+        max_items: Số CID tối đa giữ trong bộ nhớ
+    """
+
+    def __init__(self, directory: Optional[str] = IPFS_CACHE_DIR, max_items: int = IPFS_CACHE_MAX_ITEMS):
+        self.directory = directory
+        self.max_items = max_items
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def stats(self) -> dict:
+        return dict(self._stats, items=len(self._entries))
+
+    def get(self, cid: str) -> Optional[Entry]:
+        """(metadata, embeddings) của CID, None nếu chưa có trong cache"""
+        with self._lock:
+            entry = self._entries.get(cid)
+            if entry is not None:
+                self._entries.move_to_end(cid)
+                self._stats["memory_hits"] += 1
+                return entry
+        entry = self._read_disk(cid)
+        if entry is None:
+            self._stats["misses"] += 1
+            return None
+        self._stats["disk_hits"] += 1
+        self._remember(cid, entry)
+        return entry
+
+    def get_json(self, cid: str) -> Optional[dict]:
+        entry = self.get(cid)
+        return join_embeddings(*entry) if entry is not None else None
+
+    def put(self, cid: str, data: dict) -> Entry:
+        """Lưu payload JSON của CID vào cả 2 tầng"""
+        return self.put_entry(cid, *split_embeddings(data))
+
+    def put_entry(self, cid: str, meta: dict, embeddings: Optional[np.ndarray]) -> Entry:
+        """Lưu (metadata, embeddings) đã tách sẵn của CID vào cả 2 tầng"""
+        entry = (meta, embeddings)
+        self._write_disk(cid, entry)
+        self._remember(cid, entry)
+        return entry
+
+    def _remember(self, cid: str, entry: Entry):
+        with self._lock:
+            self._entries[cid] = entry
+            self._entries.move_to_end(cid)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+
+    # ── Tầng đĩa ──
+    def _paths(self, cid: str) -> Optional[Tuple[str, str]]:
+        if not self.directory or not _CID_PATTERN.match(cid):
+            return None
+        base = os.path.join(self.directory, cid)
+        return f"{base}.json", f"{base}.npy"
+
+    def _read_disk(self, cid: str) -> Optional[Entry]:
+        paths = self._paths(cid)
+        if paths is None or not os.path.exists(paths[0]):
+            return None
+        json_path, npy_path = paths
+        try:
+            with open(json_path) as f:
+                meta = json.load(f)
+            embeddings = np.load(npy_path, mmap_mode="r") if os.path.exists(npy_path) else None
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ IPFS cache entry {cid} unreadable: {e}")
+            return None
+        return meta, embeddings
+
+    def _write_disk(self, cid: str, entry: Entry):
+        paths = self._paths(cid)
+        if paths is None:
+            return
+        json_path, npy_path = paths
+        meta, embeddings = entry
+        try:
+            # .npy ghi trước, .json ghi sau cùng — có .json nghĩa là entry đầy đủ
+            if embeddings is not None:
+                with open(f"{npy_path}.tmp", "wb") as f:
+                    np.save(f, embeddings)
+                os.replace(f"{npy_path}.tmp", npy_path)
+            with open(f"{json_path}.tmp", "w") as f:
+                json.dump(meta, f)
+            os.replace(f"{json_path}.tmp", json_path)
+        except OSError as e:
+            logger.warning(f"⚠️ Cannot write IPFS cache entry {cid}: {e}")
@@ -2,17 +2,30 @@
 IPFS Service — Pinata wrapper
 
 Upload/retrieve JSON to IPFS via Pinata API.
+Embedding được upload dạng container nhị phân (`embedding_format.py`) qua
+pinFileToIPFS; CID JSON cũ vẫn đọc được. Nội dung đọc về được cache theo CID
+(`ipfs_cache.py`). Mọi request đi qua HTTP client dùng chung (`http_client.py`).
 """
 
 import json
 import logging
 import os
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
-import requests
+import numpy as np
 from dotenv import load_dotenv
 
+from app.services.embedding_format import (
+    DTYPES,
+    decode_embeddings,
+    embedding_payload,
+    encode_embeddings,
+    is_embedding_blob,
+)
+from app.services.http_client import get_http_client
+from app.services.ipfs_cache import Entry, IPFSCache, join_embeddings
+
 logger = logging.getLogger(__name__)
 env_path = Path(__file__).parent.parent.parent.parent / ".env"
 if env_path.exists():
@@ -21,6 +34,9 @@ else:
     load_dotenv()  # Fallback: Docker env vars
 
 PINATA_API = "https://api.pinata.cloud"
+PINATA_GATEWAY = "https://gateway.pinata.cloud/ipfs"
+# Định dạng upload embedding: float32 | float16 | int8 | json (dạng cũ)
+EMBEDDING_FORMAT = os.getenv("EMBEDDING_FORMAT", "float32")
 
 # Singleton
 _instance: Optional["IPFSService"] = None
@@ -37,6 +53,8 @@ class IPFSService:
     """Pinata IPFS upload & retrieve"""
 
     def __init__(self):
+        self.cache = IPFSCache()
+        self.http = get_http_client()
         self.jwt = os.getenv("PINATA_JWT")
         if not self.jwt:
             logger.warning("⚠️ PINATA_JWT not set — IPFS uploads will fail")
@@ -54,11 +72,11 @@ class IPFSService:
             "pinataMetadata": {"name": name},
         }
 
-        resp = requests.post(
+        resp = self.http.post(
             f"{PINATA_API}/pinning/pinJSONToIPFS",
             json=payload,
             headers={**self.headers, "Content-Type": "application/json"},
-            timeout=30,
+            deadline=30,
         )
 
         if resp.status_code != 200:
@@ -66,14 +84,75 @@ class IPFSService:
 
         cid = resp.json()["IpfsHash"]
         logger.info(f"📤 Uploaded to IPFS: {cid}")
+        # Đã biết nội dung của CID → verify ngay sau đó không cần gọi gateway
+        self.cache.put(cid, data)
         return cid
 
-    def get_json(self, cid: str) -> dict:
-        """Retrieve JSON from IPFS by CID"""
-        resp = requests.get(
-            f"https://gateway.pinata.cloud/ipfs/{cid}",
-            timeout=30,
+    def upload_file(self, data: bytes, name: str) -> str:
+        """Upload file nhị phân → returns CID"""
+        if not self.jwt:
+            raise ValueError("PINATA_JWT not configured")
+
+        resp = self.http.post(
+            f"{PINATA_API}/pinning/pinFileToIPFS",
+            files={"file": (name, data, "application/octet-stream")},
+            data={"pinataMetadata": json.dumps({"name": name})},
+            headers=self.headers,
+            deadline=30,
         )
+
+        if resp.status_code != 200:
+            raise Exception(f"IPFS upload failed: {resp.text}")
+
+        cid = resp.json()["IpfsHash"]
+        logger.info(f"📤 Uploaded to IPFS: {cid} ({len(data)} bytes)")
+        return cid
+
+    def upload_embeddings(self, faces: List[dict], name: str = "face_embedding") -> str:
+        """Upload embedding của các face theo `EMBEDDING_FORMAT` → returns CID"""
+        if EMBEDDING_FORMAT not in DTYPES:
+            return self.upload_json(embedding_payload(faces), name=name)
+        blob = encode_embeddings(faces, EMBEDDING_FORMAT)
+        cid = self.upload_file(blob, name=f"{name}.femb")
+        self.cache.put_entry(cid, *_blob_entry(blob))
+        return cid
+
+    def get_json(self, cid: str) -> dict:
+        """Retrieve JSON from IPFS by CID (container nhị phân được trả về dạng JSON cũ)"""
+        entry = self.cache.get(cid)
+        if entry is None:
+            entry = self._fetch(cid)
+        return join_embeddings(*entry)
+
+    def get_embeddings(self, cid: str) -> Optional[np.ndarray]:
+        """
+        Embedding của mọi face trong CID dạng float32 (N, D).
+
+        Returns:
+            Ma trận embedding (memory-mapped nếu đọc từ cache đĩa), None nếu payload không có embedding
+        """
+        entry = self.cache.get(cid)
+        if entry is None:
+            entry = self._fetch(cid)
+        return entry[1]
+
+    def _fetch(self, cid: str) -> Entry:
+        """Tải CID từ gateway, nhận diện container nhị phân / JSON, lưu vào cache"""
+        resp = self.http.get(f"{PINATA_GATEWAY}/{cid}", deadline=30)
         if resp.status_code != 200:
             raise Exception(f"IPFS fetch failed: {resp.status_code}")
-        return resp.json()
+        if is_embedding_blob(resp.content):
+            return self.cache.put_entry(cid, *_blob_entry(resp.content))
+        return self.cache.put(cid, resp.json())
+
+
+def _blob_entry(blob: bytes) -> Entry:
+    """(metadata, embeddings) của container nhị phân — embeddings float32 không copy"""
+    face_ids, confidences, embeddings = decode_embeddings(blob)
+    meta = {
+        "faces": [
+            {"face_id": int(face_id), "confidence": round(float(confidence), 6)}
+            for face_id, confidence in zip(face_ids, confidences)
+        ]
+    }
+    return meta, embeddings
@@ -0,0 +1,205 @@
+"""
+Pending Outputs — chaining TX trên output chưa được xác nhận
+
+Sau khi submit, output của TX chỉ xuất hiện trong `context.utxos()` khi TX đã
+vào block (~20s trở lên). PendingChainContext ghi lại output/input của mọi TX
+đã submit thành công và chồng (overlay) lên UTxO đã xác nhận:
+
+- Output của TX đang chờ được trả về như UTxO bình thường → action kế tiếp
+  (register → verify → update) spend được ngay, không phải chờ block
+- Input đã bị TX đang chờ tiêu được ẩn khỏi UTxO đã xác nhận
+- Khi evaluate script, output chưa xác nhận được gửi kèm Blockfrost
+  (`/utils/txs/evaluate/utxos`) vì node chưa biết tới chúng
+
+Một output rời ledger khi đã thấy nó trong UTxO xác nhận, hoặc sau
+`PENDING_OUTPUT_TTL` giây (TX bị drop khỏi mempool).
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Tuple, Union
+
+from pycardano import (
+    ChainContext,
+    ExecutionUnits,
+    GenesisParameters,
+    Network,
+    ProtocolParameters,
+    RawCBOR,
+    Transaction,
+    TransactionFailedException,
+    TransactionInput,
+    TransactionOutput,
+    UTxO,
+)
+
+# Thời gian tối đa (giây) giữ một TX chưa xác nhận trong ledger
+PENDING_OUTPUT_TTL = float(os.getenv("PENDING_OUTPUT_TTL", "600"))
+
+
+class PendingChainContext(ChainContext):
+    """
+    ChainContext chồng output chưa xác nhận lên context gốc.
+
+    Args:
+        context: ChainContext gốc (ví dụ CachedChainContext)
+        ttl: Thời gian (giây) giữ một TX chưa xác nhận
+    """
+
+    def __init__(self, context: ChainContext, ttl: float = PENDING_OUTPUT_TTL):
+        self.context = context
+        self.ttl = ttl
+        # address -> {input: (hết hạn, UTxO)} của các output chưa xác nhận
+        self._outputs: Dict[str, Dict[TransactionInput, Tuple[float, UTxO]]] = {}
+        # input đã bị TX chưa xác nhận tiêu -> hết hạn
+        self._spent: Dict[TransactionInput, float] = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Any:
+        # stats(), invalidate(), ... của context gốc
+        if name == "context":
+            raise AttributeError(name)
+        return getattr(self.context, name)
+
+    # ── Chain info: chuyển thẳng cho context gốc ──
+    @property
+    def network(self) -> Network:
+        return self.context.network
+
+    @property
+    def epoch(self) -> int:
+        return self.context.epoch
+
+    @property
+    def last_block_slot(self) -> int:
+        return self.context.last_block_slot
+
+    @property
+    def protocol_param(self) -> ProtocolParameters:
+        return self.context.protocol_param
+
+    @property
+    def genesis_param(self) -> GenesisParameters:
+        return self.context.genesis_param
+
+    # ── Ledger ──
+    def record(self, tx: Transaction):
+        """Ghi lại TX vừa submit: output mới + input đã tiêu"""
+        expiry = time.monotonic() + self.ttl
+        tx_id = tx.transaction_body.id
+        with self._lock:
+            for tx_in in tx.transaction_body.inputs:
+                self._spent[tx_in] = expiry
+                # Output chưa xác nhận bị tiêu tiếp → bỏ khỏi ledger
+                for outputs in self._outputs.values():
+                    outputs.pop(tx_in, None)
+            for index, output in enumerate(tx.transaction_body.outputs):
+                tx_in = TransactionInput(tx_id, index)
+                utxo = UTxO(tx_in, self._normalize(output))
+                self._outputs.setdefault(str(output.address), {})[tx_in] = (expiry, utxo)
+
+    @staticmethod
+    def _normalize(output: TransactionOutput) -> TransactionOutput:
+        """Datum dạng RawCBOR giống UTxO lấy từ Blockfrost"""
+        datum = output.datum
+        if datum is not None and not isinstance(datum, RawCBOR):
+            datum = RawCBOR(datum.to_cbor())
+        return TransactionOutput(
+            output.address,
+            output.amount,
+            datum_hash=output.datum_hash,
+            datum=datum,
+            script=output.script,
+        )
+
+    def _purge(self, now: float):
+        self._spent = {tx_in: exp for tx_in, exp in self._spent.items() if exp > now}
+        for address in list(self._outputs):
+            outputs = {k: v for k, v in self._outputs[address].items() if v[0] > now}
+            if outputs:
+                self._outputs[address] = outputs
+            else:
+                del self._outputs[address]
+
+    def pending_count(self) -> int:
+        """Số output chưa xác nhận đang được theo dõi"""
+        with self._lock:
+            self._purge(time.monotonic())
+            return sum(len(outputs) for outputs in self._outputs.values())
+
+    # ── UTxO ──
+    def _utxos(self, address: str) -> List[UTxO]:
+        confirmed = self.context.utxos(address)
+        confirmed_inputs = {utxo.input for utxo in confirmed}
+        with self._lock:
+            self._purge(time.monotonic())
+            outputs = self._outputs.get(address, {})
+            # Output đã thấy trên chain → TX đã vào block
+            for tx_in in confirmed_inputs.intersection(outputs):
+                del outputs[tx_in]
+            pending = [utxo for _, utxo in outputs.values()]
+            spent = set(self._spent)
+        return [utxo for utxo in confirmed if utxo.input not in spent] + pending
+
+    # ── Submit / evaluate ──
+    def submit_tx_cbor(self, cbor: Union[bytes, str]) -> str:
+        if isinstance(cbor, str):
+            cbor = bytes.fromhex(cbor)
+        tx_hash = self.context.submit_tx_cbor(cbor)
+        # Chỉ ghi lại khi submit thành công
+        self.record(Transaction.from_cbor(cbor))
+        return tx_hash
+
+    def evaluate_tx_cbor(self, cbor: Union[bytes, str]) -> Dict[str, ExecutionUnits]:
+        if isinstance(cbor, str):
+            cbor = bytes.fromhex(cbor)
+        pending = self._pending_inputs(Transaction.from_cbor(cbor))
+        api = getattr(self.context, "api", None)
+        if not pending or api is None:
+            return self.context.evaluate_tx_cbor(cbor)
+
+        result = api.transaction_evaluate_utxos(
+            cbor.hex(), [self._ogmios_utxo(utxo) for utxo in pending]
+        )
+        evaluation = getattr(getattr(result, "result", None), "EvaluationResult", None)
+        if evaluation is None:
+            raise TransactionFailedException(result)
+        return {
+            k: ExecutionUnits(getattr(evaluation, k).memory, getattr(evaluation, k).steps)
+            for k in vars(evaluation)
+        }
+
+    def _pending_inputs(self, tx: Transaction) -> List[UTxO]:
+        """Các UTxO chưa xác nhận mà TX dùng làm input / reference input"""
+        body = tx.transaction_body
+        wanted = set(body.inputs) | set(body.reference_inputs or [])
+        with self._lock:
+            return [
+                utxo
+                for outputs in self._outputs.values()
+                for tx_in, (_, utxo) in outputs.items()
+                if tx_in in wanted
+            ]
+
+    @staticmethod
+    def _ogmios_utxo(utxo: UTxO) -> list:
+        """UTxO → [TxIn, TxOut] theo định dạng additional UTxO set của Ogmios"""
+        output = utxo.output
+        assets = {
+            f"{policy_id.payload.hex()}.{name.payload.hex()}": quantity
+            for policy_id, asset in (output.amount.multi_asset or {}).items()
+            for name, quantity in asset.items()
+        }
+        tx_out: Dict[str, Any] = {
+            "address": str(output.address),
+            "value": {"coins": output.amount.coin, "assets": assets},
+        }
+        if output.datum is not None:
+            tx_out["datum"] = output.datum.cbor.hex()
+        elif output.datum_hash is not None:
+            tx_out["datumHash"] = output.datum_hash.payload.hex()
+        return [
+            {"txId": str(utxo.input.transaction_id), "index": utxo.input.index},
+            tx_out,
+        ]
@@ -0,0 +1,188 @@
+"""
+UTxO Leases — giữ chỗ input giữa các TX build đồng thời
+
+Bản sao có chủ ý của `chapter3_cip68_implement/offchain/utxo_leases.py` (bản gốc, có test):
+lesson9 được deploy độc lập nên không import chéo sang chapter3; sửa ở bản gốc rồi chép sang đây.
+
+Hai request build đồng thời từ cùng ví đọc cùng snapshot UTxO nên có thể chọn
+trùng input → TX submit sau lỗi `BadInputsUTxO`. UTxOLeaseManager:
+
+- Trước khi build: loại các UTxO đang bị lease (excluded_inputs)
+- Sau khi build: lease input của TX `UTXO_LEASE_TTL` giây; nếu trùng với
+  build khác (race) thì build lại tuần tự với danh sách loại trừ mới
+- Submit thành công: giữ input thêm `UTXO_SPENT_TTL` giây (chờ vào block)
+- Submit lỗi / hết hạn: giải phóng
+"""
+
+import os
+import threading
+import time
+from copy import deepcopy
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from pycardano import (
+    Address,
+    ChainContext,
+    Transaction,
+    TransactionBuilder,
+    TransactionBuilderException,
+    TransactionId,
+    TransactionInput,
+    UTxO,
+)
+
+# Thời gian giữ input của một giao dịch chưa ký (giây)
+UTXO_LEASE_TTL = float(os.getenv("UTXO_LEASE_TTL", "120"))
+# Thời gian giữ input đã submit cho tới khi UTxO set được cập nhật (giây)
+UTXO_SPENT_TTL = float(os.getenv("UTXO_SPENT_TTL", "180"))
+# Số lần build tối đa khi bị trùng input với build đồng thời
+LEASE_BUILD_ATTEMPTS = 5
+
+
+class UTxOLeaseManager:
+    """
+    Quản lý lease các UTxO input giữa các lần build đồng thời.
+
+    Args:
+        lease_ttl: Thời gian (giây) giữ input của giao dịch chưa ký
+        spent_ttl: Thời gian (giây) giữ input của giao dịch đã submit
+    """
+
+    def __init__(self, lease_ttl: float = UTXO_LEASE_TTL, spent_ttl: float = UTXO_SPENT_TTL):
+        self.lease_ttl = lease_ttl
+        self.spent_ttl = spent_ttl
+        # tx id -> (hết hạn, các input)
+        self._leases: Dict[TransactionId, Tuple[float, List[TransactionInput]]] = {}
+        # input -> (hết hạn, tx id giữ input)
+        self._by_input: Dict[TransactionInput, Tuple[float, TransactionId]] = {}
+        self._lock = threading.Lock()
+        # Tuần tự hóa các build bị trùng input (chỉ khi có tranh chấp)
+        self._contended = threading.Lock()
+
+    def _purge(self, now: float) -> None:
+        expired = [tx_id for tx_id, (expiry, _) in self._leases.items() if expiry <= now]
+        for tx_id in expired:
+            self._drop(tx_id)
+
+    def _drop(self, tx_id: TransactionId) -> None:
+        _, inputs = self._leases.pop(tx_id, (0, []))
+        for tx_in in inputs:
+            owner = self._by_input.get(tx_in)
+            if owner is not None and owner[1] == tx_id:
+                del self._by_input[tx_in]
+
+    def leased_inputs(self) -> Set[TransactionInput]:
+        """Các input đang bị lease (chưa hết hạn)."""
+        with self._lock:
+            self._purge(time.monotonic())
+            return set(self._by_input)
+
+    def exclusions(
+        self,
+        context: ChainContext,
+        addresses: Iterable[Union[str, Address]],
+    ) -> List[UTxO]:
+        """UTxO của các địa chỉ đang bị lease, dùng làm `builder.excluded_inputs`."""
+        leased = self.leased_inputs()
+        if not leased:
+            return []
+        return [
+            utxo
+            for address in addresses
+            for utxo in context.utxos(address)
+            if utxo.input in leased
+        ]
+
+    def acquire(self, tx: Transaction) -> bool:
+        """
+        Lease các input của giao dịch.
+
+        Returns:
+            False nếu có input đã bị giao dịch khác lease (không lease gì cả)
+        """
+        tx_id = tx.transaction_body.id
+        inputs = list(tx.transaction_body.inputs)
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            for tx_in in inputs:
+                owner = self._by_input.get(tx_in)
+                if owner is not None and owner[1] != tx_id:
+                    return False
+            expiry = now + self.lease_ttl
+            self._leases[tx_id] = (expiry, inputs)
+            for tx_in in inputs:
+                self._by_input[tx_in] = (expiry, tx_id)
+        return True
+
+    def release(self, tx_id: TransactionId, spent: bool = False) -> None:
+        """
+        Giải phóng lease của giao dịch.
+
+        Args:
+            tx_id: ID giao dịch
+            spent: True nếu giao dịch đã submit thành công - input tiếp tục
+                bị loại trừ `spent_ttl` giây cho tới khi UTxO set cập nhật
+        """
+        with self._lock:
+            if tx_id not in self._leases:
+                return
+            if not spent:
+                self._drop(tx_id)
+                return
+            expiry = time.monotonic() + self.spent_ttl
+            _, inputs = self._leases[tx_id]
+            self._leases[tx_id] = (expiry, inputs)
+            for tx_in in inputs:
+                self._by_input[tx_in] = (expiry, tx_id)
+
+    def stats(self) -> Dict[str, int]:
+        """Số giao dịch / input đang bị lease."""
+        with self._lock:
+            self._purge(time.monotonic())
+            return {"leased_transactions": len(self._leases), "leased_inputs": len(self._by_input)}
+
+    def build(
+        self,
+        builder: TransactionBuilder,
+        build_once: Callable[[TransactionBuilder], Transaction],
+    ) -> Transaction:
+        """
+        Build giao dịch không trùng input với các build đang giữ lease.
+
+        Args:
+            builder: TransactionBuilder đã thêm inputs/outputs/scripts
+            build_once: Hàm build builder thành Transaction
+
+        Returns:
+            Transaction với input đã được lease
+        """
+        # builder.build() thay đổi state (inputs, collaterals, fee, ...) nên
+        # giữ một bản sao chưa build; mỗi lần build lại dùng bản sao mới của nó
+        template = _copy_builder(builder)
+        base_excluded = list(builder.excluded_inputs)
+        addresses = list(builder.input_addresses)
+
+        def attempt(candidate: TransactionBuilder) -> Optional[Transaction]:
+            candidate.excluded_inputs = base_excluded + self.exclusions(candidate.context, addresses)
+            tx = build_once(candidate)
+            return tx if self.acquire(tx) else None
+
+        # Lần đầu build song song (optimistic)
+        tx = attempt(builder)
+        if tx is not None:
+            return tx
+        # Bị trùng: build lại tuần tự, mỗi lần đều thấy lease mới nhất
+        with self._contended:
+            for _ in range(LEASE_BUILD_ATTEMPTS - 1):
+                tx = attempt(_copy_builder(template))
+                if tx is not None:
+                    return tx
+        raise TransactionBuilderException(
+            "Could not select inputs that are not leased by concurrent transactions"
+        )
+
+
+def _copy_builder(builder: TransactionBuilder) -> TransactionBuilder:
+    """Bản sao độc lập của builder, dùng chung chain context (không copy context)."""
+    return deepcopy(builder, {id(builder.context): builder.context})
@@ -0,0 +1,112 @@
+"""
+Warm-up — khởi tạo trước mọi thứ nặng trước khi nhận traffic
+
+Chạy nền trong `lifespan` ngay khi app start:
+
+1. face_detector: pool FaceDetector (tải model nếu thiếu, dựng graph MediaPipe)
+2. face_inference: mỗi detect worker chạy một lần detect + embed qua pipeline
+3. cardano_service: derive ví HD + đọc plutus.json
+4. protocol_params: lấy protocol params vào chain cache
+5. did_registry: khôi phục registry từ checkpoint (hoặc dựng lại từ UTxO)
+6. face_index: nạp face index đã lưu
+
+`GET /ready` trả 503 cho tới khi warm-up xong, nên load balancer chưa route
+request tới instance vừa deploy. Bước lỗi không chặn ready (service vẫn
+khởi tạo lazy khi có request) nhưng được báo trong `steps`.
+"""
+
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.services.async_chain import run_blocking
+from app.services.cardano_service import get_cardano_service
+from app.services.face_index import get_face_index
+from app.services.face_pipeline import get_face_pipeline
+from app.services.face_tracker import get_face_tracker
+
+logger = logging.getLogger(__name__)
+
+
+class WarmupState:
+    """Trạng thái warm-up: từng bước (status, thời gian) và cờ ready"""
+
+    def __init__(self):
+        self.ready = False
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.steps: Dict[str, dict] = {}
+
+    async def step(self, name: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Chạy một bước, ghi lại kết quả; lỗi được log và báo trong steps"""
+        self.steps[name] = {"status": "running"}
+        start = time.perf_counter()
+        try:
+            result = await fn()
+        except Exception as e:
+            self.steps[name] = {"status": "failed", "error": str(e)}
+            logger.warning(f"⚠️ Warm-up {name} failed: {e}")
+            return None
+        elapsed = round(time.perf_counter() - start, 3)
+        self.steps[name] = {"status": "skipped" if result is False else "done", "seconds": elapsed}
+        logger.info(f"🔥 Warm-up {name}: {self.steps[name]['status']} ({elapsed}s)")
+        return result
+
+    def to_dict(self) -> dict:
+        return {
+            "ready": self.ready,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "steps": self.steps,
+        }
+
+
+warmup_state = WarmupState()
+
+
+async def run_warmup(state: WarmupState = warmup_state):
+    """
+    Warm-up toàn bộ service, đánh dấu ready khi xong.
+
+    Returns:
+        CardanoService có chain follower (để chạy follow block mới), None nếu không
+    """
+    pipeline = get_face_pipeline()
+
+    async def face_detector():
+        if pipeline.processes:
+            return False  # detector nằm trong các process detect
+        await run_blocking(get_face_tracker)
+
+    async def cardano_service():
+        svc = await run_blocking(get_cardano_service)
+        return svc if svc.ready else False
+
+    await state.step("face_detector", face_detector)
+    await state.step("face_inference", pipeline.warm_up)
+    svc = await state.step("cardano_service", cardano_service)
+
+    async def protocol_params():
+        if not svc:
+            return False
+        await run_blocking(lambda: svc.context.protocol_param)
+
+    async def did_registry():
+        if not svc or not svc.follower:
+            return False
+        restored = await run_blocking(svc.follower.start)
+        logger.info(f"✅ DID registry {'restored from checkpoint' if restored else 'rebuilt from chain'}"
+                    f" (block {svc.follower.cursor[0]})")
+
+    async def face_index():
+        await run_blocking(get_face_index)
+
+    await state.step("protocol_params", protocol_params)
+    await state.step("did_registry", did_registry)
+    await state.step("face_index", face_index)
+
+    state.ready = True
+    state.finished_at = time.time()
+    logger.info(f"✅ Warm-up finished in {state.finished_at - state.started_at:.1f}s")
+    # Registry chưa khôi phục được thì lần poll đầu của follower sẽ resync
+    return svc if svc and svc.follower else None
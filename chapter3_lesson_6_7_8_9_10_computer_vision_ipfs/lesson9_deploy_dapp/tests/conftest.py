@@ -0,0 +1,116 @@
+"""
+Test các service thuần logic của lesson9 (không cần Blockfrost / Pinata).
+
+Chạy từ thư mục lesson9_deploy_dapp:
+    python -m pytest tests
+"""
+import hashlib
+import os
+import sys
+from fractions import Fraction
+from types import SimpleNamespace
+
+from pycardano import (
+    ExecutionUnits,
+    GenesisParameters,
+    Network,
+    ProtocolParameters,
+    RedeemerMap,
+    Transaction,
+    TransactionFailedException,
+    TransactionId,
+    TransactionInput,
+    UTxO,
+)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROTOCOL_PARAMS = ProtocolParameters(
+    min_fee_constant=155381, min_fee_coefficient=44, max_block_size=90112, max_tx_size=16384,
+    max_block_header_size=1100, key_deposit=2000000, pool_deposit=500000000,
+    pool_influence=Fraction(3, 10), monetary_expansion=Fraction(3, 1000),
+    treasury_expansion=Fraction(1, 5), decentralization_param=Fraction(0), extra_entropy="",
+    protocol_major_version=9, protocol_minor_version=0, min_utxo=1000000, min_pool_cost=170000000,
+    price_mem=Fraction(577, 10000), price_step=Fraction(721, 10000000),
+    max_tx_ex_mem=14000000, max_tx_ex_steps=10000000000,
+    max_block_ex_mem=62000000, max_block_ex_steps=20000000000,
+    max_val_size=5000, collateral_percent=150, max_collateral_inputs=3,
+    coins_per_utxo_word=4310, coins_per_utxo_byte=4310, cost_models={},
+)
+EX_UNITS = ExecutionUnits(200_000, 80_000_000)
+
+
+def tx_id(seed: str) -> TransactionId:
+    return TransactionId(hashlib.sha256(seed.encode()).digest())
+
+
+class FakeChainContext:
+    """
+    Blockfrost trong bộ nhớ: chỉ biết UTxO đã xác nhận (`utxos_by_address`).
+
+    Như node thật, evaluate chỉ resolve được input đã có trên chain hoặc được
+    gửi kèm qua additional UTxO set (`api.transaction_evaluate_utxos`); submit
+    ghi lại giao dịch nhưng output chưa vào `utxos()` cho tới khi test `confirm()`.
+    """
+
+    network = Network.TESTNET
+    epoch = 300
+    last_block_slot = 50_000_000
+    protocol_param = PROTOCOL_PARAMS
+    genesis_param = GenesisParameters(
+        active_slots_coefficient=0.05, update_quorum=5, max_lovelace_supply=45000000000000000,
+        network_magic=1, epoch_length=432000, system_start=1666656000, slots_per_kes_period=129600,
+        slot_length=1, max_kes_evolutions=62, security_param=2160,
+    )
+
+    def __init__(self):
+        self.utxos_by_address = {}
+        self.submitted = []
+        # additional UTxO set của mỗi lần evaluate qua api
+        self.additional = []
+        self.api = SimpleNamespace(transaction_evaluate_utxos=self._evaluate_utxos)
+
+    def utxos(self, address):
+        return list(self.utxos_by_address.get(str(address), []))
+
+    def submit_tx_cbor(self, cbor):
+        tx = Transaction.from_cbor(bytes.fromhex(cbor) if isinstance(cbor, str) else cbor)
+        self.submitted.append(tx)
+        return str(tx.id)
+
+    def confirm(self, tx):
+        """Giao dịch vào block: input bị tiêu, output xuất hiện trong utxos()."""
+        spent = set(tx.transaction_body.inputs)
+        for address, utxos in self.utxos_by_address.items():
+            self.utxos_by_address[address] = [utxo for utxo in utxos if utxo.input not in spent]
+        for index, output in enumerate(tx.transaction_body.outputs):
+            utxo = UTxO(TransactionInput(tx.id, index), output)
+            self.utxos_by_address.setdefault(str(output.address), []).append(utxo)
+
+    def evaluate_tx_cbor(self, cbor):
+        return self._evaluate(cbor, set())
+
+    def _evaluate_utxos(self, cbor_hex, additional_utxo_set):
+        self.additional.append(additional_utxo_set)
+        extra = {
+            TransactionInput(TransactionId.from_primitive(tx_in["txId"]), tx_in["index"])
+            for tx_in, _ in additional_utxo_set
+        }
+        units = self._evaluate(cbor_hex, extra)
+        evaluation = SimpleNamespace(**{
+            key: SimpleNamespace(memory=value.mem, steps=value.steps) for key, value in units.items()
+        })
+        return SimpleNamespace(result=SimpleNamespace(EvaluationResult=evaluation))
+
+    def _evaluate(self, cbor, extra):
+        tx = Transaction.from_cbor(bytes.fromhex(cbor) if isinstance(cbor, str) else cbor)
+        known = {utxo.input for utxos in self.utxos_by_address.values() for utxo in utxos} | extra
+        unknown = [tx_in for tx_in in tx.transaction_body.inputs if tx_in not in known]
+        if unknown:
+            raise TransactionFailedException(f"Unknown transaction input (missing from UTxO set): {unknown}")
+        redeemers = tx.transaction_witness_set.redeemer or []
+        if isinstance(redeemers, RedeemerMap):
+            keys = [(key.tag, key.index) for key in redeemers.keys()]
+        else:
+            keys = [(redeemer.tag, redeemer.index) for redeemer in redeemers]
+        return {f"{tag.name.lower()}:{index}": EX_UNITS for tag, index in keys}
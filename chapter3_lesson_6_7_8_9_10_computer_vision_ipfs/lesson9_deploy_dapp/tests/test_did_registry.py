@@ -0,0 +1,148 @@
+"""SQLiteDIDRegistry: bền vững qua restart, lọc / phân trang, record_action, meta."""
+import pytest
+
+from app.services.did_registry import (
+    InMemoryDIDRegistry,
+    RegistryCheckpoint,
+    SQLiteDIDRegistry,
+    create_did_registry,
+)
+
+
+def make_did(i, status="locked", owner="aa"):
+    return {
+        "did_id": f"did:test:{i}",
+        "ipfs_hash": f"Qm{i}",
+        "owner": owner,
+        "created_at": 1000 + i,
+        "verified": False,
+        "status": status,
+        "tx_history": [{"action": "create", "tx_hash": f"{i:064x}"}],
+    }
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def registry(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteDIDRegistry(str(tmp_path / "registry.db"))
+    return InMemoryDIDRegistry()
+
+
+def test_upsert_get_round_trip(registry):
+    did = make_did(1)
+    registry.upsert(did)
+    assert registry.get("did:test:1") == did
+    assert registry.get("did:test:missing") is None
+
+    did["status"] = "verified"
+    did["verified"] = True
+    registry.upsert(did)
+    assert registry.get("did:test:1")["verified"] is True
+    assert registry.count() == 1
+
+
+def test_list_filters_and_pages_by_created_at(registry):
+    for i in reversed(range(10)):
+        registry.upsert(make_did(i, status="verified" if i % 3 == 0 else "locked", owner="bb" if i < 5 else "cc"))
+
+    assert [d["did_id"] for d in registry.list(limit=3)] == [f"did:test:{i}" for i in range(3)]
+    assert [d["did_id"] for d in registry.list(limit=3, offset=8)] == ["did:test:8", "did:test:9"]
+    assert [d["did_id"] for d in registry.list(status="verified")] == [f"did:test:{i}" for i in (0, 3, 6, 9)]
+    assert registry.count(status="verified") == 4
+    assert registry.count(owner="bb") == 5
+    assert registry.count(status="locked", owner="cc") == 3
+
+
+def test_record_action_appends_history(registry):
+    registry.upsert(make_did(1))
+    registry.record_action("did:test:1", "verify", "ff" * 32, "verified", verified=True)
+    did = registry.get("did:test:1")
+    assert did["status"] == "verified" and did["verified"] is True
+    assert did["ipfs_hash"] == "Qm1"
+    assert [entry["action"] for entry in did["tx_history"]] == ["create", "verify"]
+
+    with pytest.raises(ValueError):
+        registry.record_action("did:test:missing", "verify", "ff" * 32, "verified")
+
+
+def test_returned_dicts_are_copies(registry):
+    registry.upsert(make_did(1))
+    did = registry.get("did:test:1")
+    did["tx_history"].append({"action": "local", "tx_hash": ""})
+    assert len(registry.get("did:test:1")["tx_history"]) == 1
+
+
+def test_sqlite_survives_restart(tmp_path):
+    path = str(tmp_path / "registry.db")
+    first = SQLiteDIDRegistry(path)
+    first.upsert(make_did(1))
+    RegistryCheckpoint(first).save({"cursor": [10, "b10"]})
+
+    second = SQLiteDIDRegistry(path)
+    assert second.get("did:test:1") == make_did(1)
+    assert RegistryCheckpoint(second).load()["cursor"] == [10, "b10"]
+
+
+def test_checkpoint_cursor_only_saves_follow_the_full_checkpoint(registry):
+    checkpoint = RegistryCheckpoint(registry)
+    assert checkpoint.save_cursor([11, "b11"], [[11, "b11"]]) is False
+    checkpoint.save({"cursor": [10, "b10"], "recent": [[10, "b10"]], "handlers": {"did_registry": None}})
+    assert checkpoint.save_cursor([12, "b12"], [[10, "b10"], [12, "b12"]]) is True
+
+    loaded = RegistryCheckpoint(registry).load()
+    assert loaded["cursor"] == [12, "b12"]
+    assert loaded["recent"] == [[10, "b10"], [12, "b12"]]
+
+    # Checkpoint đầy đủ mới hơn (ví dụ sau rollback) làm cursor cũ mất hiệu lực
+    checkpoint.save({"cursor": [9, "b9"], "recent": [[9, "b9"]], "handlers": {"did_registry": None}})
+    assert RegistryCheckpoint(registry).load()["cursor"] == [9, "b9"]
+
+
+def test_create_did_registry_urls(tmp_path):
+    assert isinstance(create_did_registry("memory://"), InMemoryDIDRegistry)
+    assert isinstance(create_did_registry(f"sqlite:///{tmp_path / 'r.db'}"), SQLiteDIDRegistry)
+    with pytest.raises(ValueError):
+        create_did_registry("postgres://localhost/db")
+
+
+def test_changed_since_returns_writes_in_order(registry):
+    for i in range(3):
+        registry.upsert(make_did(i))
+    dids, seq = registry.changed_since(0)
+    assert [d["did_id"] for d in dids] == [f"did:test:{i}" for i in range(3)]
+    assert registry.changed_since(seq) == ([], seq)
+
+    # Ghi lại did 0 và revoke did 1 → chỉ hai DID đó, theo thứ tự ghi
+    registry.upsert(make_did(0, status="verified"))
+    registry.record_action("did:test:1", "revoke", "ff" * 32, "revoked")
+    dids, latest = registry.changed_since(seq)
+    assert [(d["did_id"], d["status"]) for d in dids] == [("did:test:0", "verified"), ("did:test:1", "revoked")]
+    assert latest > seq
+
+    first, cursor = registry.changed_since(seq, limit=1)
+    assert [d["did_id"] for d in first] == ["did:test:0"]
+    assert [d["did_id"] for d in registry.changed_since(cursor)[0]] == ["did:test:1"]
+
+
+def test_sqlite_adds_seq_to_existing_database(tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / "registry.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE dids (did_id TEXT PRIMARY KEY, ipfs_hash TEXT NOT NULL, owner TEXT NOT NULL,"
+        " created_at INTEGER NOT NULL, verified INTEGER NOT NULL DEFAULT 0, status TEXT NOT NULL,"
+        " tx_history TEXT NOT NULL DEFAULT '[]')"
+    )
+    for i in range(2):
+        conn.execute(
+            "INSERT INTO dids VALUES (?, ?, 'aa', ?, 0, 'locked', '[]')", (f"did:test:{i}", f"Qm{i}", 1000 + i)
+        )
+    conn.commit()
+    conn.close()
+
+    registry = SQLiteDIDRegistry(path)
+    dids, seq = registry.changed_since(0)
+    assert [d["did_id"] for d in dids] == ["did:test:0", "did:test:1"]
+    registry.upsert(make_did(2))
+    assert [d["did_id"] for d in registry.changed_since(seq)[0]] == ["did:test:2"]
@@ -0,0 +1,74 @@
+"""encode_embeddings / decode_embeddings: round-trip cho float32, float16, int8."""
+import numpy as np
+import pytest
+
+from app.services.embedding_format import decode_embeddings, encode_embeddings, is_embedding_blob
+
+
+@pytest.fixture
+def faces():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((3, 512)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [
+        {"face_id": i, "confidence": 0.5 + i / 10, "embedding": vectors[i].tolist()}
+        for i in range(3)
+    ]
+
+
+def expected(faces):
+    return np.asarray([f["embedding"] for f in faces], dtype=np.float32)
+
+
+def test_float32_round_trip_is_exact(faces):
+    data = encode_embeddings(faces)
+    assert is_embedding_blob(data)
+    face_ids, confidences, vectors = decode_embeddings(data)
+    assert face_ids.tolist() == [0, 1, 2]
+    np.testing.assert_allclose(confidences, [0.5, 0.6, 0.7], rtol=1e-6)
+    np.testing.assert_array_equal(vectors, expected(faces))
+    # float32: view trên buffer, không copy
+    assert vectors.base is not None
+
+
+@pytest.mark.parametrize("dtype, atol", [("float16", 1e-3), ("int8", 0.5 / 127)])
+def test_quantized_round_trip(faces, dtype, atol):
+    vectors = decode_embeddings(encode_embeddings(faces, dtype=dtype))[2]
+    assert vectors.dtype == np.float32
+    original = expected(faces)
+    # int8: sai số mỗi phần tử tối đa nửa bước lượng tử (scale = max|x| / 127)
+    scale = np.abs(original).max(axis=1, keepdims=True) if dtype == "int8" else 1
+    assert np.all(np.abs(vectors - original) <= atol * scale + 1e-7)
+    cosine = np.sum(vectors * original, axis=1) / np.linalg.norm(vectors, axis=1)
+    assert np.all(cosine > 0.999)
+
+
+def test_sizes(faces):
+    header = 12 + 3 * 4 * 2
+    assert len(encode_embeddings(faces)) == header + 3 * 512 * 4
+    assert len(encode_embeddings(faces, dtype="float16")) == header + 3 * 512 * 2
+    assert len(encode_embeddings(faces, dtype="int8")) == header + 3 * 4 + 3 * 512
+
+
+def test_zero_vector_int8(faces):
+    faces[1]["embedding"] = [0.0] * 512
+    vectors = decode_embeddings(encode_embeddings(faces, dtype="int8"))[2]
+    assert not vectors[1].any()
+
+
+def test_faces_without_embedding_are_skipped(faces):
+    faces[0]["embedding"] = None
+    face_ids, _, _ = decode_embeddings(encode_embeddings(faces))
+    assert face_ids.tolist() == [1, 2]
+    with pytest.raises(ValueError):
+        encode_embeddings([{"face_id": 0, "confidence": 1.0, "embedding": None}])
+
+
+def test_rejects_bad_input(faces):
+    with pytest.raises(ValueError):
+        encode_embeddings(faces, dtype="float64")
+    data = encode_embeddings(faces)
+    with pytest.raises(ValueError):
+        decode_embeddings(b"JSON" + data[4:])
+    with pytest.raises(ValueError):
+        decode_embeddings(data[:8])
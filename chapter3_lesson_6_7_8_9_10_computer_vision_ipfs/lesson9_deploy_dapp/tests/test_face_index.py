@@ -0,0 +1,170 @@
+"""FaceIndex: top-k cosine (flat và IVF), add/remove, reconcile và đồng bộ từng thay đổi với registry, save/load."""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services.face_index import FaceIndex
+
+
+def random_vectors(n, dim=512, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def brute_force(vectors, ids, query, k):
+    sims = vectors @ (query / np.linalg.norm(query))
+    order = np.argsort(-sims)[:k]
+    return [ids[i] for i in order]
+
+
+@pytest.fixture
+def vectors():
+    return random_vectors(300)
+
+
+@pytest.fixture
+def index(vectors):
+    index = FaceIndex()
+    for i, vector in enumerate(vectors):
+        index.add(f"did:{i}", f"cid{i}", vector)
+    return index
+
+
+def test_flat_search_matches_brute_force(index, vectors):
+    ids = [f"did:{i}" for i in range(len(vectors))]
+    for query in random_vectors(5, seed=1):
+        result = index.search(query, k=5)
+        assert [did for did, _ in result] == brute_force(vectors, ids, query, 5)
+        sims = [sim for _, sim in result]
+        assert sims == sorted(sims, reverse=True)
+
+
+def test_exact_face_is_top_hit(index, vectors):
+    noisy = vectors[42] + 0.01 * random_vectors(1, seed=2)[0]
+    did, similarity = index.search(noisy, k=1)[0]
+    assert did == "did:42"
+    assert similarity > 0.99
+
+
+def test_remove_moves_last_row(index, vectors):
+    assert index.remove("did:10")
+    assert not index.remove("did:10")
+    assert len(index) == 299
+    # did:299 được chuyển vào chỗ trống, vẫn tìm được
+    assert index.search(vectors[299], k=1)[0][0] == "did:299"
+    assert all(did != "did:10" for did, _ in index.search(vectors[10], k=299))
+
+
+def test_add_replaces_existing_embedding(index, vectors):
+    index.add("did:0", "cid-new", vectors[1])
+    assert len(index) == 300
+    top = [did for did, _ in index.search(vectors[1], k=2)]
+    assert set(top) == {"did:0", "did:1"}
+
+
+def test_ivf_search_recall(vectors):
+    index = FaceIndex(nlist=4, nprobe=4)
+    for i, vector in enumerate(vectors):
+        index.add(f"did:{i}", f"cid{i}", vector)
+    assert index.stats()["mode"] == "ivf"
+    # nprobe = nlist: quét mọi cụm → kết quả như flat
+    ids = [f"did:{i}" for i in range(len(vectors))]
+    query = random_vectors(1, seed=3)[0]
+    assert [did for did, _ in index.search(query, k=5)] == brute_force(vectors, ids, query, 5)
+    # Ít cụm hơn vẫn tìm đúng chính khuôn mặt đã đăng ký
+    index.nprobe = 1
+    assert index.search(vectors[7], k=1)[0][0] == "did:7"
+
+
+def test_reconcile_adds_removes_and_refetches(vectors):
+    index = FaceIndex()
+    embeddings = {f"cid{i}": vectors[i] for i in range(10)}
+    fetched = []
+
+    def fetch(cid):
+        fetched.append(cid)
+        if cid == "broken":
+            raise IOError("gateway timeout")
+        return embeddings.get(cid)
+
+    result = index.reconcile({f"did:{i}": f"cid{i}" for i in range(5)}, fetch)
+    assert result == {"added": 5, "removed": 0, "failed": 0, "identities": 5}
+
+    # did:0 revoke, did:1 update sang cid mới, did:5 mới, did:6 lỗi fetch, did:7 không có embedding
+    fetched.clear()
+    entries = {"did:1": "cid8", "did:2": "cid2", "did:3": "cid3", "did:4": "cid4",
+               "did:5": "cid5", "did:6": "broken", "did:7": "missing"}
+    result = index.reconcile(entries, fetch)
+    assert sorted(fetched) == ["broken", "cid5", "cid8", "missing"]
+    assert result == {"added": 2, "removed": 1, "failed": 2, "identities": 5}
+    assert index.search(vectors[8], k=1)[0][0] == "did:1"
+    assert all(did != "did:0" for did, _ in index.search(vectors[0], k=5))
+
+    fetched.clear()
+    index.reconcile(entries, fetch)
+    assert sorted(fetched) == ["broken", "missing"]
+
+
+def test_save_load_round_trip(index, vectors, tmp_path):
+    index.path = str(tmp_path / "face_index.npz")
+    index.save()
+    loaded = FaceIndex(path=index.path)
+    assert loaded.load() == 300
+    query = random_vectors(1, seed=4)[0]
+    assert loaded.search(query, k=5) == index.search(query, k=5)
+    assert FaceIndex(path=str(tmp_path / "missing.npz")).load() == 0
+
+
+def test_empty_index():
+    assert FaceIndex().search(random_vectors(1)[0]) == []
+
+
+def test_sync_face_index_reads_only_registry_changes(vectors, monkeypatch):
+    from app.services import face_index
+    from app.services.did_registry import InMemoryDIDRegistry
+
+    registry = InMemoryDIDRegistry()
+    svc = SimpleNamespace(ready=True, changed_dids=registry.changed_since)
+    index = FaceIndex()
+    embeddings = {f"cid{i}": vectors[i] for i in range(10)}
+    fetched = []
+
+    def fetch(cid):
+        fetched.append(cid)
+        return embeddings.get(cid)
+
+    monkeypatch.setattr(face_index, "get_cardano_service", lambda: svc)
+    monkeypatch.setattr(face_index, "get_face_index", lambda: index)
+    monkeypatch.setattr(face_index, "_fetch_embedding", fetch)
+    monkeypatch.setattr(face_index, "_synced_seq", None)
+    monkeypatch.setattr(face_index, "_retry", {})
+
+    def upsert(i, cid, status="locked"):
+        registry.upsert({"did_id": f"did:{i}", "ipfs_hash": cid, "status": status})
+
+    for i in range(3):
+        upsert(i, f"cid{i}")
+    upsert(3, "cid3", status="revoked")
+    assert face_index.sync_face_index() == {"added": 3, "removed": 0, "failed": 0, "identities": 3}
+
+    # Không có thay đổi → không fetch gì
+    fetched.clear()
+    assert face_index.sync_face_index() == {"added": 0, "removed": 0, "failed": 0, "identities": 3}
+    assert fetched == []
+
+    # did:0 revoke, did:1 đổi cid, did:4 mới nhưng embedding chưa có trên IPFS
+    upsert(0, "cid0", status="revoked")
+    upsert(1, "cid5")
+    upsert(4, "cid-pending")
+    assert face_index.sync_face_index() == {"added": 1, "removed": 1, "failed": 1, "identities": 2}
+    assert sorted(fetched) == ["cid-pending", "cid5"]
+
+    # DID fetch lỗi được thử lại dù registry không đổi
+    fetched.clear()
+    embeddings["cid-pending"] = vectors[6]
+    assert face_index.sync_face_index()["added"] == 1
+    assert fetched == ["cid-pending"]
+    assert index.cid("did:4") == "cid-pending"
+    assert index.search(vectors[6], k=1)[0][0] == "did:4"
@@ -0,0 +1,77 @@
+"""embed_rois (vector hóa cả batch) khớp với cách tính embedding từng ROI ban đầu; singleton khởi tạo một lần."""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import pytest
+
+from app.services import face_tracker
+from app.services.face_tracker import EMBEDDING_DIM, ROI_SIZE, embed_detections, embed_rois
+
+
+def embed_one(roi: np.ndarray) -> np.ndarray:
+    """Cách tính cũ: một ROI BGR 128×128 → RGB flatten / 255, chuẩn hóa L2, 512 phần tử đầu."""
+    rgb = cv2.cvtColor(roi, cv2.COLOR_BGR2RGB)
+    flat = rgb.flatten().astype(np.float32) / 255.0
+    norm = np.linalg.norm(flat)
+    if norm > 0:
+        flat = flat / norm
+    return flat[:EMBEDDING_DIM]
+
+
+@pytest.fixture
+def rois():
+    rng = np.random.default_rng(0)
+    rois = rng.integers(0, 256, size=(16, ROI_SIZE, ROI_SIZE, 3), dtype=np.uint8)
+    rois[3] = 0          # ROI đen: norm = 0
+    rois[4] = 255        # ROI trắng: tổng bình phương lớn nhất
+    return rois
+
+
+def test_embed_rois_matches_per_roi_path(rois):
+    batch = embed_rois(rois)
+    assert batch.shape == (len(rois), EMBEDDING_DIM)
+    assert batch.dtype == np.float32
+    expected = np.stack([embed_one(roi) for roi in rois])
+    np.testing.assert_allclose(batch, expected, rtol=0, atol=1e-6)
+    assert not batch[3].any()
+
+
+def test_embed_rois_single(rois):
+    np.testing.assert_allclose(embed_rois(rois[:1])[0], embed_one(rois[0]), rtol=0, atol=1e-6)
+
+
+def test_embed_detections_keeps_image_order(rois):
+    def faces(n):
+        return [{"face_id": i, "embedding": None, "embedding_dim": 0} for i in range(n)]
+
+    detections = [
+        (faces(2), [rois[0], rois[1]]),
+        None,                               # ảnh không decode được
+        (faces(0), []),                     # ảnh không có khuôn mặt
+        (faces(2), [None, rois[2]]),        # bbox rỗng → không có embedding
+    ]
+    results = embed_detections(detections)
+    assert results[1] is None
+    assert results[2] == []
+    np.testing.assert_allclose(results[0][1]["embedding"], embed_one(rois[1]), atol=1e-6)
+    assert results[3][0]["embedding"] is None and results[3][0]["embedding_dim"] == 0
+    assert results[3][1]["embedding_dim"] == EMBEDDING_DIM
+    np.testing.assert_allclose(results[3][1]["embedding"], embed_one(rois[2]), atol=1e-6)
+
+
+def test_get_face_tracker_creates_one_service_under_concurrency(monkeypatch):
+    created = []
+
+    class SlowService:
+        def __init__(self):
+            created.append(self)
+            time.sleep(0.05)  # như tải model + dựng detector pool
+
+    monkeypatch.setattr(face_tracker, "_instance", None)
+    monkeypatch.setattr(face_tracker, "FaceTrackerService", SlowService)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        services = list(pool.map(lambda _: face_tracker.get_face_tracker(), range(8)))
+    assert len(created) == 1
+    assert all(service is created[0] for service in services)
@@ -0,0 +1,56 @@
+"""HTTPClient: retry GET khi lỗi tạm thời, POST chỉ retry khi server chắc chắn chưa xử lý."""
+import pytest
+import requests
+
+from app.services.http_client import HTTPClient
+
+
+class FakeSession:
+    """Trả lần lượt các kết quả cho trước (status code hoặc exception)."""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        resp = requests.Response()
+        resp.status_code = outcome
+        return resp
+
+
+def make_client(outcomes):
+    client = HTTPClient(retries=3, backoff=0)
+    client.session = FakeSession(outcomes)
+    return client
+
+
+def test_get_retries_timeouts_and_5xx():
+    client = make_client([requests.ReadTimeout(), 502, 500, 200])
+    assert client.get("https://gateway/ipfs/cid").status_code == 200
+    assert client.session.calls == 4
+
+
+@pytest.mark.parametrize("outcome", [requests.ConnectionError(), requests.ConnectTimeout(), 429, 503])
+def test_post_retries_when_request_was_not_processed(outcome):
+    client = make_client([outcome, 200])
+    assert client.post("https://api/pinning/pinFileToIPFS").status_code == 200
+    assert client.session.calls == 2
+
+
+@pytest.mark.parametrize("status", [500, 502, 504])
+def test_post_does_not_retry_ambiguous_5xx(status):
+    client = make_client([status, 200])
+    assert client.post("https://api/pinning/pinFileToIPFS").status_code == status
+    assert client.session.calls == 1
+
+
+def test_post_does_not_retry_read_timeout():
+    client = make_client([requests.ReadTimeout(), 200])
+    with pytest.raises(requests.ReadTimeout):
+        client.post("https://api/pinning/pinJSONToIPFS")
+    assert client.session.calls == 1
+    assert client.stats()["errors"] == 1
@@ -0,0 +1,179 @@
+"""PendingChainContext: chaining action DID trên output chưa xác nhận, confirm / hết hạn, evaluate kèm UTxO."""
+import pytest
+from pycardano import (
+    Address,
+    ExtendedSigningKey,
+    HDWallet,
+    Network,
+    PlutusV3Script,
+    RawCBOR,
+    TransactionBuilder,
+    TransactionInput,
+    TransactionOutput,
+    UTxO,
+    Value,
+    plutus_script_hash,
+)
+
+from conftest import FakeChainContext, tx_id
+from app.services import pending_outputs
+from app.services.cardano_service import CardanoService, DIDDatum
+from app.services.did_registry import InMemoryDIDRegistry
+from app.services.pending_outputs import PendingChainContext
+from app.services.utxo_leases import UTxOLeaseManager
+
+MNEMONIC = " ".join(["abandon"] * 23 + ["art"])
+# Script giả (chỉ dùng script hash); ex-units do FakeChainContext trả về
+SCRIPT = PlutusV3Script(bytes.fromhex("4e4d01000033222220051200120011"))
+
+
+@pytest.fixture
+def chain():
+    return FakeChainContext()
+
+
+@pytest.fixture
+def service(chain):
+    """CardanoService trên FakeChainContext, ví có 5 UTxO chỉ có ADA."""
+    hd = HDWallet.from_mnemonic(MNEMONIC)
+    svc = CardanoService.__new__(CardanoService)
+    svc.context = PendingChainContext(chain)
+    svc.leases = UTxOLeaseManager()
+    svc.pay_skey = ExtendedSigningKey.from_hdwallet(hd.derive_from_path("m/1852'/1815'/0'/0/0"))
+    svc.pay_vkey = svc.pay_skey.to_verification_key()
+    svc.stake_skey = ExtendedSigningKey.from_hdwallet(hd.derive_from_path("m/1852'/1815'/0'/2/0"))
+    svc.address = Address(svc.pay_vkey.hash(), svc.stake_skey.to_verification_key().hash(), network=Network.TESTNET)
+    svc.script = SCRIPT
+    svc.script_address = Address(plutus_script_hash(SCRIPT), network=Network.TESTNET)
+    svc.registry = InMemoryDIDRegistry()
+    svc.ready = True
+    chain.utxos_by_address[str(svc.address)] = [
+        UTxO(TransactionInput(tx_id(f"wallet-{i}"), 0), TransactionOutput(svc.address, Value(20_000_000)))
+        for i in range(5)
+    ]
+    return svc
+
+
+def pay(context, sender, receiver, amount=3_000_000, datum=None):
+    """Giao dịch chuyển ADA (chưa ký) từ `sender`, build trên `context`."""
+    builder = TransactionBuilder(context)
+    builder.add_input_address(sender)
+    builder.add_output(TransactionOutput(receiver, Value(amount), datum=datum))
+    return builder.build_and_sign([], change_address=sender)
+
+
+def test_register_then_update_chain_on_unconfirmed_outputs(service, chain):
+    created = service.create_did("QmFace1", did_id="did:cardano:test")
+    registered = service.perform_action("did:cardano:test", "register")
+    updated = service.perform_action("did:cardano:test", "update", new_ipfs_hash="QmFace2")
+
+    # Không giao dịch nào vào block: mỗi action spend output DID của action trước
+    assert [str(tx.id) for tx in chain.submitted] == [created["tx_hash"], registered["tx_hash"], updated["tx_hash"]]
+    for previous, current in zip(chain.submitted, chain.submitted[1:]):
+        script_inputs = [
+            tx_in for tx_in in current.transaction_body.inputs
+            if tx_in.transaction_id == previous.id
+        ]
+        assert script_inputs
+    # Không input nào bị tiêu hai lần (input đã tiêu bị ẩn khỏi UTxO xác nhận)
+    spent = [tx_in for tx in chain.submitted for tx_in in tx.transaction_body.inputs]
+    assert len(spent) == len(set(spent))
+
+    # Register / update evaluate kèm output DID chưa xác nhận
+    assert len(chain.additional) == 2
+    for additional, previous in zip(chain.additional, chain.submitted):
+        assert str(previous.id) in {tx_in["txId"] for tx_in, _ in additional}
+
+    # Update đọc datum từ output chưa xác nhận (RawCBOR như Blockfrost trả về)
+    out = next(o for o in chain.submitted[-1].transaction_body.outputs if o.address == service.script_address)
+    assert DIDDatum.from_cbor(out.datum.to_cbor()).face_ipfs_hash == b"QmFace2"
+    did = service.registry.get("did:cardano:test")
+    assert did["ipfs_hash"] == "QmFace2"
+    assert [entry["action"] for entry in did["tx_history"]] == ["create", "register", "update"]
+
+
+def test_pending_outputs_leave_ledger_when_confirmed(service, chain):
+    context = service.context
+    tx = pay(context, service.address, service.script_address)
+    context.submit_tx(tx)
+    assert context.pending_count() == 2  # output + change
+
+    chain.confirm(tx)
+    wallet = context.utxos(service.address)
+    # Output đã xác nhận chỉ xuất hiện một lần, từ context gốc
+    assert len([utxo for utxo in wallet if utxo.input.transaction_id == tx.id]) == 1
+    context.utxos(service.script_address)
+    assert context.pending_count() == 0
+
+
+def test_expired_pending_transaction_is_rolled_back(service, chain, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(pending_outputs.time, "monotonic", lambda: now[0])
+    context = PendingChainContext(chain, ttl=60)
+    before = {utxo.input for utxo in context.utxos(service.address)}
+
+    tx = pay(context, service.address, service.script_address)
+    context.submit_tx(tx)
+    after = {utxo.input for utxo in context.utxos(service.address)}
+    assert not set(tx.transaction_body.inputs) & after
+    assert any(tx_in.transaction_id == tx.id for tx_in in after)
+
+    # TX bị drop khỏi mempool: output biến mất, input được trả lại
+    now[0] += 61
+    assert {utxo.input for utxo in context.utxos(service.address)} == before
+    assert context.utxos(service.script_address) == []
+    assert context.pending_count() == 0
+
+
+def test_failed_submit_is_not_recorded(service, chain):
+    def reject(cbor):
+        raise ValueError("BadInputsUTxO")
+
+    chain.submit_tx_cbor = reject
+    context = service.context
+    tx = pay(context, service.address, service.script_address)
+    with pytest.raises(ValueError):
+        context.submit_tx(tx)
+    assert context.pending_count() == 0
+    assert len(context.utxos(service.address)) == 5
+
+
+def test_pending_datum_is_normalised_to_raw_cbor(service, chain):
+    context = service.context
+    datum = DIDDatum(did_id=b"did", face_ipfs_hash=b"Qm", owner=b"\x00" * 28, created_at=1, verified=0)
+    tx = pay(context, service.address, service.script_address, datum=datum)
+    context.submit_tx(tx)
+
+    (utxo,) = context.utxos(service.script_address)
+    assert isinstance(utxo.output.datum, RawCBOR)
+    assert utxo.output.datum.cbor == datum.to_cbor()
+    tx_in, tx_out = PendingChainContext._ogmios_utxo(utxo)
+    assert tx_in == {"txId": str(tx.id), "index": utxo.input.index}
+    assert tx_out["datum"] == datum.to_cbor_hex()
+    assert tx_out["value"] == {"coins": 3_000_000, "assets": {}}
+
+
+def test_evaluate_sends_only_pending_inputs(service, chain):
+    context = service.context
+    first = pay(context, service.address, service.script_address)
+    context.submit_tx(first)
+
+    # Giao dịch chỉ dùng UTxO đã xác nhận → evaluate thẳng trên context gốc
+    confirmed = [utxo for utxo in context.utxos(service.address) if utxo.input.transaction_id != first.id]
+    builder = TransactionBuilder(context)
+    builder.add_input(confirmed[0])
+    builder.add_output(TransactionOutput(service.script_address, Value(2_000_000)))
+    plain = builder.build_and_sign([], change_address=service.address)
+    assert context.evaluate_tx(plain) == {}
+    assert chain.additional == []
+
+    # Giao dịch spend change output chưa xác nhận → gửi kèm đúng output đó
+    (change,) = [utxo for utxo in context.utxos(service.address) if utxo.input.transaction_id == first.id]
+    builder = TransactionBuilder(context)
+    builder.add_input(change)
+    builder.add_output(TransactionOutput(service.script_address, Value(2_000_000)))
+    chained = builder.build_and_sign([], change_address=service.address)
+    assert context.evaluate_tx(chained) == {}
+    assert [[tx_in for tx_in, _ in additional] for additional in chain.additional] == [
+        [{"txId": str(first.id), "index": change.input.index}]
+    ]